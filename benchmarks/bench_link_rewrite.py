@@ -0,0 +1,126 @@
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.links import COMMENT_CLOSE, COMMENT_OPEN, rewrite_links  # noqa: E402
+
+###############
+# Description #
+###############
+"""
+Benchmark of the link rewrite applied to a merged document.
+
+The input is a synthetic combined_notes.md of SIZE_MB megabytes, made of
+notes with image links (some of them inside comments) pointing to
+TARGETS different assets.
+
+"before": one full scan and rebuild of the document per unique target,
+          as _replace_target_outside_comments did (O(targets x size)).
+"after":  a single scan of the links and a single splice (rewrite_links).
+
+Run it with: python benchmarks/bench_link_rewrite.py [SIZE_MB] [TARGETS]
+"""
+
+###########
+# Defines #
+###########
+DEFAULT_SIZE_MB = 50
+DEFAULT_TARGETS = 200
+
+NOTE_TEXT = (
+    "## Section\n\n"
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod\n"
+    "tempor incididunt ut labore et dolore magna aliqua. Ut enim ad minim.\n\n"
+)
+
+
+def make_document(sizeMb: int, targets: int) -> str:
+    """
+    Build the synthetic merged document.
+    """
+    parts: list[str] = []
+    size = 0
+    i = 0
+    while size < sizeMb * 1024 * 1024:
+        target = f"imgs/figure-{i % targets}.png"
+        block = f"{NOTE_TEXT}![Figure {i}]({target})\n\n"
+        if i % 10 == 0:
+            block += f"<!-- ![old]({target}) -->\n\n"
+        parts.append(block)
+        size += len(block)
+        i += 1
+    return "".join(parts)
+
+
+def replace_per_target(text: str, target: str, replacement: str) -> str:
+    """
+    The rewrite used before: the whole text is rebuilt for every target.
+    """
+    result: list[str] = []
+    i = 0
+    length = len(text)
+
+    while i < length:
+        comment_start = text.find(COMMENT_OPEN, i)
+        if comment_start == -1:
+            comment_start = length
+
+        segment = text[i:comment_start]
+        if target in segment:
+            segment = segment.replace(target, replacement)
+        result.append(segment)
+
+        if comment_start >= length:
+            break
+
+        comment_end = text.find(COMMENT_CLOSE, comment_start + 4)
+        if comment_end == -1:
+            comment_end = length
+
+        result.append(text[comment_start: comment_end + 3])
+        i = comment_end + 3
+
+    return "".join(result)
+
+
+def bench_before(document: str, replacements: dict[str, str]) -> tuple[float, str]:
+    start = time.perf_counter()
+    content = document
+    for target, replacement in replacements.items():
+        content = replace_per_target(content, target, replacement)
+    return time.perf_counter() - start, content
+
+
+def bench_after(document: str, replacements: dict[str, str]) -> tuple[float, str]:
+    start = time.perf_counter()
+    content = rewrite_links(document, replacements)
+    return time.perf_counter() - start, content
+
+
+def main() -> None:
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE_MB
+    targets = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_TARGETS
+
+    document = make_document(size_mb, targets)
+    replacements = {
+        f"imgs/figure-{i}.png": f"../assets/chapter/imgs/figure-{i}.png"
+        for i in range(targets)
+    }
+
+    before, before_content = bench_before(document, replacements)
+    after, after_content = bench_after(document, replacements)
+
+    print(f"link rewrite, {len(document) / 1024 / 1024:.0f} MB, "
+          f"{targets} targets")
+    print(f"  before (one pass per target): {before:8.2f} s")
+    print(f"  after  (single splice pass):  {after:8.2f} s")
+    print(f"  same output: {before_content == after_content}")
+    if after > 0:
+        print(f"  speedup: x{before / after:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.utils import (  # noqa: E402
+    _read_mapped_drives,
+    invalidate_mapped_drives,
+    normalize_unc_path,
+)
+
+###############
+# Description #
+###############
+"""
+Micro-benchmark of normalize_unc_path.
+
+"before": the mapped drives table is read with `net use` on every call,
+          as normalize_unc_path did before the table was cached.
+"after":  the cached table is used.
+
+The table comes from `net use`, so the benchmark only runs on Windows:
+elsewhere normalize_unc_path never reads it and there is nothing to
+compare.
+
+Run it with: python benchmarks/bench_normalize_unc_path.py [CALLS]
+"""
+
+###########
+# Defines #
+###########
+DEFAULT_CALLS = 200
+SAMPLE_PATH = str(ROOT / "vault" / "main-arg1" / "main.main-arg1.first-note.md")
+
+
+def _per_call_us(func: object, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()  # type: ignore[operator]
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def bench_before(calls: int) -> float:
+    def call() -> None:
+        _read_mapped_drives()
+        normalize_unc_path(SAMPLE_PATH)
+
+    return _per_call_us(call, calls)
+
+
+def bench_after(calls: int) -> float:
+    invalidate_mapped_drives()
+    normalize_unc_path(SAMPLE_PATH)  # load the table once
+
+    return _per_call_us(lambda: normalize_unc_path(SAMPLE_PATH), calls)
+
+
+def main() -> None:
+    if os.name != "nt":
+        print("normalize_unc_path: skipped, the mapped drives are read "
+              "only on Windows")
+        return
+
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CALLS
+
+    before = bench_before(calls)
+    after = bench_after(calls * 100)
+
+    print(f"normalize_unc_path, {calls} calls")
+    print(f"  before (net use per call): {before:10.2f} us/call")
+    print(f"  after  (cached table):     {after:10.2f} us/call")
+    if after > 0:
+        print(f"  speedup: x{before / after:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import src.config as config  # noqa: E402
+from benchmarks.synthetic_vault import (  # noqa: E402
+    VaultSpec,
+    generate_bank,
+    generate_vault,
+)
+from src.modes import CMode  # noqa: E402
+from src.note_index import INDEX_DIR_NAME  # noqa: E402
+
+###############
+# Description #
+###############
+"""
+Benchmark of every stage of the pipeline on synthetic vaults of growing
+size (see synthetic_vault.py), to follow how each stage scales and to
+compare the curves between commits.
+
+Stages (the DocScript functions they time):
+- get_all_files_from_main     reading main.md and every sub-main
+- find_broken_links           scan of the notes and check of their links
+- find_unused_assets          asset index and scan of the notes
+- fix_links_return_errors     rewrite of the broken links (notes restored
+                              after every run)
+- normalize_links_after_merge link normalization of a merged document
+- combine_and_execute         manifest, merge and build folder, with the
+                              pandoc conversion stubbed out
+- update_bank_files           --update of a bank of COLLABORATORS vaults
+
+Every stage is timed RUNS times "cold" (no .docscript index, no build
+folder, nothing cached in memory) and "warm" (the on-disk caches left by
+the previous run, like a second invocation of the CLI).
+
+The results, with the commit they were measured on, are written as JSON.
+
+Run it with (or as python -m benchmarks.bench_pipeline from the repo root):
+    python benchmarks/bench_pipeline.py [--notes 100 1000 5000] [--runs N]
+                                        [--output FILE] [--compare OLD.json]
+"""
+
+###########
+# Defines #
+###########
+DEFAULT_NOTES = [100, 1000, 5000]
+DEFAULT_RUNS = 3
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+BENCH_OUTPUT = "bench.pdf"
+
+
+# A vault (or bank) the stages run on
+@dataclass
+class Workspace:
+    vault: Path
+    bank: Path
+    spec: VaultSpec
+    jobs: int
+    # content and mtime of every note, to undo fix_links_return_errors
+    notes: dict[Path, tuple[bytes, int]]
+
+
+# Prepare a stage and return the function to time
+StageSetup = Callable[[Workspace], Callable[[], object]]
+
+
+def _context_for(vaultDir: Path, bankDir: Path, jobs: int) -> config.BuildContext:
+    """
+    Context of src.config on vaultDir and bankDir instead of the folders
+    next to DocScript, collaborator.md links start from the bank parent.
+    """
+    return config.BuildContext(
+        vault_dir=vaultDir, bank_dir=bankDir, links_base_dir=bankDir.parent, jobs=jobs
+    )
+
+
+def _reset_memory(ctx: config.BuildContext) -> None:
+    """
+    Forget the in-process caches, as a new invocation of the CLI would.
+    """
+    ctx.new_run()
+
+
+def _reset_disk(rootDir: Path) -> None:
+    """
+    Remove the on-disk caches of a vault (or bank).
+    """
+    for name in (INDEX_DIR_NAME, "build"):
+        shutil.rmtree(rootDir / name, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def _stub_pandoc() -> Iterator[None]:
+    """
+    Replace the conversion with empty outputs: no external tool is spawned.
+    """
+
+    def fake_conversion(_tmpl, _luaf, _pndo, src, dsts, *_args, **_kwargs) -> None:
+        if not isinstance(src, Path):
+            # the merged document piped to pandoc: the merge runs here
+            for _ in src:
+                pass
+        for dst in dsts:
+            Path(dst).write_bytes(b"")
+
+    original = config._execute_conversion
+    config._execute_conversion = fake_conversion
+    try:
+        yield
+    finally:
+        config._execute_conversion = original
+
+
+def _main_files() -> list[str]:
+    return config.get_all_files_from_main(CMode.ALL)
+
+
+def _restore_notes(ws: Workspace) -> None:
+    """
+    Put back the notes rewritten by fix_links_return_errors, with their mtime.
+    """
+    for path, (content, mtime_ns) in ws.notes.items():
+        if path.read_bytes() != content:
+            path.write_bytes(content)
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def stage_get_all_files_from_main(_ws: Workspace) -> Callable[[], object]:
+    return _main_files
+
+
+def stage_find_broken_links(ws: Workspace) -> Callable[[], object]:
+    files = _main_files()
+    return lambda: config.find_broken_links(files, ws.jobs)
+
+
+def stage_find_unused_assets(_ws: Workspace) -> Callable[[], object]:
+    files = _main_files()
+    return lambda: config.find_unused_assets(files)
+
+
+def stage_fix_links_return_errors(ws: Workspace) -> Callable[[], object]:
+    _restore_notes(ws)
+    config.current_context().drop_snapshots()
+    files = _main_files()
+    broken = config.find_broken_links(files, ws.jobs)
+    return lambda: config.fix_links_return_errors(broken)
+
+
+def stage_normalize_links_after_merge(ws: Workspace) -> Callable[[], object]:
+    files = _main_files()
+    config.create_build_dir()
+    combined = config.current_context().build_dir / config.COMB_FILE_NAME
+    with open(combined, "w", encoding="utf-8") as out:
+        for file in files:
+            out.writelines(config.iter_note_body(Path(file)))
+    return lambda: config.normalize_links_after_merge(
+        combined, str(ws.vault), str(ws.vault / "assets")
+    )
+
+
+def stage_combine_and_execute(_ws: Workspace) -> Callable[[], object]:
+    files = _main_files()
+    config.create_build_dir()
+    return lambda: config.combine_and_execute(
+        files, {}, config.CustomPaths(), config.BuildOptions(), BENCH_OUTPUT
+    )
+
+
+def stage_update_bank_files(ws: Workspace) -> Callable[[], object]:
+    return lambda: config.update_bank_files(ws.jobs)
+
+
+VAULT_STAGES: dict[str, StageSetup] = {
+    "get_all_files_from_main": stage_get_all_files_from_main,
+    "find_broken_links": stage_find_broken_links,
+    "find_unused_assets": stage_find_unused_assets,
+    "fix_links_return_errors": stage_fix_links_return_errors,
+    "normalize_links_after_merge": stage_normalize_links_after_merge,
+    "combine_and_execute": stage_combine_and_execute,
+}
+BANK_STAGES: dict[str, StageSetup] = {
+    "update_bank_files": stage_update_bank_files,
+}
+
+
+def time_stage(
+    ws: Workspace,
+    ctx: config.BuildContext,
+    setup: StageSetup,
+    cold: bool,
+) -> float:
+    """
+    Time one run of a stage on ctx, in milliseconds. Only the returned
+    function of setup is timed, its output is discarded.
+    """
+    with (
+        contextlib.redirect_stdout(io.StringIO()),
+        _stub_pandoc(),
+        config.use_context(ctx),
+    ):
+        if cold:
+            _reset_disk(ctx.root)
+        _reset_memory(ctx)
+        run = setup(ws)
+        start = time.perf_counter()
+        run()
+        elapsed = (time.perf_counter() - start) * 1000
+        # what the CLI does at the end of the run, for the warm runs
+        ctx.save_note_indexes()
+    return elapsed
+
+
+def bench_scale(
+    workDir: Path, spec: VaultSpec, stages: list[str], runs: int, jobs: int
+) -> list[dict[str, object]]:
+    """
+    Generate a vault and a bank of spec.notes notes and time every stage.
+    """
+    start = time.perf_counter()
+    vault = generate_vault(workDir / "vault", spec)
+    bank = generate_bank(workDir / "bank-root", spec)
+    print(
+        f"-- {spec.notes} notes (generated in " f"{time.perf_counter() - start:.1f} s)"
+    )
+
+    notes = {
+        path: (path.read_bytes(), path.stat().st_mtime_ns)
+        for path in vault.rglob("*.md")
+    }
+    ws = Workspace(vault, bank, spec, jobs, notes)
+
+    results = []
+    for name in stages:
+        if name in BANK_STAGES:
+            setup = BANK_STAGES[name]
+            ctx = _context_for(workDir / "no-vault", bank, jobs)
+        else:
+            setup = VAULT_STAGES[name]
+            ctx = _context_for(vault, workDir / "no-bank", jobs)
+
+        cold_ms, warm_ms = [], []
+        for _ in range(runs):
+            cold_ms.append(time_stage(ws, ctx, setup, cold=True))
+            warm_ms.append(time_stage(ws, ctx, setup, cold=False))
+
+        result = {
+            "stage": name,
+            "notes": spec.notes,
+            "cold_ms": statistics.median(cold_ms),
+            "warm_ms": statistics.median(warm_ms),
+            "cold_runs_ms": cold_ms,
+            "warm_runs_ms": warm_ms,
+        }
+        results.append(result)
+        print(
+            f"{name:<30} {spec.notes:>7} "
+            f"{result['cold_ms']:>10.1f} {result['warm_ms']:>10.1f}"
+        )
+
+    return results
+
+
+def git_commit() -> dict[str, object]:
+    """
+    Commit of the working tree being measured, None outside of a git clone.
+    """
+
+    def git(*args: str) -> str | None:
+        try:
+            result = subprocess.run(
+                ["git", *args], capture_output=True, text=True, cwd=ROOT
+            )
+        except OSError:
+            return None
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "subject": git("log", "-1", "--format=%s"),
+        "dirty": bool(status) if status is not None else None,
+    }
+
+
+def compare(results: list[dict[str, object]], oldPath: Path) -> None:
+    """
+    Print the ratio new/old of the median times of every stage.
+    """
+    with open(oldPath, encoding="utf-8") as f:
+        old = json.load(f)
+
+    old_times = {(r["stage"], r["notes"]): r for r in old["results"]}
+    print(f"\nCompared with {old.get('commit') or oldPath} (new / old)")
+    print(f"{'stage':<30} {'notes':>7} {'cold':>10} {'warm':>10}")
+    for result in results:
+        previous = old_times.get((result["stage"], result["notes"]))
+        if previous is None:
+            continue
+        ratios = [
+            result[key] / previous[key] if previous[key] else float("nan")
+            for key in ("cold_ms", "warm_ms")
+        ]
+        print(
+            f"{result['stage']:<30} {result['notes']:>7} "
+            f"{ratios[0]:>9.2f}x {ratios[1]:>9.2f}x"
+        )
+
+
+def main() -> None:
+    stage_names = [*VAULT_STAGES, *BANK_STAGES]
+    defaults = VaultSpec()
+
+    parser = argparse.ArgumentParser(description="DocScript pipeline benchmark")
+    parser.add_argument("--notes", type=int, nargs="+", default=DEFAULT_NOTES)
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--jobs", type=int, default=config.DEFAULT_JOBS)
+    parser.add_argument("--stages", nargs="+", choices=stage_names, default=stage_names)
+    for name, value in defaults.as_dict().items():
+        if name != "notes":
+            parser.add_argument(
+                f"--{name.replace('_', '-')}", type=type(value), default=value
+            )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="JSON results (default: benchmarks/results/)",
+    )
+    parser.add_argument(
+        "--compare", type=Path, default=None, help="JSON results of another commit"
+    )
+    parser.add_argument(
+        "--work-dir",
+        type=Path,
+        default=None,
+        help="where the vaults are generated (kept)",
+    )
+    opts = parser.parse_args()
+
+    work_dir = opts.work_dir or Path(tempfile.mkdtemp(prefix="docscript-bench-"))
+    commit = git_commit()
+    spec_args = {
+        name: getattr(opts, name) for name in defaults.as_dict() if name != "notes"
+    }
+
+    print(f"{'stage':<30} {'notes':>7} {'cold ms':>10} {'warm ms':>10}")
+    results = []
+    try:
+        for notes in opts.notes:
+            spec = VaultSpec(notes=notes, **spec_args)
+            results.extend(
+                bench_scale(work_dir, spec, opts.stages, opts.runs, opts.jobs)
+            )
+    finally:
+        if opts.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        **commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "runs": opts.runs,
+        "jobs": opts.jobs,
+        "spec": spec_args,
+        "results": results,
+    }
+
+    output = opts.output
+    if output is None:
+        short = (commit["commit"] or "nogit")[:10]
+        output = RESULTS_DIR / f"pipeline-{short}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written in {output}")
+
+    if opts.compare is not None:
+        compare(results, opts.compare)
+
+
+if __name__ == "__main__":
+    main()
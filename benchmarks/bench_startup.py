@@ -0,0 +1,110 @@
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+ENTRY_POINT = ROOT / "DocScript.py"
+
+###############
+# Description #
+###############
+"""
+Startup benchmark of the CLI, one line per command.
+
+Every command is run RUNS times in a fresh interpreter with
+`python -X importtime`, the best run is reported:
+- wall:    time of the whole process
+- imports: time spent importing modules (sum of the top level imports)
+- src:     the slowest src.* modules of that run
+
+The commands are chosen to stop right after the startup (e.g. -a with an
+invalid output), -L runs the linter on the current vault if there is one.
+
+Run it with: python benchmarks/bench_startup.py [--runs N] [--max-ms MS]
+With --max-ms the exit status is 1 if the imports of a command take longer,
+so that startup regressions are caught.
+"""
+
+###########
+# Defines #
+###########
+DEFAULT_RUNS = 5
+COMMANDS = [
+    ["-v"],
+    ["-h"],
+    ["-L"],
+    ["-a", "startup-bench.invalid"],
+]
+
+
+def parse_importtime(stderr: str) -> tuple[float, dict[str, float]]:
+    """
+    Return the total import time and the cumulative time of every
+    src.* module, in milliseconds, from the -X importtime report.
+    """
+    total = 0.0
+    src_modules: dict[str, float] = {}
+
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name_field = line.split("|")
+        name = name_field.strip()
+        depth = (len(name_field) - len(name_field.lstrip()) - 1) // 2
+        cumulative_ms = int(cumulative) / 1000
+
+        if depth == 0:
+            total += cumulative_ms
+        if name.startswith("src."):
+            src_modules[name] = cumulative_ms
+
+    return total, src_modules
+
+
+def run_command(args: list[str]) -> tuple[float, float, dict[str, float], int]:
+    """
+    Run DocScript once, return wall time, import time, src modules and
+    the exit status.
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", str(ENTRY_POINT), *args],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+    )
+    wall = (time.perf_counter() - start) * 1000
+    imports, src_modules = parse_importtime(result.stderr)
+    return wall, imports, src_modules, result.returncode
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="DocScript startup benchmark")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--max-ms", type=float, default=None)
+    opts = parser.parse_args()
+
+    over_budget = []
+    print(f"{'command':<32} {'wall ms':>9} {'imports ms':>11}  slowest src modules")
+
+    for args in COMMANDS:
+        runs = [run_command(args) for _ in range(opts.runs)]
+        wall, imports, src_modules, status = min(runs, key=lambda r: r[0])
+
+        slowest = sorted(src_modules.items(), key=lambda m: -m[1])[:3]
+        modules = ", ".join(f"{name} {ms:.1f}" for name, ms in slowest)
+        command = " ".join(args) + ("" if status == 0 else f" (exit {status})")
+        print(f"{command:<32} {wall:9.1f} {imports:11.1f}  {modules}")
+
+        if opts.max_ms is not None and imports > opts.max_ms:
+            over_budget.append(command)
+
+    if over_budget:
+        print(f"Over the {opts.max_ms:.0f} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import argparse
+import random
+import shutil
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+###############
+# Description #
+###############
+"""
+Generator of synthetic vaults and banks, used by the pipeline benchmark
+(bench_pipeline.py) and handy to try DocScript on a vault of any size.
+
+A vault has MACROS macro topics, each one is a folder with its notes split
+over DEPTH levels of sub-mains, named like the real ones:
+
+    main.md                                     -> notes of level 0, sub-main
+    m0/main.m0.n0.md
+    m0/main.m0.l1.main.md                       -> notes of level 1, sub-main
+    m0/l1/main.m0.l1.n1.md
+    m0/l1/main.m0.l1.l2.main.md                 -> ...
+    assets/m0/imgs/n0-0.png
+    assets/docfiles/logo.png
+
+Every note links ASSETS_PER_NOTE images of its own. A BROKEN_RATIO of the
+links are broken the way a moved note breaks them: the path is wrong but
+the file name is unique under assets/, so --fix-links (and the merge)
+can still resolve them. An UNUSED_RATIO of extra assets is never linked.
+
+A bank has COLLABORATORS collaborator vaults next to it, the notes are
+split among them and collaborator.md links their main.md.
+
+Run it with: python benchmarks/synthetic_vault.py OUT_DIR [--notes N] [--bank] ...
+"""
+
+###########
+# Defines #
+###########
+DEFAULT_SEED = 42
+ASSET_BYTES = b"\x89PNG\r\n\x1a\n" + bytes(256)  # small fake image
+NOTE_HEADER = (
+    '<!-- @import "[TOC]" {cmd="toc" depthFrom=1 depthTo=6} -->\n'
+    "<!-- code_chunk_output -->\n\n"
+    "<!-- /code_chunk_output -->\n"
+)
+NOTE_TEXT = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod\n"
+    "tempor incididunt ut labore et dolore magna aliqua. Ut enim ad minim.\n\n"
+)
+BANK_DIR_NAME = "bank"
+COLLAB_DIR_PREFIX = "collab-"
+
+
+# Shape of a synthetic vault (or bank)
+@dataclass
+class VaultSpec:
+    notes: int = 1000
+    macros: int = 4
+    depth: int = 2  # levels of sub-mains under each macro
+    assets_per_note: int = 3
+    broken_ratio: float = 0.1  # links with a wrong (but fixable) path
+    unused_ratio: float = 0.1  # extra assets never linked
+    collaborators: int = 4  # bank only
+    seed: int = DEFAULT_SEED
+
+    def as_dict(self) -> dict[str, int | float]:
+        return asdict(self)
+
+
+def _level_names(level: int) -> list[str]:
+    """
+    Folders (and sub-main name parts) of a level: l1, l2, ...
+    """
+    return [f"l{i}" for i in range(1, level + 1)]
+
+
+def _note_text(rng: random.Random, noteId: str, assetLinks: list[str]) -> str:
+    """
+    Body of a note: header, title, some text and its asset links,
+    every tenth note also has a commented out link and an external one.
+    """
+    parts = [NOTE_HEADER, f"\n# Note {noteId}\n\n"]
+    for i, link in enumerate(assetLinks):
+        parts.append(NOTE_TEXT * rng.randint(1, 3))
+        parts.append(f"![Figure {noteId}-{i}]({link})\n\n")
+
+    if rng.random() < 0.1:
+        parts.append(f"<!-- ![old]({assetLinks[0] if assetLinks else 'x.png'}) -->\n\n")
+        parts.append("See [the docs](https://example.com/docs#intro).\n\n")
+    parts.append(NOTE_TEXT)
+    return "".join(parts)
+
+
+def generate_vault(root: str | Path, spec: VaultSpec) -> Path:
+    """
+    Write a vault of spec.notes notes in root (wiped first), return root.
+    """
+    root = Path(root)
+    if root.exists():
+        shutil.rmtree(root)
+    root.mkdir(parents=True)
+
+    rng = random.Random(spec.seed)
+    macros = max(1, min(spec.macros, spec.notes))
+    levels = spec.depth + 1
+
+    # notes of every (macro, level), spread round robin
+    counts = [[0] * levels for _ in range(macros)]
+    for i in range(spec.notes):
+        counts[i % macros][(i // macros) % levels] += 1
+
+    assets_dir = root / "assets"
+    (assets_dir / "docfiles").mkdir(parents=True)
+    (assets_dir / "docfiles" / "logo.png").write_bytes(ASSET_BYTES)
+
+    main_lines = ["# Main\n\n"]
+    note_id = 0
+    for m in range(macros):
+        macro = f"m{m}"
+        imgs_dir = assets_dir / macro / "imgs"
+        imgs_dir.mkdir(parents=True)
+        # index file of each level: main.md, then the sub-mains
+        index_lines: list[list[str]] = [main_lines] + [[] for _ in range(spec.depth)]
+        index_lines[0].append(f"## {macro}\n\n")
+
+        for level in range(levels):
+            names = _level_names(level)
+            note_dir = root.joinpath(macro, *names)
+            note_dir.mkdir(parents=True, exist_ok=True)
+            # link of the notes from the index of this level
+            index_dir = root if level == 0 else note_dir.parent
+            to_assets = "../" * (level + 1) + f"assets/{macro}/imgs/"
+
+            for _ in range(counts[m][level]):
+                note_name = ".".join(["main", macro, *names, f"n{note_id}", "md"])
+                links = []
+                for k in range(spec.assets_per_note):
+                    asset_name = f"n{note_id}-{k}.png"
+                    (imgs_dir / asset_name).write_bytes(ASSET_BYTES)
+                    if rng.random() < spec.broken_ratio:
+                        links.append(f"imgs/{asset_name}")
+                    else:
+                        links.append(to_assets + asset_name)
+
+                (note_dir / note_name).write_text(
+                    _note_text(rng, str(note_id), links), encoding="utf-8"
+                )
+                rel = (note_dir / note_name).relative_to(index_dir).as_posix()
+                index_lines[level].append(f"- [Note {note_id}]({rel})\n")
+                note_id += 1
+
+            if level < spec.depth:
+                sub_names = _level_names(level + 1)
+                sub_main = note_dir / ".".join(
+                    ["main", macro, *sub_names, "main", "md"]
+                )
+                rel = sub_main.relative_to(index_dir).as_posix()
+                index_lines[level].append(f"- [{macro} {sub_names[-1]}]({rel})\n")
+
+        # sub-mains of this macro
+        for level in range(1, levels):
+            names = _level_names(level)
+            sub_main = root.joinpath(macro, *names[:-1]) / ".".join(
+                ["main", macro, *names, "main", "md"]
+            )
+            sub_main.write_text(
+                f"# {macro} {names[-1]}\n\n" + "".join(index_lines[level]),
+                encoding="utf-8",
+            )
+        main_lines.append("\n")
+
+    for i in range(int(spec.notes * spec.assets_per_note * spec.unused_ratio)):
+        (assets_dir / f"m{i % macros}" / "imgs" / f"unused-{i}.png").write_bytes(
+            ASSET_BYTES
+        )
+
+    (root / "main.md").write_text("".join(main_lines), encoding="utf-8")
+    return root
+
+
+def generate_bank(root: str | Path, spec: VaultSpec) -> Path:
+    """
+    Write spec.collaborators collaborator vaults and a bank linking them
+    in root (wiped first), return the bank folder.
+
+    collaborator.md links are relative to the parent of the folder
+    DocScript runs from: --update has to run from the bank folder.
+    """
+    root = Path(root)
+    if root.exists():
+        shutil.rmtree(root)
+    root.mkdir(parents=True)
+
+    collaborators = max(1, spec.collaborators)
+    lines = ["# Collaborators\n\n"]
+    for c in range(collaborators):
+        name = f"{COLLAB_DIR_PREFIX}{c}"
+        notes = spec.notes // collaborators + (c < spec.notes % collaborators)
+        collab_spec = VaultSpec(
+            **{**asdict(spec), "notes": notes, "seed": spec.seed + c}
+        )
+        generate_vault(root / name, collab_spec)
+        lines.append(f"## {name}\n\n- [main]({name}/main.md)\n\n")
+
+    bank_dir = root / BANK_DIR_NAME
+    (bank_dir / "assets").mkdir(parents=True)
+    (bank_dir / "collaborator.md").write_text("".join(lines), encoding="utf-8")
+    return bank_dir
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="DocScript synthetic vault")
+    parser.add_argument("out", type=Path)
+    parser.add_argument(
+        "--bank", action="store_true", help="write collaborator vaults and a bank"
+    )
+    defaults = VaultSpec()
+    for name, value in defaults.as_dict().items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}", type=type(value), default=value
+        )
+    opts = parser.parse_args()
+
+    spec = VaultSpec(**{name: getattr(opts, name) for name in defaults.as_dict()})
+    if opts.bank:
+        print(f"Bank written in {generate_bank(opts.out, spec)}")
+    else:
+        print(f"Vault written in {generate_vault(opts.out, spec)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+from dataclasses import replace
+
+from src import workflow
+from src.config import (
+    AssetsExtList,
+    BuildContext,
+    BuildOptions,
+    CustomPaths,
+    apply_build_overrides,
+    read_config_file,
+    use_context,
+)
+from src.errors import (
+    BankError,
+    BuildError,
+    ConfigError,
+    DocScriptError,
+    NotesError,
+    ToolchainError,
+    VaultError,
+)
+from src.modes import CMode
+from src.workflow import LintReport
+
+###############
+# Description #
+###############
+"""
+The contents of this file are the functions to use DocScript as a library,
+e.g. from a build server that keeps a single process warm:
+
+    from src.api import BuildContext, build
+
+    ctx = BuildContext(vault_dir=Path("/srv/notes/vault"))
+    build(ctx, CMode.ALL, "notes.pdf")
+
+Every function runs on the folders of its BuildContext (not on the vault
+next to DocScript), never changes the working directory of the process
+and raises a DocScriptError instead of ending it.
+Every call is a new run: it sees the vault as it is when the call starts
+(the tree snapshot and the note index are reloaded, see
+BuildContext.new_run), however long the process has been running.
+Calls can run at the same time, from threads (the context is local to
+the thread) or processes, on different vaults or on the same one:
+builds of the same output wait for each other (see src/build_lock.py),
+the others work in scratch folders of their own. Use a BuildContext per
+thread, a context shared by running calls is only reloaded more often.
+clean removes the caches the builds work in: call it while no build of
+the same vault runs.
+The progress is printed on stdout, like on the command line.
+"""
+
+__all__ = [
+    "AssetsExtList",
+    "BankError",
+    "BuildContext",
+    "BuildError",
+    "BuildOptions",
+    "CMode",
+    "ConfigError",
+    "CustomPaths",
+    "DocScriptError",
+    "LintReport",
+    "NotesError",
+    "ToolchainError",
+    "VaultError",
+    "build",
+    "build_plan",
+    "clean",
+    "fix_links",
+    "lint",
+    "update_bank",
+]
+
+
+def _read_config(ctx: BuildContext) -> tuple[CustomPaths, AssetsExtList]:
+    """
+    Fill the paths and asset extensions of ctx that are None from its .conf.
+    """
+    if ctx.custom_paths is None or ctx.assets_ext is None:
+        custom_paths, assets_ext = read_config_file()
+        if ctx.custom_paths is None:
+            ctx.custom_paths = custom_paths
+        if ctx.assets_ext is None:
+            ctx.assets_ext = assets_ext
+    return ctx.custom_paths, ctx.assets_ext
+
+
+def _build_paths(ctx: BuildContext, buildOpts: BuildOptions) -> CustomPaths:
+    """
+    Paths of a single build: those of ctx with the build options applied.
+    """
+    custom_paths = replace(_read_config(ctx)[0])
+    apply_build_overrides(cfgCstmPath=custom_paths, buildOpts=buildOpts)
+    return custom_paths
+
+
+def build(
+    ctx: BuildContext,
+    mode: CMode,
+    dst: str,
+    src: str | None = None,
+    buildOpts: BuildOptions | None = None,
+) -> None:
+    """
+    Convert the notes selected by mode (and src: the note of CMode.ONE,
+    the argument of CMode.GROUP) into dst, in the build folder of ctx.
+    """
+    if mode is CMode.NONE:
+        raise BuildError("Conversion request not applicable")
+
+    with use_context(ctx):
+        ctx.new_run()
+        workflow.validate_output(dst)
+        buildOpts = buildOpts or BuildOptions()
+        workflow.conversion_procedure(
+            mode, _build_paths(ctx, buildOpts), buildOpts, src=src, dst=dst)
+
+
+def build_plan(
+    ctx: BuildContext,
+    targets: list[tuple[CMode, str | None, str]],
+    buildOpts: BuildOptions | None = None,
+) -> None:
+    """
+    Build every target (mode, src, dst) of a plan, see build_plan_procedure.
+    The documents are converted in spawned processes: the main script of
+    the caller must be guarded by if __name__ == "__main__".
+    """
+    if not targets:
+        raise BuildError("No conversion to build")
+    if any(mode is CMode.NONE for mode, _, _ in targets):
+        raise BuildError("Conversion request not applicable")
+
+    with use_context(ctx):
+        ctx.new_run()
+        for _, _, dst in targets:
+            workflow.validate_output(dst)
+        buildOpts = buildOpts or BuildOptions()
+        workflow.build_plan_procedure(
+            targets, _build_paths(ctx, buildOpts), buildOpts)
+
+
+def lint(ctx: BuildContext) -> LintReport:
+    """
+    Return the notes missing from main.md, the broken links and the
+    unreferenced assets of the vault of ctx.
+    """
+    with use_context(ctx):
+        ctx.new_run()
+        _, assets_ext = _read_config(ctx)
+        return workflow.lint_vault(assets_ext, ctx.jobs)
+
+
+def fix_links(ctx: BuildContext) -> dict[str, list[str]]:
+    """
+    Fix the broken links of the vault of ctx, return those left broken.
+    """
+    with use_context(ctx):
+        ctx.new_run()
+        return workflow.fix_links(ctx.jobs)
+
+
+def update_bank(ctx: BuildContext) -> None:
+    """
+    Compose the main.md of the bank of ctx from its collaborators.
+    """
+    with use_context(ctx):
+        ctx.new_run()
+        workflow.update_bank(ctx.jobs)
+
+
+def clean(ctx: BuildContext) -> None:
+    """
+    Remove the build caches of ctx, the outputs are kept.
+    """
+    with use_context(ctx):
+        ctx.new_run()
+        workflow.clean_build()
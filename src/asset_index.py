@@ -0,0 +1,177 @@
+import os
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+###############
+# Description #
+###############
+"""
+The contents of this file are all the functions
+that index the files of a vault folder (usually assets/),
+so that links can be resolved without scanning the disk again.
+"""
+
+###########
+# Defines #
+###########
+ASSETS_SEGMENT = "assets"
+
+
+def _split_key(pathPart: str) -> list[str]:
+    """
+    Split a link path into its components, dropping '.', '..' and empty parts.
+    """
+    parts = pathPart.replace("\\", "/").split("/")
+    return [part for part in parts if part not in (".", "..", "")]
+
+
+def asset_key(pathPart: str) -> str:
+    """
+    Return the lookup key of a link path: everything after the 'assets'
+    segment if present, otherwise the path itself without '.' and '..'.
+
+    Example:
+        ../../assets/arg1/imgs/a.png  ->  arg1/imgs/a.png
+    """
+    parts = _split_key(pathPart)
+    if ASSETS_SEGMENT in parts:
+        parts = parts[parts.index(ASSETS_SEGMENT) + 1:]
+    return "/".join(parts)
+
+
+class AssetIndex:
+    """
+    In-memory index of every file under a root folder, built with a single
+    os.scandir walk. Lookups by relative path, by file name and by path
+    suffix are dictionary accesses.
+    """
+
+    def __init__(self, root: str | Path, skipDirs: tuple[str, ...] = ()) -> None:
+        self.root = Path(root)
+        self._skip_dirs = set(skipDirs)
+        self._by_rel: dict[str, Path] = {}
+        # every trailing part of a relative path -> relative paths ending with it
+        self._by_suffix: dict[str, list[str]] = {}
+        self._scan()
+
+    @classmethod
+    def from_files(
+        cls, root: str | Path, files: Iterable[tuple[str, str | Path]]
+    ) -> "AssetIndex":
+        """
+        Build the index from an already known list of
+        (relative path, absolute path), e.g. a VaultSnapshot, without
+        touching the disk.
+        """
+        index = cls.__new__(cls)
+        index.root = Path(root)
+        index._skip_dirs = set()
+        index._by_rel = {}
+        index._by_suffix = {}
+        for rel, path in files:
+            index._add(rel, Path(path))
+        return index
+
+    def _scan(self) -> None:
+        """
+        Walk the root folder once, without following symlinked directories.
+        """
+        if not self.root.is_dir():
+            return
+
+        stack: list[tuple[str, str]] = [(str(self.root), "")]
+        while stack:
+            dir_path, rel_dir = stack.pop()
+            try:
+                with os.scandir(dir_path) as entries:
+                    children = sorted(entries, key=lambda e: e.name)
+            except OSError:
+                continue
+
+            sub_dirs: list[tuple[str, str]] = []
+            for entry in children:
+                rel = f"{rel_dir}{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in self._skip_dirs:
+                        sub_dirs.append((entry.path, f"{rel}/"))
+                elif entry.is_file():
+                    self._add(rel, Path(entry.path))
+
+            # reversed so that folders are visited in alphabetical order
+            stack.extend(reversed(sub_dirs))
+
+    def _add(self, rel: str, path: Path) -> None:
+        self._by_rel[rel] = path
+        parts = rel.split("/")
+        for i in range(len(parts)):
+            self._by_suffix.setdefault("/".join(parts[i:]), []).append(rel)
+
+    def __len__(self) -> int:
+        return len(self._by_rel)
+
+    def __contains__(self, rel: object) -> bool:
+        return rel in self._by_rel
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._by_rel)
+
+    def items(self) -> Iterator[tuple[str, Path]]:
+        """
+        (relative path, absolute path) of every indexed file, in walk order.
+        """
+        return iter(self._by_rel.items())
+
+    def get(self, rel: str) -> Path | None:
+        """
+        Return the file with exactly this path relative to the root.
+        """
+        return self._by_rel.get(rel)
+
+    def find_by_name(self, name: str) -> list[Path]:
+        """
+        Return every file with this file name, in any folder.
+        """
+        return self.find_by_suffix(name.split("/")[-1])
+
+    def find_by_suffix(self, suffix: str) -> list[Path]:
+        """
+        Return every file whose relative path ends with the path components
+        of suffix (e.g. 'imgs/a.png' matches 'arg1/imgs/a.png').
+        """
+        key = "/".join(_split_key(suffix))
+        return [self._by_rel[rel] for rel in self._by_suffix.get(key, [])]
+
+    def resolve(self, pathPart: str) -> Path:
+        """
+        Resolve a link path to a single indexed file.
+
+        Resolution strategy (in order):
+        1. exact path relative to the root (after the 'assets' segment)
+        2. unique file whose path ends with that key
+        3. unique file with the same file name
+
+        Raise FileNotFoundError if nothing matches and ValueError
+        if more than one file matches.
+        """
+        key = asset_key(pathPart)
+        if not key:
+            raise FileNotFoundError(pathPart)
+
+        exact = self.get(key)
+        if exact is not None:
+            return exact
+
+        matches = self.find_by_suffix(key)
+        if not matches:
+            matches = self.find_by_name(key)
+
+        if len(matches) == 0:
+            raise FileNotFoundError(pathPart)
+
+        if len(matches) > 1:
+            raise ValueError(
+                f"Ambiguous asset reference '{pathPart}'. "
+                f"Multiple candidates found."
+            )
+
+        return matches[0]
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+from contextlib import suppress
+from pathlib import Path
+from typing import Any
+
+###############
+# Description #
+###############
+"""
+The contents of this file are all the functions
+that keep track of the inputs used by a conversion,
+so that an unchanged build can reuse the previous output.
+"""
+
+###########
+# Defines #
+###########
+MANIFEST_DIR_NAME = ".manifest"
+MANIFEST_VERSION = 1
+MISSING_DIGEST = "missing"
+_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(filePath: str | Path) -> str:
+    """
+    Return the sha256 of a file content, or MISSING_DIGEST if it does not exist.
+    """
+    file_path = str(filePath)
+
+    if not os.path.isfile(file_path):
+        return MISSING_DIGEST
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def compute_manifest(
+    notes: list[str],
+    assets: list[str],
+    configFiles: dict[str, str],
+    options: dict[str, str | None],
+) -> dict[str, Any]:
+    """
+    Build the manifest entry of a conversion.
+
+    - notes:       ordered list of notes, the order is part of the key
+    - assets:      every asset referenced by the notes
+    - configFiles: template, lua filter, yaml and pandoc defaults
+    - options:     extra values that change the output (e.g. the title)
+    """
+
+    return {
+        "notes": [[note, file_digest(note)] for note in notes],
+        "assets": {asset: file_digest(asset) for asset in sorted(set(assets))},
+        "config": {
+            key: [path, file_digest(path)] for key, path in sorted(configFiles.items())
+        },
+        "options": dict(sorted(options.items())),
+    }
+
+
+def _manifest_path(buildDir: str | Path, outputPath: str | Path) -> Path:
+    """
+    Every output has its own manifest file, so that concurrent builds of
+    different outputs never rewrite the same file.
+    """
+    return Path(buildDir) / MANIFEST_DIR_NAME / f"{Path(outputPath).name}.json"
+
+
+def load_manifest(buildDir: str | Path, outputPath: str | Path) -> dict[str, Any]:
+    """
+    Read the manifest entry of outputPath from buildDir.
+    A missing, unreadable or outdated manifest is treated as empty.
+    """
+    manifest_path = _manifest_path(buildDir, outputPath)
+
+    if not manifest_path.exists():
+        return {}
+
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return {}
+
+    inputs = data.get("inputs", {})
+    return inputs if isinstance(inputs, dict) else {}
+
+
+def is_up_to_date(
+    buildDir: str | Path, outputPath: str | Path, manifest: dict[str, Any]
+) -> bool:
+    """
+    True if outputPath exists and was produced from exactly the same inputs.
+    """
+    if not Path(outputPath).exists():
+        return False
+
+    return load_manifest(buildDir, outputPath) == manifest
+
+
+def store_manifest(
+    buildDir: str | Path, outputPath: str | Path, manifest: dict[str, Any]
+) -> None:
+    """
+    Save the manifest entry of outputPath.
+    The file is replaced atomically so an interrupted build cannot corrupt it.
+    """
+    manifest_path = _manifest_path(buildDir, outputPath)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = manifest_path.with_name(f"{manifest_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "inputs": manifest}, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+def invalidate_manifest(buildDir: str | Path, outputPath: str | Path) -> None:
+    """
+    Forget the manifest entry of outputPath so the next build runs in full.
+    """
+    with suppress(FileNotFoundError):
+        _manifest_path(buildDir, outputPath).unlink()
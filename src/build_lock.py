@@ -0,0 +1,150 @@
+import errno
+import os
+import sys
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+###############
+# Description #
+###############
+"""
+The contents of this file are all the functions
+that let several invocations (of several users, on a shared bank) build at
+the same time: advisory locks on the shared outputs and on the staging
+folder, and a unique name for the scratch folders of every invocation.
+
+The locks are taken from the operating system: POSIX record locks
+(lockf) on Linux and macOS, msvcrt.locking on Windows. Both are forwarded
+to the server by NFS and SMB/CIFS mounts, so users of different machines
+on a shared bank wait for each other too (flock is only local on most
+network filesystems). They are released when the process ends, even if
+it is killed, so a crashed build never leaves a stale lock behind. The
+lock files are never removed.
+
+POSIX locks belong to the process, not to the file descriptor: the
+threads of a process are serialized by a threading.Lock per lock file,
+which also keeps a single descriptor per lock file open (closing any
+descriptor of a file drops every POSIX lock of the process on it).
+"""
+
+###########
+# Defines #
+###########
+LOCKS_DIR_NAME = ".locks"  # One lock file per output name, in build/
+LOCK_FILE_NAME = ".lock"  # Lock of the staging folder
+_WINDOWS_RETRY_DELAY = 0.1  # seconds between two attempts on Windows
+
+# Lock of every lock file for the threads of this process
+_THREAD_LOCKS: dict[str, threading.Lock] = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+
+
+def new_job_id() -> str:
+    """
+    Name of the scratch folders of a single invocation: unique among the
+    processes of every machine sharing the bank.
+    """
+    return f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _thread_lock(lockPath: Path) -> threading.Lock:
+    key = os.path.normcase(os.path.abspath(lockPath))
+    with _THREAD_LOCKS_GUARD:
+        return _THREAD_LOCKS.setdefault(key, threading.Lock())
+
+
+def _try_lock(fd: int) -> bool:
+    if sys.platform == "win32":
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+    else:
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as exc:
+            if exc.errno in (errno.EACCES, errno.EAGAIN):
+                return False
+            raise
+    return True
+
+
+def _lock(fd: int) -> None:
+    if sys.platform == "win32":
+        # msvcrt.LK_LOCK gives up after 10 seconds
+        while not _try_lock(fd):
+            time.sleep(_WINDOWS_RETRY_DELAY)
+    else:
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+
+
+def _unlock(fd: int) -> None:
+    if sys.platform == "win32":
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.lockf(fd, fcntl.LOCK_UN)
+
+
+@contextmanager
+def exclusive_lock(lockPath: str | Path, waitingFor: str) -> Iterator[None]:
+    """
+    Hold the lock of lockPath for the with block, waiting for the other
+    holder (of this or of another process) to release it.
+    waitingFor tells the user who is holding it.
+    """
+    lock_path = Path(lockPath)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+
+    thread_lock = _thread_lock(lock_path)
+    waiting = not thread_lock.acquire(blocking=False)
+    if waiting:
+        print(f"Waiting for {waitingFor} to finish...")
+        thread_lock.acquire()
+    try:
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if not _try_lock(fd):
+                if not waiting:
+                    print(f"Waiting for {waitingFor} to finish...")
+                _lock(fd)
+            try:
+                yield
+            finally:
+                _unlock(fd)
+        finally:
+            os.close(fd)
+    finally:
+        thread_lock.release()
+
+
+def output_stem(name: str) -> str:
+    """
+    Outputs with the same stem (a.pdf, a.tex) share their intermediate
+    files (a.tex, a.aux, ...), so they are locked together.
+    """
+    return Path(name).stem
+
+
+@contextmanager
+def lock_outputs(buildDir: str | Path, names: list[str]) -> Iterator[None]:
+    """
+    Hold the locks of the outputs names of buildDir for the with block.
+    The locks are taken in order, so two builds never wait for each other
+    in a cycle.
+    """
+    with ExitStack() as stack:
+        for stem in sorted({output_stem(name) for name in names}):
+            stack.enter_context(exclusive_lock(
+                Path(buildDir) / LOCKS_DIR_NAME / f"{stem}.lock",
+                f"another build of '{stem}'"))
+        yield
@@ -1,25 +1,21 @@
+from __future__ import annotations
+
 import argparse
-import os
+import atexit
+import shlex
 import sys
+from typing import TYPE_CHECKING
 
-import pyfiglet
-
-from src import workflow
-from src.config import (
-    CustomPaths,
-    AssetsExtList,
-    BuildOptions,
-    check_config_file,
-    apply_build_overrides,
-)
+from src.errors import DocScriptError
 from src.modes import CMode
-from src.pandoc.runner import (
-    SUPPORTED_OUTPUT_EXTENSIONS,
-    SUPPORTED_OUTPUT_EXTENSIONS_TEXT,
-)
 from src.utils import safe_path
 from src.version import DOCSCRIPT_VERSION as DCV
 
+# pyfiglet, src.workflow and src.config are imported only by the commands
+# that need them, so that e.g. -v answers without loading the whole tool
+if TYPE_CHECKING:
+    from src.config import BuildOptions, CustomPaths
+
 ###############
 # Description #
 ###############
@@ -38,6 +34,8 @@ JUMP_CHECK_COMMANDS = {
     "help",
     "version",
     "fix-links",
+    "clean",
+    "daemon",
 }
 NEED_FS_COMMANDS = {
     "start",
@@ -47,6 +45,29 @@ NEED_FS_COMMANDS = {
     "convert-note",
     "convert-group",
     "convert-custom",
+    "convert-plan",
+}
+# Commands a running daemon (--daemon) serves instead of this process
+DAEMON_COMMANDS = {
+    "lint",
+    "fix-links",
+    "convert-all",
+    "convert-note",
+    "convert-group",
+    "convert-custom",
+    "convert-plan",
+}
+
+# Conversion options accepted in a --targets file, with their arguments
+TARGET_OPTIONS = {
+    "-a": (CMode.ALL, 1),
+    "--all": (CMode.ALL, 1),
+    "-g": (CMode.GROUP, 2),
+    "--group": (CMode.GROUP, 2),
+    "-n": (CMode.ONE, 2),
+    "--note": (CMode.ONE, 2),
+    "-c": (CMode.CUSTOM, 1),
+    "--custom": (CMode.CUSTOM, 1),
 }
 
 
@@ -93,6 +114,17 @@ def main() -> None:
         action="store_true",
         help="Automatic Fix of all links, run -L before this",
     )
+    group_standalone.add_argument(
+        "--clean",
+        action="store_true",
+        help="Remove the build caches (latexmk state, manifests, ...)",
+    )
+    group_standalone.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Stay resident and run the builds, -L and -fl of the other "
+        "invocations, without their startup cost",
+    )
     group_standalone.add_argument(
         "-h", "--help", action="store_true", help="Show this help message"
     )
@@ -108,8 +140,9 @@ def main() -> None:
         "-g",
         "--group",
         nargs=2,
+        action="append",
         metavar=("ARGUMENT", "OUTPUT"),
-        help="Convert a group of notes",
+        help="Convert a group of notes, repeat it to build several groups",
     )
     group_conversion.add_argument(
         "-n",
@@ -124,6 +157,12 @@ def main() -> None:
         metavar="OUTPUT",
         help="Custom conversion from a list in custom.md",
     )
+    group_conversion.add_argument(
+        "--targets",
+        metavar="FILE",
+        help="Build every conversion listed in FILE (one per line, "
+        "e.g. '-g arg out.pdf') in parallel",
+    )
 
     # -------------------------------
     # Gruppo 3: Additive Operation
@@ -147,16 +186,134 @@ def main() -> None:
         metavar="DOCUMENT_TITLE",
         help="Override document title for this conversion",
     )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="Keep running and rebuild the output when its notes change",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Keep the latexmk state in build/.aux/ between PDF builds",
+    )
+    parser.add_argument(
+        "--fragments",
+        action="store_true",
+        help="Convert each note to a cached LaTeX fragment (.pdf and .tex)",
+    )
+    parser.add_argument(
+        "--keep-intermediate",
+        action="store_true",
+        help="Write the merged notes in build/combined_notes.md "
+        "(otherwise they are piped to pandoc)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the time spent in every phase and write a Chrome trace "
+        "in build/.profile/",
+    )
+
+    # -------------------------------
+    # Gruppo 4: Lint Operation
+    # -------------------------------
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        metavar="N",
+        help="Number of notes (collaborators for -u) analysed in parallel "
+        "by -L, -fl and -u (default: CPU count + 4, at most 32)",
+    )
 
     dispatch(parser)
 
 
-def dispatch(parser: argparse.ArgumentParser) -> None:
+def print_banner() -> None:
     """
-    Handle the arguments from cmd line
+    Print the DocScript banner (pyfiglet is slow to import)
+    """
+    import pyfiglet
+
+    print(pyfiglet.figlet_format("DocScript", font="slant"))
+
+
+def dispatch(
+    parser: argparse.ArgumentParser,
+    argv: list[str] | None = None,
+    served: bool = False,
+) -> None:
     """
+    Handle the arguments from cmd line (or argv, a request served by
+    the daemon when served is set), the errors of DocScript are printed
+    and end the command with exit status 1
+    """
+    try:
+        _dispatch(parser, argv, served)
+    except DocScriptError as exc:
+        print(f"Error: {exc}")
+        sys.exit(1)
+
+
+def _dispatch(
+    parser: argparse.ArgumentParser,
+    argv: list[str] | None,
+    served: bool,
+) -> None:
+    args = parser.parse_args(argv)
+
+    if args.help and not any(
+        [args.all, args.group, args.note, args.custom, args.targets]
+    ):
+        print_banner()
+        parser.print_help()
+        sys.exit(0)
+
+    # Check that the arguments are in the correct order without dependency errors
+    validate_args(args)
+
+    # Answered before loading the rest of the tool
+    if args.version:
+        print("DocScript v" + DCV)
+        return
 
-    args = parser.parse_args()
+    # A running daemon does the work, this process only prints its output
+    request = get_command(args)
+    daemon_request = (
+        request in DAEMON_COMMANDS and not args.watch and not args.profile
+    )
+    if served and not daemon_request:
+        print("Error: The daemon serves only conversions, -L and -fl "
+              "(without -w and --profile)")
+        sys.exit(1)
+    if not served and daemon_request:
+        from src.daemon import forward
+
+        status = forward(sys.argv[1:] if argv is None else argv)
+        if status is not None:
+            sys.exit(status)
+
+    from src import workflow
+
+    if args.profile:
+        from src.profiler import enable_profiling
+
+        enable_profiling()
+        # printed however the command ends (return or sys.exit)
+        atexit.register(workflow.report_profile)
+
+    from src.config import (
+        AssetsExtList,
+        BuildOptions,
+        CustomPaths,
+        apply_build_overrides,
+        read_config_file,
+        reset_run_state,
+    )
+    from src.links import DEFAULT_JOBS
+
+    jobs = DEFAULT_JOBS if args.jobs is None else args.jobs
 
     build_opts = BuildOptions(
         title=args.title,
@@ -164,26 +321,23 @@ def dispatch(parser: argparse.ArgumentParser) -> None:
         template=args.template,
         lua=args.lua,
         pandoc=args.pandoc,
+        incremental=args.incremental,
+        fragments=args.fragments,
+        keep_intermediate=args.keep_intermediate,
     )
 
-    if args.help and not any([args.all, args.group, args.note, args.custom]):
-        print(pyfiglet.figlet_format("DocScript", font="slant"))
-        parser.print_help()
-        sys.exit(0)
-
-    # Check that the arguments are in the correct order without dependency errors
-    validate_args(args)
+    # the files may have changed since the previous request
+    if served:
+        reset_run_state()
 
     # proceeds to read the configuration files only after a check
     # of the file system structure
-    request = get_command(args)
     if request not in JUMP_CHECK_COMMANDS:
         ConfigCustomPaths = CustomPaths()
         AssetsCustomExt = AssetsExtList()
         if request in NEED_FS_COMMANDS:
             # check the configuration file -> overwrite the defaults
-            check_config_file(cfgCstmPath=ConfigCustomPaths,
-                              sstCstmXt=AssetsCustomExt)
+            ConfigCustomPaths, AssetsCustomExt = read_config_file()
             # check cli options -> overwrite configuration file options
             apply_build_overrides(
                 cfgCstmPath=ConfigCustomPaths,
@@ -208,60 +362,151 @@ def dispatch(parser: argparse.ArgumentParser) -> None:
         return
     if args.update:
         print("update-bank")
-        workflow.update_bank()
-        return
-    if args.version:
-        print("DocScript v" + DCV)
+        workflow.update_bank(jobs)
         return
     if args.lint:
         print("Lint all links")
-        workflow.run_linter(AssetsCustomExt)
+        workflow.run_linter(AssetsCustomExt, jobs)
         return
     if args.fix_links:
         print("Automatic fix links")
-        workflow.fix_links()
+        workflow.fix_links(jobs)
+        return
+    if args.clean:
+        print("Clean build caches")
+        workflow.clean_build()
+        return
+    if args.daemon:
+        workflow.serve_daemon(
+            lambda requestArgv: dispatch(parser, requestArgv, served=True))
         return
     # -------------------------------
     # Group 2
     # -------------------------------
     if args.note:
         cMode = CMode.ONE
-        validate_output(args.note[1])
-        workflow.conversion_procedure(
-            cMode, ConfigCustomPaths, build_opts, src=args.note[0], dst=args.note[1]
+        run_conversion(
+            args, cMode, ConfigCustomPaths, build_opts,
+            src=args.note[0], dst=args.note[1]
         )
         return
-    if args.group:
+    if args.group and len(args.group) == 1:
         cMode = CMode.GROUP
-        validate_output(args.group[1])
-        workflow.conversion_procedure(
-            cMode,
-            ConfigCustomPaths,
-            build_opts,
-            src=args.group[0],
-            dst=args.group[1],
+        run_conversion(
+            args, cMode, ConfigCustomPaths, build_opts,
+            src=args.group[0][0], dst=args.group[0][1]
         )
         return
+    if args.group or args.targets:
+        if args.targets:
+            targets = read_targets_file(args.targets)
+        else:
+            targets = [(CMode.GROUP, src, dst) for src, dst in args.group]
+        run_build_plan(args, targets, ConfigCustomPaths, build_opts)
+        return
     if args.all:
         cMode = CMode.ALL
-        validate_output(args.all)
-        workflow.conversion_procedure(
-            cMode, ConfigCustomPaths, build_opts, src=None, dst=args.all
+        run_conversion(
+            args, cMode, ConfigCustomPaths, build_opts, src=None, dst=args.all
         )
         return
     if args.custom:
         cMode = CMode.CUSTOM
-        validate_output(args.custom)
-        workflow.conversion_procedure(
-            cMode, ConfigCustomPaths, build_opts, src=None, dst=args.custom
+        run_conversion(
+            args, cMode, ConfigCustomPaths, build_opts, src=None, dst=args.custom
         )
         return
 
-    print(pyfiglet.figlet_format("DocScript", font="slant"))
+    print_banner()
     parser.print_help()
     sys.exit(0)
 
 
+def run_conversion(
+    args: argparse.Namespace,
+    cMode: CMode,
+    cfgCstmPath: CustomPaths,
+    buildOpts: BuildOptions,
+    src: str | None,
+    dst: str,
+) -> None:
+    """
+    Validate the output and start the conversion, once or in watch mode
+    """
+    from src import workflow
+
+    workflow.validate_output(dst)
+
+    if args.watch:
+        workflow.watch_procedure([(cMode, src, dst)], cfgCstmPath, buildOpts)
+    else:
+        workflow.conversion_procedure(
+            cMode, cfgCstmPath, buildOpts, src=src, dst=dst
+        )
+
+
+def run_build_plan(
+    args: argparse.Namespace,
+    targets: list[tuple[CMode, str | None, str]],
+    cfgCstmPath: CustomPaths,
+    buildOpts: BuildOptions,
+) -> None:
+    """
+    Validate every output and build all the targets, once or in watch mode
+    """
+    from src import workflow
+
+    if not targets:
+        print("Error: No conversion to build")
+        sys.exit(1)
+
+    for _, _, dst in targets:
+        workflow.validate_output(dst)
+
+    if args.watch:
+        workflow.watch_procedure(targets, cfgCstmPath, buildOpts)
+    else:
+        workflow.build_plan_procedure(targets, cfgCstmPath, buildOpts)
+
+
+def read_targets_file(targetsFile: str) -> list[tuple[CMode, str | None, str]]:
+    """
+    Read a build plan: one conversion per line, written like on the
+    command line (-a OUTPUT, -g ARGUMENT OUTPUT, -n NOTE OUTPUT, -c OUTPUT).
+    Empty lines and lines starting with # are ignored.
+    """
+    targets_path = safe_path(targetsFile)
+    if not targets_path.is_file():
+        print(f"Error: The targets file '{targetsFile}' does not exist.")
+        sys.exit(1)
+
+    targets: list[tuple[CMode, str | None, str]] = []
+    with open(targets_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            try:
+                words = shlex.split(line, comments=True)
+            except ValueError as e:
+                print(f"Error: {targetsFile}:{line_number}: {e}")
+                sys.exit(1)
+
+            if not words:
+                continue
+
+            option = TARGET_OPTIONS.get(words[0])
+            if option is None or len(words) != option[1] + 1:
+                print(
+                    f"Error: {targetsFile}:{line_number}: expected "
+                    "-a OUTPUT, -g ARGUMENT OUTPUT, -n NOTE OUTPUT or -c OUTPUT"
+                )
+                sys.exit(1)
+
+            mode, nargs = option
+            src = words[1] if nargs == 2 else None
+            targets.append((mode, src, words[-1]))
+
+    return targets
+
+
 def validate_args(args: argparse.Namespace) -> None:
     """
     Validate the coherence of the arguments
@@ -276,6 +521,8 @@ def validate_args(args: argparse.Namespace) -> None:
         args.version,
         args.lint,
         args.fix_links,
+        args.clean,
+        args.daemon,
     ]
 
     conversion_ops = [
@@ -283,6 +530,7 @@ def validate_args(args: argparse.Namespace) -> None:
         args.group,
         args.note,
         args.custom,
+        args.targets,
     ]
 
     additive_opts = [
@@ -291,6 +539,10 @@ def validate_args(args: argparse.Namespace) -> None:
         args.lua,
         args.pandoc,
         args.title,
+        args.watch,
+        args.incremental,
+        args.fragments,
+        args.keep_intermediate,
     ]
 
     active_standalone = sum(1 for op in standalone_ops if op)
@@ -299,8 +551,8 @@ def validate_args(args: argparse.Namespace) -> None:
     # standalone + conversion forbidden
     if active_standalone > 0 and active_conversion > 0:
         print(
-            "Error: Operations -i, -ib, -s, -u, -v, -h -L -fl"
-            "cannot be combined with -a, -g, -n, -c"
+            "Error: Operations -i, -ib, -s, -u, -v, -h -L -fl --clean --daemon "
+            "cannot be combined with -a, -g, -n, -c, --targets"
         )
         sys.exit(1)
 
@@ -308,23 +560,14 @@ def validate_args(args: argparse.Namespace) -> None:
     if any(additive_opts) and active_conversion == 0:
         print(
             "Error: Additional options "
-            "(-y, -t, -l, -p, -T) "
+            "(-y, -t, -l, -p, -T, -w, --incremental, --fragments, "
+            "--keep-intermediate) "
             "require a conversion operation"
         )
         sys.exit(1)
 
-
-def validate_output(output: str | None) -> None:
-    """
-    Verify that the output file has a supported extension.
-    If it is not valid, terminate the program.
-    """
-    outPath = safe_path(str(output))
-    ext = os.path.splitext(outPath)[1].lower()
-    if ext not in SUPPORTED_OUTPUT_EXTENSIONS:
-        print(
-            f"Error: The output file '{output}' must be {SUPPORTED_OUTPUT_EXTENSIONS_TEXT}"
-        )
+    if args.jobs is not None and args.jobs < 1:
+        print("Error: -j, --jobs must be at least 1")
         sys.exit(1)
 
 
@@ -348,10 +591,16 @@ def get_command(args: argparse.Namespace) -> str:
         return "convert-note"
     if args.custom:
         return "convert-custom"
+    if args.targets:
+        return "convert-plan"
     if args.version:
         return "version"
     if args.lint:
         return "lint"
     if args.fix_links:
         return "fix-links"
+    if args.clean:
+        return "clean"
+    if args.daemon:
+        return "daemon"
     return "help"
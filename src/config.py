@@ -1,16 +1,65 @@
+import hashlib
+import json
 import os
 import re
 import shutil
-import sys
-import ast
-from dataclasses import dataclass
+import subprocess
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from functools import cache
 from pathlib import Path
 
+from src.asset_index import AssetIndex
+from src.build_cache import (
+    MANIFEST_DIR_NAME,
+    compute_manifest,
+    invalidate_manifest,
+    is_up_to_date,
+    store_manifest,
+)
+from src.build_lock import (
+    LOCK_FILE_NAME,
+    exclusive_lock,
+    lock_outputs,
+    new_job_id,
+    output_stem,
+)
+from src.errors import (
+    BankError,
+    BuildError,
+    ConfigError,
+    NotesError,
+    VaultError,
+)
+from src.links import (
+    DEFAULT_JOBS,
+    NoteLinks,
+    extract_links_outside_comments,
+    is_external_link,
+    is_sub_main,
+    link_path_part,
+    rewrite_links,
+)
 from src.modes import CMode
+from src.note_index import INDEX_DIR_NAME, NoteIndex
+from src.pandoc.latex_format import forget_format_failures
 from src.pandoc.runner import (
+    AST_DIR_NAME,
+    AUX_DIR_NAME,
+    FRAGMENTS_DIR_NAME,
+    LATEX_OUTPUT_EXTENSIONS,
     SUPPORTED_OUTPUT_EXTENSIONS,
+    MarkdownSource,
+    compile_fragments,
     execute_pandoc,
+    execute_pandoc_multi,
 )
+from src.pandoc.toolchain import probe_toolchain
+from src.profiler import phase
+from src.staging import STAGING_MANIFEST_DIR_NAME, collect_tree, sync_tree
 from src.utils import (
     convert_link_to_absolute,
     copy_dir_recursive,
@@ -21,6 +70,7 @@ from src.utils import (
     should_skip_file,
     write_file,
 )
+from src.vault_snapshot import VaultSnapshot
 
 ###############
 # Description #
@@ -33,16 +83,8 @@ that interact with the filesystem.
 ###########
 # Defines #
 ###########
-_PRJ_CONFIG_FILE = Path(__file__).resolve()  # /config.py
-_PRJ_SRC_DIR = _PRJ_CONFIG_FILE.parent  # /src
-_PRJ_ROOT_DIR = _PRJ_SRC_DIR.parent  # /DocScript
-_PRJ_PARENT_DIR = _PRJ_ROOT_DIR.parent  # /MyPersonalDocs
-_HOME_DIR = Path.home()
 _APPL_NAME = "DocScript"
 
-_VAULT_DIR = Path(os.path.join(_PRJ_ROOT_DIR, "..", "vault")).resolve()
-_BANK_DIR = Path(os.path.join(_PRJ_ROOT_DIR, "..", "bank")).resolve()
-
 _INITIALIZE_DIR = "initialization"
 _INIT_V_DIR = "init-vault"
 _INIT_B_DIR = "init-bank"
@@ -52,9 +94,10 @@ _USR_CONF_DIR = "config-files"
 _BUILD_DIR = "build"
 _TEMPORARY_DIR = "rusco"
 _ASSETS_DIR = "assets"
-_DFLT_CONFIG_DIR = Path(os.path.join(_PRJ_ROOT_DIR, _CONFIG_DIR)).resolve()
-_APPL_DIR = Path(os.path.join(_HOME_DIR, "Documents", _APPL_NAME)).resolve()
 
+JOBS_DIR_NAME = ".jobs"  # Scratch folders of the parallel builds
+BANK_SECTIONS_FILE_NAME = "bank-sections.json"  # Cache of --update
+BANK_SECTIONS_VERSION = 1
 COLLAB_FILE_NAME = "collaborator.md"
 COMB_FILE_NAME = "combined_notes.md"
 NEW_NOTE_NAME = "default-note.md"  # Name of new note file
@@ -65,39 +108,8 @@ PANDOC_OPT_NAME = "default-pandoc-opt.yaml"  # Name of PANDOC option file
 CONFIG_FILE_NAME = ".conf"
 MAIN_FILE_NAME = "main.md"
 CUSTOM_FILE_NAME = "custom.md"
-
-YAML_PATH = Path(os.path.join(_DFLT_CONFIG_DIR, YAML_NAME)).resolve()
-TEMPLATE_PATH = Path(os.path.join(_DFLT_CONFIG_DIR, TEMPLATE_NAME)).resolve()
-LUA_FILTER_PATH = Path(os.path.join(
-    _DFLT_CONFIG_DIR, LUA_FILTER_NAME)).resolve()
-NEW_NOTE_PATH = Path(os.path.join(_DFLT_CONFIG_DIR, NEW_NOTE_NAME)).resolve()
-PANDOC_OPT_PATH = Path(os.path.join(
-    _DFLT_CONFIG_DIR, PANDOC_OPT_NAME)).resolve()
-
-# Vault path
-CONFIG_DIR_VAULT_PATH = Path(
-    os.path.join(_VAULT_DIR, _CONFIG_DIR, CONFIG_FILE_NAME)
-).resolve()
-CONFIG_USR_V_FILES_DIR = Path(
-    os.path.join(_VAULT_DIR, _CONFIG_DIR, _USR_CONF_DIR)
-).resolve()
-INIT_V_PATH = Path(os.path.join(
-    _PRJ_ROOT_DIR, _INITIALIZE_DIR, _INIT_V_DIR)).resolve()
-SETUP_V_PATH = Path(
-    os.path.join(_PRJ_ROOT_DIR, _INITIALIZE_DIR, _SETUP_V_DIR)
-).resolve()
-BUILD_V_PATH = Path(os.path.join(_VAULT_DIR, _BUILD_DIR)).resolve()
-
-# Bank path
-CONFIG_DIR_BANK_PATH = Path(
-    os.path.join(_BANK_DIR, _CONFIG_DIR, CONFIG_FILE_NAME)
-).resolve()
-CONFIG_USR_B_FILES_DIR = Path(
-    os.path.join(_BANK_DIR, _CONFIG_DIR, _USR_CONF_DIR)
-).resolve()
-INIT_B_PATH = Path(os.path.join(
-    _PRJ_ROOT_DIR, _INITIALIZE_DIR, _INIT_B_DIR)).resolve()
-BUILD_B_PATH = Path(os.path.join(_BANK_DIR, _BUILD_DIR)).resolve()
+HEADER_END_MARKER = "<!-- /code_chunk_output -->"  # End of the note header
+YAML_CLOSING_PATTERN = re.compile(r"\n(---|\.\.\.)(?:\r?\n)")
 
 EXCLUDED_DIRS = [
     _ASSETS_DIR,
@@ -106,6 +118,9 @@ EXCLUDED_DIRS = [
     # _TEMPORARY_DIR
 ]
 
+# Folders never indexed when looking for assets
+INDEX_EXCLUDED_DIRS = (_BUILD_DIR, INDEX_DIR_NAME, ".git")
+
 EXCLUDED_FILES = [COMB_FILE_NAME, NEW_NOTE_NAME,
                   MAIN_FILE_NAME, CUSTOM_FILE_NAME]
 
@@ -121,6 +136,63 @@ ACCEPTED_ASSETS_EXT_DEFAULT = [
 ]
 
 
+# The folders of DocScript are computed on first use: importing this module
+# touches no file. Only the roots that can be symlinks are resolved (one
+# syscall each), every other path is a plain join of them.
+@cache
+def _project_root() -> Path:
+    """
+    /DocScript, the parent of src/.
+    """
+    return Path(__file__).resolve().parent.parent
+
+
+@cache
+def _default_vault_dir() -> Path:
+    """
+    /MyPersonalDocs/vault, next to DocScript.
+    """
+    return (_project_root().parent / "vault").resolve()
+
+
+@cache
+def _default_bank_dir() -> Path:
+    """
+    /MyPersonalDocs/bank, next to DocScript.
+    """
+    return (_project_root().parent / "bank").resolve()
+
+
+@cache
+def _default_staging_dir() -> Path:
+    """
+    ~/Documents/DocScript, the local folder where banks are converted.
+    """
+    return (Path.home() / "Documents" / _APPL_NAME).resolve()
+
+
+def _default_links_base_dir() -> Path:
+    """
+    Parent of the working directory, where the links of collaborator.md start.
+    """
+    return Path(os.getcwd()).parent
+
+
+def _default_config_dir() -> Path:
+    """
+    Default yaml, template, lua filter, note and pandoc options.
+    """
+    return _project_root() / _CONFIG_DIR
+
+
+def _initialization_dir(name: str) -> Path:
+    """
+    Template of a new vault (_INIT_V_DIR), of its surroundings
+    (_SETUP_V_DIR) or of a new bank (_INIT_B_DIR).
+    """
+    return _project_root() / _INITIALIZE_DIR / name
+
+
 # Manage all the non-default path if specified
 @dataclass
 class CustomPaths:
@@ -134,16 +206,17 @@ class CustomPaths:
         """
         Set Defaults if not initialized
         """
+        config_dir = _default_config_dir()
         if self.custom_teml_path is None:
-            self.custom_teml_path = str(TEMPLATE_PATH)
+            self.custom_teml_path = str(config_dir / TEMPLATE_NAME)
         if self.custom_luaf_path is None:
-            self.custom_luaf_path = str(LUA_FILTER_PATH)
+            self.custom_luaf_path = str(config_dir / LUA_FILTER_NAME)
         if self.custom_yaml_path is None:
-            self.custom_yaml_path = str(YAML_PATH)
+            self.custom_yaml_path = str(config_dir / YAML_NAME)
         if self.custom_new_note_path is None:
-            self.custom_new_note_path = str(NEW_NOTE_PATH)
+            self.custom_new_note_path = str(config_dir / NEW_NOTE_NAME)
         if self.custom_pandoc_opt_path is None:
-            self.custom_pandoc_opt_path = str(PANDOC_OPT_PATH)
+            self.custom_pandoc_opt_path = str(config_dir / PANDOC_OPT_NAME)
 
 
 # Manage the list of ext of file in assets
@@ -167,24 +240,178 @@ class BuildOptions:
     template: str | None = None
     lua: str | None = None
     pandoc: str | None = None
+    incremental: bool = False  # keep the latexmk state in build/.aux/
+    fragments: bool = False  # convert each note on its own, with a cache
+    keep_intermediate: bool = False  # write combined_notes.md, not only pipe it
+
+
+# Folders a run works on, by default the vault and bank next to DocScript.
+# Every function of this module uses the current context (see use_context),
+# so that several vaults can be built by the same process.
+@dataclass
+class BuildContext:
+    vault_dir: Path = field(default_factory=_default_vault_dir)
+    bank_dir: Path = field(default_factory=_default_bank_dir)
+    # local folder where banks are converted
+    staging_dir: Path = field(default_factory=_default_staging_dir)
+    # folder the links of collaborator.md start from
+    links_base_dir: Path = field(default_factory=_default_links_base_dir)
+    jobs: int = DEFAULT_JOBS
+    # None: read from the .conf of the vault (or bank), see read_config_file
+    custom_paths: CustomPaths | None = None
+    assets_ext: AssetsExtList | None = None
+    # answer of is_bank, checked on the disk once per run
+    _bank: bool | None = field(default=None, repr=False, compare=False)
+    # snapshot of the tree and note index of every root, loaded once per run
+    _snapshots: dict[str, VaultSnapshot] = field(
+        default_factory=dict, repr=False, compare=False)
+    _indexes: dict[str, NoteIndex] = field(
+        default_factory=dict, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.vault_dir = Path(self.vault_dir)
+        self.bank_dir = Path(self.bank_dir)
+        self.staging_dir = Path(self.staging_dir)
+        self.links_base_dir = Path(self.links_base_dir)
+
+    @property
+    def is_bank(self) -> bool:
+        if self._bank is None:
+            collab_file = safe_path(self.bank_dir, COLLAB_FILE_NAME)
+            self._bank = self.bank_dir.exists() and collab_file.exists()
+        return self._bank
+
+    def __getstate__(self) -> dict[str, object]:
+        # a worker process (see build_plan_procedure) takes its own
+        # snapshot and loads the index saved by the parent
+        state = dict(self.__dict__)
+        state["_snapshots"] = {}
+        state["_indexes"] = {}
+        return state
+
+    def forget(self) -> None:
+        """
+        Check again on the disk if this is a bank (e.g. after -ib).
+        """
+        self._bank = None
+
+    def new_run(self) -> None:
+        """
+        Start a new run (e.g. a call of src/api.py): what the previous one
+        learnt about the disk, bank or vault, tree snapshots and note
+        indexes, is dropped. The indexes are read again from the disk,
+        where the other runs (of any process) save them.
+        """
+        self.forget()
+        self.drop_snapshots()
+        self._indexes = {}
+
+    def snapshot(
+        self, rootDir: str | Path, skipDirs: tuple[str, ...] = ()
+    ) -> VaultSnapshot:
+        """
+        Return the snapshot of rootDir, walking it on the first call of the run.
+        """
+        key = str(rootDir)
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            with phase("scan vault"):
+                snapshot = VaultSnapshot(rootDir, skipDirs)
+            self._snapshots[key] = snapshot
+        return snapshot
+
+    def drop_snapshots(self) -> None:
+        """
+        Forget every snapshot: the next query walks the tree again.
+        To be called when the tree may have changed (watch mode, rewritten notes).
+        """
+        self._snapshots = {}
+
+    def note_index(self, rootDir: str | Path) -> NoteIndex:
+        """
+        Return the index of rootDir, loading it on the first call of the run.
+        """
+        key = str(rootDir)
+        index = self._indexes.get(key)
+        if index is None:
+            index = NoteIndex(rootDir)
+            self._indexes[key] = index
+        return index
+
+    def save_note_indexes(self) -> None:
+        """
+        Persist every index loaded by this run.
+        """
+        for index in list(self._indexes.values()):
+            index.save()
+
+    @property
+    def root(self) -> Path:
+        """
+        The bank if there is one, otherwise the vault.
+        """
+        return self.bank_dir if self.is_bank else self.vault_dir
+
+    @property
+    def build_dir(self) -> Path:
+        return self.root / _BUILD_DIR
+
+    @property
+    def assets_dir(self) -> Path:
+        return self.root / _ASSETS_DIR
+
+    @property
+    def config_file(self) -> Path:
+        return self.root / _CONFIG_DIR / CONFIG_FILE_NAME
+
+
+_CONTEXT: ContextVar[BuildContext | None] = ContextVar(
+    "docscript_context", default=None)
+# Context of the command line, created on first use
+_DEFAULT_CONTEXT: BuildContext | None = None
+
+
+def current_context() -> BuildContext:
+    """
+    Return the context set by use_context, the default one otherwise.
+    """
+    global _DEFAULT_CONTEXT
+
+    ctx = _CONTEXT.get()
+    if ctx is not None:
+        return ctx
+    if _DEFAULT_CONTEXT is None:
+        _DEFAULT_CONTEXT = BuildContext()
+    return _DEFAULT_CONTEXT
+
+
+@contextmanager
+def use_context(ctx: BuildContext) -> Iterator[BuildContext]:
+    """
+    Run the code of the with block (in this thread) on ctx.
+    """
+    token = _CONTEXT.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _CONTEXT.reset(token)
 
 
 def is_bank() -> bool:
     """
     Check if the directory is initialized like a data bank
     """
-
-    collab_file = safe_path(_BANK_DIR, COLLAB_FILE_NAME)
-    return _BANK_DIR.exists() and collab_file.exists()
+    return current_context().is_bank
 
 
 def is_vault() -> bool:
     """
     Check if the directory is initialized like a vault
     """
-    if os.path.exists(_VAULT_DIR):
+    vault_dir = current_context().vault_dir
+    if os.path.exists(vault_dir):
         # Read the content of the vault directory
-        vault_contents = os.listdir(_VAULT_DIR)
+        vault_contents = os.listdir(vault_dir)
 
         # Check of an alredy initialized repository
         # don't delete what already exists
@@ -207,7 +434,8 @@ def check_config_file(cfgCstmPath: CustomPaths, sstCstmXt=AssetsExtList) -> None
     """
 
     # check to see if you are in a database or personal vault
-    config_path_to_use = CONFIG_DIR_BANK_PATH if is_bank() else CONFIG_DIR_VAULT_PATH
+    ctx = current_context()
+    config_path_to_use = ctx.config_file
 
     if not os.path.exists(config_path_to_use):
         return
@@ -227,10 +455,7 @@ def check_config_file(cfgCstmPath: CustomPaths, sstCstmXt=AssetsExtList) -> None
                 key, value = match.groups()
                 # I need an absolute path: I use safe_path() with two arguments
                 # this way it resolves and becomes an absolute path.
-                if is_bank():
-                    path = safe_path(_BANK_DIR, _CONFIG_DIR, value)
-                else:
-                    path = safe_path(_VAULT_DIR, _CONFIG_DIR, value)
+                path = safe_path(ctx.root, _CONFIG_DIR, value)
 
                 if key == "template":
                     cfgCstmPath.custom_teml_path = add_new_teml(path)
@@ -249,6 +474,8 @@ def check_config_file(cfgCstmPath: CustomPaths, sstCstmXt=AssetsExtList) -> None
                 key, value = match.groups()
 
                 if key == "assets_ext":
+                    import ast  # slow to import, only needed here
+
                     try:
                         # ast.literal_eval moves '[".png", ".jpg"]' in [".png", ".jpg"]
                         parsed_list = ast.literal_eval(value)
@@ -260,6 +487,48 @@ def check_config_file(cfgCstmPath: CustomPaths, sstCstmXt=AssetsExtList) -> None
                 continue
 
 
+# Parsed .conf of the vault (or bank): its (mtime_ns, size), paths, extensions
+_CONFIG_FILES: dict[str, tuple[tuple[int, int] | None, CustomPaths, AssetsExtList]] = {}
+
+
+def read_config_file() -> tuple[CustomPaths, AssetsExtList]:
+    """
+    Return the custom paths and asset extensions of the .conf file
+    (see check_config_file). The file is parsed again only when it changes,
+    so that a resident process (--daemon) reads it once.
+    """
+    config_path = current_context().config_file
+    try:
+        st = os.stat(config_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = None
+
+    cached = _CONFIG_FILES.get(str(config_path))
+    if cached is None or cached[0] != stamp:
+        cfg_cstm_path, sst_cstm_xt = CustomPaths(), AssetsExtList()
+        check_config_file(cfgCstmPath=cfg_cstm_path, sstCstmXt=sst_cstm_xt)
+        cached = (stamp, cfg_cstm_path, sst_cstm_xt)
+        _CONFIG_FILES[str(config_path)] = cached
+
+    # copies: the build options override the paths of a single run
+    return replace(cached[1]), replace(cached[2])
+
+
+def reset_run_state() -> None:
+    """
+    Forget what this process learnt about the disk in the previous run
+    (vault or bank, tree snapshot), for a resident process (--daemon).
+    What is kept is checked again on every use: a note of the index
+    against its stat, the .conf against its stat and the toolchain probe
+    against PATH and the stat of the tools (see probe_toolchain).
+    """
+    global _DEFAULT_CONTEXT
+
+    # the snapshots of the previous run go with its context
+    _DEFAULT_CONTEXT = None
+
+
 def apply_build_overrides(
     cfgCstmPath: CustomPaths,
     buildOpts: BuildOptions,
@@ -291,12 +560,10 @@ def add_new_yaml(yamlFile: str | Path) -> str:
     yaml_file = str(yamlFile)
     ext = os.path.splitext(yaml_file)[1].lower()
     if ext not in [".yaml"]:
-        print(f"Error: Input file '{yaml_file}' must be .yaml.")
-        sys.exit(1)
+        raise ConfigError(f"Input file '{yaml_file}' must be .yaml.")
 
     if not os.path.exists(yaml_file):
-        print(f"Error: Infut file '{yaml_file}' not found.")
-        sys.exit(1)
+        raise ConfigError(f"Infut file '{yaml_file}' not found.")
 
     return yaml_file
 
@@ -308,12 +575,10 @@ def add_new_teml(templateFile: str | Path) -> str:
     template_file = str(templateFile)
     ext = os.path.splitext(template_file)[1].lower()
     if ext not in [".tex"]:
-        print(f"Error: Input file '{template_file}' must be .tex.")
-        sys.exit(1)
+        raise ConfigError(f"Input file '{template_file}' must be .tex.")
 
     if not os.path.exists(template_file):
-        print(f"Error: Input file '{template_file}' not found.")
-        sys.exit(1)
+        raise ConfigError(f"Input file '{template_file}' not found.")
 
     return template_file
 
@@ -325,12 +590,10 @@ def add_new_luaf(luaFile: str | Path) -> str:
     lua_file = str(luaFile)
     ext = os.path.splitext(lua_file)[1].lower()
     if ext not in [".lua"]:
-        print(f"Error: Input file '{lua_file}' must be .lua.")
-        sys.exit(1)
+        raise ConfigError(f"Input file '{lua_file}' must be .lua.")
 
     if not os.path.exists(lua_file):
-        print(f"Error: Input file '{lua_file}' not found.")
-        sys.exit(1)
+        raise ConfigError(f"Input file '{lua_file}' not found.")
 
     return lua_file
 
@@ -342,12 +605,10 @@ def add_new_start(startFile: str | Path) -> str:
     start_file = str(startFile)
     ext = os.path.splitext(start_file)[1].lower()
     if ext not in [".md"]:
-        print(f"Error: Input file '{start_file}' must be .md.")
-        sys.exit(1)
+        raise ConfigError(f"Input file '{start_file}' must be .md.")
 
     if not os.path.exists(start_file):
-        print(f"Error: Input file '{start_file}' not found.")
-        sys.exit(1)
+        raise ConfigError(f"Input file '{start_file}' not found.")
 
     return start_file
 
@@ -356,9 +617,9 @@ def chose_right_position(isBank: bool, file: str) -> Path:
     """
     Returns the path to the file, choosing the vault or bank directory
     """
-    if not isBank:
-        return safe_path(BUILD_V_PATH, file)
-    return safe_path(BUILD_B_PATH, file)
+    ctx = current_context()
+    root = ctx.bank_dir if isBank else ctx.vault_dir
+    return safe_path(root, _BUILD_DIR, file)
 
 
 def check_integrity() -> None:
@@ -366,36 +627,40 @@ def check_integrity() -> None:
     Verify the integrity of the setup folder so you can initialize
     and use the architecture.
     """
-    if not os.path.exists(INIT_V_PATH):
-        print(f"Error: Template directory: '{INIT_V_PATH}' does not exists.")
-        sys.exit(1)
+    init_v_path = _initialization_dir(_INIT_V_DIR)
+    if not os.path.exists(init_v_path):
+        raise VaultError(f"Template directory: '{init_v_path}' does not exists.")
 
-    if not os.path.exists(_DFLT_CONFIG_DIR):
-        print(
-            f"Error: config directory: '{_DFLT_CONFIG_DIR}' does not exists.")
-        sys.exit(1)
+    config_dir = _default_config_dir()
+    if not os.path.exists(config_dir):
+        raise VaultError(
+            f"config directory: '{config_dir}' does not exists.")
 
-    if not os.path.exists(SETUP_V_PATH):
-        print(f"Error: setup directory: '{SETUP_V_PATH}' does not exists.")
-        sys.exit(1)
+    setup_v_path = _initialization_dir(_SETUP_V_DIR)
+    if not os.path.exists(setup_v_path):
+        raise VaultError(f"setup directory: '{setup_v_path}' does not exists.")
 
 
 def create_vault_structure(BankFlag: bool = False) -> None:
     """
     Initialize the architecture starting from the initialization dir
     """
+    ctx = current_context()
+    vault_dir = ctx.vault_dir
+    bank_dir = ctx.bank_dir
+
     if not BankFlag:
         # ===============================
         #           VAULT ELAB
         # ===============================
-        copy_dir_recursive(INIT_V_PATH, _VAULT_DIR)
+        copy_dir_recursive(_initialization_dir(_INIT_V_DIR), vault_dir)
         # Write the main.md file with the first default references
         contenuto_main = """\
             # Argument 1
 
             - [ArgumentName1](main-arg1/main.main-arg1.first-note.md)
         """
-        write_file(Path(os.path.join(_VAULT_DIR, "main.md")
+        write_file(Path(os.path.join(vault_dir, "main.md")
                         ).resolve(), contenuto_main)
 
         # Write the custom.md file with the first default references
@@ -408,7 +673,7 @@ def create_vault_structure(BankFlag: bool = False) -> None:
         """
         write_file(
             Path(
-                os.path.join(_VAULT_DIR, "custom.md")
+                os.path.join(vault_dir, "custom.md")
             ).resolve(), contenuto_custom
         )
 
@@ -416,7 +681,8 @@ def create_vault_structure(BankFlag: bool = False) -> None:
 
         # Create user directory for configuration files
         print("Copying the pandoc configuration files...")
-        copy_dir_recursive(_DFLT_CONFIG_DIR, CONFIG_USR_V_FILES_DIR)
+        copy_dir_recursive(
+            _default_config_dir(), vault_dir / _CONFIG_DIR / _USR_CONF_DIR)
 
         # Write the .conf file with the default path
         # Use relative paths to ./config-files in the vault/config folder
@@ -436,19 +702,20 @@ def create_vault_structure(BankFlag: bool = False) -> None:
             .lua="{rel_lua_path}"
             .start="{rel_start_path}"
         """
-        write_file(CONFIG_DIR_VAULT_PATH, contenuto_conf)
+        write_file(vault_dir / _CONFIG_DIR / CONFIG_FILE_NAME, contenuto_conf)
 
         print("- .config Dir : ok")
 
         # Copy some usefull files out of vault/ dir
-        copy_dir_recursive(SETUP_V_PATH, _PRJ_PARENT_DIR)
+        copy_dir_recursive(_initialization_dir(_SETUP_V_DIR), vault_dir.parent)
         print("- VSCode Configuration files : ok\n")
 
     else:
         # ===============================
         #           BANK ELAB
         # ===============================
-        copy_dir_recursive(INIT_B_PATH, _BANK_DIR)
+        copy_dir_recursive(_initialization_dir(_INIT_B_DIR), bank_dir)
+        ctx.forget()  # the bank exists from now on
 
         # Write the custom.md file with the first default references
         contenuto_custom = """\
@@ -460,7 +727,7 @@ def create_vault_structure(BankFlag: bool = False) -> None:
         """
         write_file(
             Path(
-                os.path.join(_BANK_DIR, "custom.md")
+                os.path.join(bank_dir, "custom.md")
             ).resolve(), contenuto_custom
         )
 
@@ -468,7 +735,8 @@ def create_vault_structure(BankFlag: bool = False) -> None:
 
         # Create user directory for configuration files
         print("Copying the pandoc configuration files...")
-        copy_dir_recursive(_DFLT_CONFIG_DIR, CONFIG_USR_B_FILES_DIR)
+        copy_dir_recursive(
+            _default_config_dir(), bank_dir / _CONFIG_DIR / _USR_CONF_DIR)
 
         # I write the references relating to the config-files folder inside the vault
         rel_yaml_path = Path(os.path.join("./", _USR_CONF_DIR, YAML_NAME))
@@ -485,7 +753,7 @@ def create_vault_structure(BankFlag: bool = False) -> None:
             .template="{rel_template_path}"
             .lua="{rel_lua_path}"
         """
-        write_file(CONFIG_DIR_BANK_PATH, contenuto_conf)
+        write_file(bank_dir / _CONFIG_DIR / CONFIG_FILE_NAME, contenuto_conf)
 
         print("- .config Dir : ok\n")
 
@@ -508,21 +776,20 @@ def create_new_note(ConfigPath: CustomPaths, noteName: str | Path) -> None:
     starting_note = ConfigPath.custom_new_note_path
 
     if not os.path.exists(safe_path(str(starting_note))):
-        print(f"Error: Template file '{starting_note}' does not exist.")
-        sys.exit(1)
+        raise ConfigError(f"Template file '{starting_note}' does not exist.")
 
-    new_note_path = safe_path(_VAULT_DIR, note_name)
+    vault_dir = current_context().vault_dir
+    new_note_path = safe_path(vault_dir, note_name)
 
     # Check name like macro-arg/note-name.md
-    macro_argomento_dir = safe_path(_VAULT_DIR, note_name.split("/")[0])
+    macro_argomento_dir = safe_path(vault_dir, note_name.split("/")[0])
     if not os.path.exists(macro_argomento_dir) or not os.path.isdir(
         macro_argomento_dir
     ):
-        print(
-            f"Error: The macro-arg '{note_name.split('/')[0]}' does not exist. "
+        raise NotesError(
+            f"The macro-arg '{note_name.split('/')[0]}' does not exist. "
             "Create it before adding a note"
         )
-        sys.exit(1)
 
     # Check consistency name
     note_path = Path(note_name)
@@ -533,11 +800,10 @@ def create_new_note(ConfigPath: CustomPaths, noteName: str | Path) -> None:
         rf"main\.{re.escape(macro_name)}(?:\..+)?\.md",
         note_base_name,
     ):
-        print(
-            f"Error: The note name '{note_name}' is invalid. "
+        raise NotesError(
+            f"The note name '{note_name}' is invalid. "
             "Must follow 'folder/main.folder.<something>.md'."
         )
-        sys.exit(1)
 
     # Copy template and rename
     try:
@@ -548,40 +814,48 @@ def create_new_note(ConfigPath: CustomPaths, noteName: str | Path) -> None:
             new_note_file.write(content)
 
         print(f"Note created successfully: {new_note_path}")
-    except Exception as e:
-        print(f"Error creating note: {e}")
-        sys.exit(1)
+    except OSError as e:
+        raise NotesError(f"creating note: {e}") from e
+
+
+def _replace_text(filePath: Path, content: str) -> None:
+    """
+    Write filePath through a temporary file: a build running at the same
+    time reads either the old or the new content, never half of it.
+    """
+    tmp_path = filePath.with_name(f"{filePath.name}.{new_job_id()}.tmp")
+    try:
+        tmp_path.write_text(content, encoding="utf-8")
+        os.replace(tmp_path, filePath)
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
 
 def create_build_dir() -> None:
     """
     Create a build dir in the correct location
     """
-    if not is_bank():
-        if not os.path.exists(BUILD_V_PATH):
-            os.makedirs(BUILD_V_PATH)
-    else:
-        if not os.path.exists(BUILD_B_PATH):
-            os.makedirs(BUILD_B_PATH)
+    os.makedirs(current_context().build_dir, exist_ok=True)
 
 
 def get_all_files_from_root() -> list[str]:
     """
-    Read all the files .md in the vault
+    Read all the files .md in the vault, from the vault snapshot
     """
     matched_files = []
 
-    for root, dirs, files in os.walk(_VAULT_DIR):
-        dirs[:] = [d for d in dirs if not should_skip_dir(d, EXCLUDED_DIRS)]
-
-        for file in files:
-            if not file.endswith(".md"):
-                continue
-            if should_skip_file(file, EXCLUDED_FILES):
-                continue
+    vault_dir = current_context().vault_dir
+    snapshot = current_context().snapshot(vault_dir, INDEX_EXCLUDED_DIRS)
+    for _, full_path in snapshot.iter_files(
+        vault_dir, lambda d: should_skip_dir(d, EXCLUDED_DIRS)
+    ):
+        file = os.path.basename(full_path)
+        if not file.endswith(".md"):
+            continue
+        if should_skip_file(file, EXCLUDED_FILES):
+            continue
 
-            full_path = os.path.join(root, file)
-            matched_files.append(str(full_path))
+        matched_files.append(full_path)
 
     return matched_files
 
@@ -591,24 +865,33 @@ def _is_sub_main(filePath: str) -> bool:
     Check if a file is a sub-main.md file.
     Pattern: folder/main.folder.*.md
     """
-    filename = filePath.split("/")[-1]
+    return is_sub_main(filePath)
 
-    pattern = r"^main\.[^.]+\.[^.]+(?:\.[^.]+)*\.main\.md$"
 
-    return re.match(pattern, filename) is not None
+def _index_root() -> Path:
+    """
+    Return the folder where the note index is stored: the bank or the vault.
+    """
+    return current_context().root
 
 
-def _extract_markdown_links(line: str) -> list[str]:
+def vault_snapshot() -> VaultSnapshot:
     """
-    Extract markdown links from a line.
-
-    Example:
-        [Title](path/file.md)
+    Return the snapshot of the vault (or bank) tree, taken once per run.
+    Every existence check and listing of the vault goes through it.
     """
+    return current_context().snapshot(_index_root(), INDEX_EXCLUDED_DIRS)
 
-    matches = re.findall(r"\[[^\]]*\]\(([^)]+\.md)\)", line)
 
-    return matches
+def scan_vault_notes(files: list[str], jobs: int = DEFAULT_JOBS) -> list[NoteLinks]:
+    """
+    Return the links of every note, parsing only the notes that changed
+    since the last run (see NoteIndex).
+    """
+    snapshot = vault_snapshot()
+    with phase("scan notes", notes=len(files)):
+        index = current_context().note_index(_index_root())
+        return index.scan(files, jobs, snapshot.stat)
 
 
 def _read_main_files_recursive(
@@ -638,61 +921,52 @@ def _read_main_files_recursive(
 
     visited.add(abs_path)
 
-    # Must exist
-    if not mainMdPath.exists():
-        return []
+    snapshot = vault_snapshot()
 
-    # MUST be a file
-    if not mainMdPath.is_file():
+    # Must exist and MUST be a file
+    if not snapshot.is_file(mainMdPath):
         return []
 
     # MUST be markdown
     if mainMdPath.suffix != ".md":
         return []
 
-    # Read markdown safely
-    with open(mainMdPath, encoding="utf-8") as main_md_file:
-        main_md_content = main_md_file.readlines()
+    # Read markdown safely, through the note index
+    record = current_context().note_index(_index_root()).get(mainMdPath, snapshot.stat)
+    if record is None:
+        return []
 
     matching_files: list[str] = []
 
     main_dir = mainMdPath.parent
 
-    for line in main_md_content:
-
-        markdown_links = _extract_markdown_links(line)
-
-        for file_path in markdown_links:
+    for file_path in record.note_links:
 
-            # Resolve relative path
-            resolved_path = safe_path(
-                normalize_unc_path(
-                    str(safe_path(main_dir, str(file_path)).resolve()))
-            )
-
-            # Skip invalid paths
-            if not resolved_path.exists():
-                continue
+        # Resolve relative path
+        resolved_path = safe_path(
+            normalize_unc_path(
+                str(snapshot.resolve(safe_path(main_dir, str(file_path)))))
+        )
 
-            # Prevent opening directories
-            if not resolved_path.is_file():
-                continue
+        # Skip invalid paths and prevent opening directories
+        if not snapshot.is_file(resolved_path):
+            continue
 
-            # Skip non-markdown
-            if resolved_path.suffix != ".md":
-                continue
+        # Skip non-markdown
+        if resolved_path.suffix != ".md":
+            continue
 
-            # Expand recursively if sub-main
-            if _is_sub_main(resolved_path.name):
+        # Expand recursively if sub-main
+        if _is_sub_main(resolved_path.name):
 
-                sub_files = _read_main_files_recursive(
-                    resolved_path, vaultBase, visited
-                )
+            sub_files = _read_main_files_recursive(
+                resolved_path, vaultBase, visited
+            )
 
-                matching_files.extend(sub_files)
+            matching_files.extend(sub_files)
 
-            else:
-                matching_files.append(str(resolved_path))
+        else:
+            matching_files.append(str(resolved_path))
 
     return matching_files
 
@@ -704,40 +978,61 @@ def get_all_files_from_main(mode: CMode) -> list[str]:
     Recursively expands sub-main.md files while maintaining order.
     """
 
+    vault_dir = current_context().vault_dir
     modality = mode.name
     custom = False
     if modality == CMode.CUSTOM.name:
-        main_md_path = _VAULT_DIR / CUSTOM_FILE_NAME
+        main_md_path = vault_dir / CUSTOM_FILE_NAME
         custom = True
     else:
-        main_md_path = _VAULT_DIR / MAIN_FILE_NAME
+        main_md_path = vault_dir / MAIN_FILE_NAME
 
     # Check if exists
     if not os.path.exists(main_md_path):
         if custom:
-            print(
-                "Error: The custom.md file was not found "
+            raise NotesError(
+                "The custom.md file was not found "
                 f"in {os.path.dirname(main_md_path)}."
             )
-        else:
-            print(
-                "Error: The main.md file was not found "
-                f"in {os.path.dirname(main_md_path)} ."
-            )
-        sys.exit(1)
+        raise NotesError(
+            "The main.md file was not found "
+            f"in {os.path.dirname(main_md_path)} ."
+        )
 
     # Read files recursively, expanding sub-mains
-    matching_files = _read_main_files_recursive(main_md_path, _VAULT_DIR)
+    matching_files = _read_main_files_recursive(main_md_path, vault_dir)
 
     # If void file exit
     if not matching_files:
-        print(
-            f"Error: No files found in {'custom.md' if custom else 'main.md'}.")
-        sys.exit(1)
+        raise NotesError(
+            f"No files found in {'custom.md' if custom else 'main.md'}.")
 
     return matching_files
 
 
+def get_main_tree_files(mode: CMode) -> list[str]:
+    """
+    Return the files that decide which notes are converted by mode:
+    main.md (or custom.md) and every sub-main reached from it.
+    In a bank these are collaborator.md and the bank main.md (or custom.md).
+    """
+
+    index_name = CUSTOM_FILE_NAME if mode == CMode.CUSTOM else MAIN_FILE_NAME
+
+    ctx = current_context()
+    if ctx.is_bank:
+        return [
+            str(safe_path(ctx.bank_dir, COLLAB_FILE_NAME)),
+            str(safe_path(ctx.bank_dir, index_name)),
+        ]
+
+    main_md_path = ctx.vault_dir / index_name
+    visited: set[str] = set()
+    _read_main_files_recursive(main_md_path, ctx.vault_dir, visited)
+
+    return sorted(visited | {str(safe_path(main_md_path))})
+
+
 def get_all_files_from_bank(mode: CMode) -> tuple[list[str], dict[str, str]]:
     """
     Reads collaborator.md to build a map  name → collaborator main.md path.
@@ -747,10 +1042,10 @@ def get_all_files_from_bank(mode: CMode) -> tuple[list[str], dict[str, str]]:
     and a dictionary of active collaborators.
     """
 
-    collab_file = safe_path(_BANK_DIR, COLLAB_FILE_NAME)
+    bank_dir = current_context().bank_dir
+    collab_file = safe_path(bank_dir, COLLAB_FILE_NAME)
     if not collab_file.exists():
-        print(f"Error: '{collab_file}' not found.")
-        sys.exit(1)
+        raise BankError(f"'{collab_file}' not found.")
 
     # 1. collaborator.md  →  { name: absolute path of their main.md }
     all_collaborators: dict[str, str] = {}
@@ -764,24 +1059,22 @@ def get_all_files_from_bank(mode: CMode) -> tuple[list[str], dict[str, str]]:
             match = re.search(r"\[.*?\]\((.*?\.md)\)", line)
             if match and current_name:
                 raw = match.group(1)
-                abs_main = safe_path(_BANK_DIR, raw)
+                abs_main = safe_path(bank_dir, raw)
                 if not abs_main.exists():
-                    print(
-                        f"Error: main.md of '{current_name}' "
+                    raise BankError(
+                        f"main.md of '{current_name}' "
                         f"not found in '{abs_main}'."
                     )
-                    sys.exit(1)
                 all_collaborators[current_name] = str(abs_main)
 
     # 2. bank main.md / custom.md  →  sections and note links
     if mode == CMode.CUSTOM:
-        index_file = safe_path(_BANK_DIR, CUSTOM_FILE_NAME)
+        index_file = safe_path(bank_dir, CUSTOM_FILE_NAME)
     else:
-        index_file = safe_path(_BANK_DIR, MAIN_FILE_NAME)
+        index_file = safe_path(bank_dir, MAIN_FILE_NAME)
 
     if not index_file.exists():
-        print(f"Error: '{index_file}' not found.")
-        sys.exit(1)
+        raise BankError(f"'{index_file}' not found.")
 
     # Collect only the collaborators actually listed in the index file
     active_collaborators: list[str] = []
@@ -841,8 +1134,7 @@ def get_all_files_from_bank(mode: CMode) -> tuple[list[str], dict[str, str]]:
 
     if not matching_files:
         label = CUSTOM_FILE_NAME if mode == CMode.CUSTOM else MAIN_FILE_NAME
-        print(f"Error: No file found in '{label}'.")
-        sys.exit(1)
+        raise NotesError(f"No file found in '{label}'.")
 
     return matching_files, active_collaborators_map
 
@@ -891,10 +1183,10 @@ def check_inconsistency(
         )
 
         if missing_in_main:
-            print("Error: The following .md files are NOT included in main:")
-            for f in sorted(missing_in_main):
-                print(f"- {f}")
-            sys.exit(1)
+            raise NotesError(
+                "The following .md files are NOT included in main:\n"
+                + "\n".join(f"- {f}" for f in sorted(missing_in_main))
+            )
     else:
         # Check only the existence of files (file names only)
 
@@ -910,36 +1202,19 @@ def check_inconsistency(
         for filename in normalized_main_list:
             # check the file name if found in root
             if filename not in path_by_name:
-                print(f"Error: File: {filename} does not exist in the vault")
-                sys.exit(1)
+                raise NotesError(f"File: {filename} does not exist in the vault")
 
             full_path = path_by_name[filename]
 
             # check if exists in root
             if not Path(full_path).exists():
-                print(f"Error: File {full_path} not found in the filesystem")
-                sys.exit(1)
-
-
-def _is_in_comment(pos: int, commentedRanges: list[tuple[int, int]]) -> bool:
-    """
-    Return True if character position *pos* falls inside a comment block.
-    """
-    return any(start <= pos < end for start, end in commentedRanges)
-
-
-def _extract_markdown_link_targets(content: str) -> list[str]:
-    """
-    Extract markdown link targets from both regular links and image links.
-    """
-
-    pattern = re.compile(r"!?\[[^\]]*\]\(([^)]+)\)")
-    matches = pattern.findall(content)
-    return [match.strip() for match in matches]
+                raise NotesError(f"File {full_path} not found in the filesystem")
 
 
 def find_unused_assets(
     fileFoundMain: list[str],
+    assetIndex: AssetIndex | None = None,
+    noteLinks: list[NoteLinks] | None = None,
 ) -> list[Path]:
     """
     Return all asset files present under assetD that are never
@@ -947,64 +1222,38 @@ def find_unused_assets(
 
     Links inside HTML comments are ignored.
     External URLs, anchors and .md links are ignored.
+    An already built AssetIndex of the assets folder and the notes already
+    scanned with scan_vault_notes() can be shared.
     """
 
-    vault_dir = str(_BANK_DIR) if is_bank() else str(_VAULT_DIR)
-    assets_dir = str(safe_path(vault_dir, _ASSETS_DIR))
-    a_D = safe_path(assets_dir)
+    if assetIndex is None:
+        assetIndex = build_asset_index()
+    if noteLinks is None:
+        noteLinks = scan_vault_notes(fileFoundMain)
     # -----------------------------
     # 1. Collect ALL assets
     # -----------------------------
-    all_assets: dict[str, Path] = {}
-
-    for asset in a_D.rglob("*"):
-        if asset.is_file():
-            rel = asset.relative_to(a_D).as_posix()
-
-            # Skip assets/docfiles/ folder
-            if rel.startswith("docfiles/"):
-                continue
-
-            all_assets[rel] = asset
+    all_assets: dict[str, Path] = {
+        rel: asset
+        for rel, asset in assetIndex.items()
+        # Skip assets/docfiles/ folder
+        if not rel.startswith("docfiles/")
+    }
 
     # -----------------------------
     # 2. Collect referenced assets
     # -----------------------------
     referenced: set[str] = set()
 
-    external_pattern = re.compile(
-        r"^(?:[a-z][a-z0-9+.-]*:|#)",
-        re.IGNORECASE,
-    )
-
-    for file_path in fileFoundMain:
-        note_path = Path(file_path)
-
-        if not note_path.exists() or not note_path.is_file():
-            continue
-
-        content = note_path.read_text(encoding="utf-8")
-
-        # Ignore comment blocks
-        content = re.sub(
-            r"<!--.*?-->",
-            "",
-            content,
-            flags=re.DOTALL,
-        )
-
-        links = _extract_markdown_link_targets(content)
-
-        for target in links:
-            target = target.strip()
-
+    for note in noteLinks:
+        for target in note.targets:
             if not target:
                 continue
 
-            if external_pattern.match(target):
+            if is_external_link(target):
                 continue
 
-            path_part = target.split("#", 1)[0].split("?", 1)[0]
+            path_part = link_path_part(target)
 
             if not path_part:
                 continue
@@ -1046,66 +1295,99 @@ def find_unused_assets(
     return sorted(unused_assets)
 
 
-def find_broken_links(matchingFilesMain: list[str]) -> dict[str, list[str]]:
+def _find_broken_links_in_note(
+    note: NoteLinks, snapshot: VaultSnapshot
+) -> list[str]:
     """
-    Parse all .md notes found in the main directory.
-    Return, for each note, the broken local links that do not resolve to
-    an existing file.
+    Return the local links of a scanned note that do not resolve
+    to an existing file, in order of appearance and without duplicates.
     """
+    note_path = Path(note.path)
+    broken_links: list[str] = []
+    seen_links: set[str] = set()
 
-    broken_by_note: dict[str, list[str]] = {}
-    external_pattern = re.compile(r"^(?:[a-z][a-z0-9+.-]*:|#)", re.IGNORECASE)
+    for link_target in note.targets:
+        target = link_target.strip()
 
-    for file_path in matchingFilesMain:
-        note_path = Path(file_path)
+        if not target:
+            continue
 
-        if not note_path.exists() or not note_path.is_file():
+        if is_external_link(target):
             continue
 
-        with open(note_path, encoding="utf-8") as note_file:
-            content = note_file.read()
+        if target in seen_links:
+            continue
 
-        # exclude comments
-        content_without_comments = re.sub(
-            r"<!--.*?-->", "", content, flags=re.DOTALL)
-        local_links = _extract_markdown_link_targets(content_without_comments)
-        broken_links: list[str] = []
-        seen_links: set[str] = set()
+        seen_links.add(target)
 
-        for link_target in local_links:
-            target = link_target.strip()
+        # exlude chapter into links
+        path_part = link_path_part(target)
+        if not path_part:
+            continue
 
-            if not target:
-                continue
+        if not snapshot.exists(safe_path(note_path.parent, path_part)):
+            broken_links.append(target)
 
-            if external_pattern.match(target):
-                continue
+    return broken_links
 
-            if target in seen_links:
-                continue
 
-            seen_links.add(target)
+def find_broken_links(
+    matchingFilesMain: list[str],
+    jobs: int = DEFAULT_JOBS,
+    noteLinks: list[NoteLinks] | None = None,
+) -> dict[str, list[str]]:
+    """
+    Parse all .md notes found in the main directory.
+    Return, for each note, the broken local links that do not resolve to
+    an existing file.
+
+    Notes are read (unless already scanned with scan_vault_notes()) and checked
+    by a pool of jobs threads. The result follows the order of the notes.
+    """
 
-            # exlude chapter into links
-            path_part = target.split("#", 1)[0].split("?", 1)[0]
-            if not path_part:
-                continue
+    if noteLinks is None:
+        noteLinks = scan_vault_notes(matchingFilesMain, jobs)
 
-            resolved_path = safe_path(note_path.parent, path_part).resolve()
-            if not resolved_path.exists():
-                broken_links.append(target)
+    snapshot = vault_snapshot()
+    if jobs <= 1 or len(noteLinks) <= 1:
+        results = [_find_broken_links_in_note(note, snapshot) for note in noteLinks]
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(
+                lambda note: _find_broken_links_in_note(note, snapshot),
+                noteLinks,
+            ))
 
+    broken_by_note: dict[str, list[str]] = {}
+    for note, broken_links in zip(noteLinks, results, strict=True):
         if broken_links:
-            broken_by_note[str(note_path)] = broken_links
+            broken_by_note[note.path] = broken_links
 
     return broken_by_note
 
 
+def build_asset_index(searchRoot: str | Path | None = None) -> AssetIndex:
+    """
+    Index every file under searchRoot, from the vault snapshot when it
+    covers searchRoot, with a single walk otherwise.
+    By default the assets folder of the current vault (or bank) is indexed.
+    """
+    if searchRoot is None:
+        searchRoot = safe_path(current_context().assets_dir)
+
+    snapshot = vault_snapshot()
+    if snapshot.covers(searchRoot):
+        return AssetIndex.from_files(searchRoot, snapshot.iter_files(
+            searchRoot, lambda d: d in INDEX_EXCLUDED_DIRS))
+
+    return AssetIndex(searchRoot, skipDirs=INDEX_EXCLUDED_DIRS)
+
+
 def _find_asset_candidate(
-    notePath: Path, linkTarget: str, searchRoot: Path
+    notePath: Path, linkTarget: str, assetIndex: AssetIndex
 ) -> Path | None:
     """Try to resolve a broken local asset link by looking under the vault
-    assets folder using the link target path as a hint.
+    using the link target path as a hint.
 
     The function intentionally ignores URL fragments (#...) and query strings
     (?...) when building the candidate path on disk, because those parts only
@@ -1114,8 +1396,10 @@ def _find_asset_candidate(
     Resolution strategy (in order):
     1. Resolve the raw path relative to the note's parent directory.
     2. If the path contains an "assets" segment, use everything after it as a
-       suffix and search recursively under *assets_dir*.
+       suffix and look it up in *assetIndex*.
     3. Fall back to matching by file name only.
+
+    Raise ValueError if more than one file matches the link.
     """
     raw_target = linkTarget.strip()
     if not raw_target:
@@ -1126,70 +1410,15 @@ def _find_asset_candidate(
 
     # --- Strategy 1: direct relative resolution ---
     candidate = safe_path(notePath.parent, path_part)
-    if candidate.exists() and candidate.is_file():
+    if vault_snapshot().is_file(candidate):
         return candidate
 
-    # --- Strategies 2 & 3: search under the assets directory ---
-    # Build a "suffix" path: either everything after the "assets" segment (so
-    # we preserve sub-directory structure) or just the bare file name.
-    parts = [part for part in Path(path_part).parts if part not in (".", "")]
-
-    if "assets" in parts:
-        # Keep the sub-path that comes after the assets directory name so that
-        # files in nested sub-folders are still matched correctly.
-        suffix = Path(*parts[parts.index("assets") + 1:])
-    else:
-        suffix = Path(parts[-1]) if parts else Path(path_part)
-
-    if suffix.name == "":
+    # --- Strategies 2 & 3: look up the index ---
+    try:
+        return assetIndex.resolve(path_part)
+    except FileNotFoundError:
         return None
 
-    for file_path in searchRoot.rglob("*"):
-        if not file_path.is_file():
-            continue
-
-        relative = file_path.relative_to(searchRoot).as_posix()
-
-        # Accept the file if its relative path ends with the expected suffix or
-        # if its name alone matches (the "by name" fallback).
-        if relative.endswith(suffix.as_posix()) or file_path.name == suffix.name:
-            return file_path
-
-    return None
-
-
-def _replace_target_outside_comments(text: str, target: str, replacement: str) -> str:
-    """
-    Replace all occurrences of *target* in *text* while preserving every
-    HTML comment block exactly as-is.
-    """
-    result: list[str] = []
-    i = 0
-    length = len(text)
-
-    while i < length:
-        comment_start = text.find("<!--", i)
-        if comment_start == -1:
-            comment_start = length
-
-        # Copy text before the next comment block as-is, replacing the target.
-        segment = text[i:comment_start]
-        if target in segment:
-            segment = segment.replace(target, replacement)
-        result.append(segment)
-
-        if comment_start >= length:
-            break
-
-        comment_end = text.find("-->", comment_start + 4)
-        if comment_end == -1:
-            comment_end = length
-
-        result.append(text[comment_start: comment_end + 3])
-        i = comment_end + 3
-
-    return "".join(result)
-
 
 def fix_links_return_errors(
     dictFileLinks: dict[str, list[str]],
@@ -1206,19 +1435,24 @@ def fix_links_return_errors(
     * Links that live inside HTML comment blocks (<!-- … -->) are skipped
         entirely — they are intentionally hidden and should not be rewritten.
     """
-    vault_dir = _BANK_DIR if is_bank() else _VAULT_DIR
+    vault_dir = current_context().root
     unresolved_links: dict[str, list[str]] = {}
 
+    # One walk of the whole vault, shared by every broken link
+    vault_index = build_asset_index(vault_dir)
+    snapshot = vault_snapshot()
+    rewritten = False
+
     for note_path_str, broken_links in dictFileLinks.items():
         note_path = safe_path(note_path_str)
 
-        if not note_path.exists() or not note_path.is_file():
+        if not snapshot.is_file(note_path):
             continue
         if _is_sub_main(note_path.name):
             continue
 
         original_content = note_path.read_text(encoding="utf-8")
-        updated_content = original_content
+        replacements: dict[str, str] = {}
         broken_for_note: list[str] = []
 
         for link_target in broken_links:
@@ -1234,15 +1468,21 @@ def fix_links_return_errors(
             path_part = target.split("#", 1)[0].split("?", 1)[0]
 
             # --- Resolve the file on disk ---
-            candidate = _find_asset_candidate(note_path, path_part, vault_dir)
-
-            candidate = safe_path(normalize_unc_path(str(candidate)))
+            try:
+                candidate = _find_asset_candidate(
+                    note_path, path_part, vault_index)
+            except ValueError as exc:
+                print(f"Warning: {exc}")
+                broken_for_note.append(target)
+                continue
 
             if candidate is None:
                 # File not found anywhere under the vault.
                 broken_for_note.append(target)
                 continue
 
+            candidate = safe_path(normalize_unc_path(str(candidate)))
+
             rel_target = safe_path(
                 os.path.relpath(candidate, note_path.parent)
             ).as_posix()
@@ -1253,43 +1493,101 @@ def fix_links_return_errors(
             if "#" in target:
                 corrected_target += "#" + target.split("#", 1)[1]
 
-            updated_content = _replace_target_outside_comments(
-                updated_content,
-                target,
-                corrected_target,
-            )
+            replacements[target] = corrected_target
+
+        # Rewrite every link of the note in one pass, comments untouched.
+        updated_content = rewrite_links(original_content, replacements)
 
         # Write back only when something actually changed.
         if updated_content != original_content:
-            note_path.write_text(updated_content, encoding="utf-8")
+            _replace_text(note_path, updated_content)
+            rewritten = True
 
         if broken_for_note:
             unresolved_links[str(note_path)] = broken_for_note
 
+    # The stat of the rewritten notes in the snapshot is outdated
+    if rewritten:
+        current_context().drop_snapshots()
+
     return unresolved_links
 
 
-def copy_assets(outputDir: str, collaborators: dict[str, str]) -> None:
+def referenced_asset_paths(
+    linkTargets: set[str], relativeTo: Path, assetD: str
+) -> set[str]:
     """
-    Copy the assets directories of all collaborators into outputDir.
+    Return the paths under assetD (posix, relative) of the link targets of a
+    merged document, whose links are relative to relativeTo.
+    Links to a .pdf are included: the lua filter turns a paragraph holding
+    only that link into an \\includepdf of the file.
+    """
+    a_D = os.path.normpath(str(safe_path(assetD)))
+    referenced: set[str] = set()
+
+    for target in linkTargets:
+        if not target or is_external_link(target):
+            continue
+
+        path_part = link_path_part(target)
+        if not path_part or Path(path_part).suffix.lower() == ".md":
+            continue
+
+        abs_path = os.path.normpath(os.path.join(str(relativeTo), path_part))
+        rel = os.path.relpath(abs_path, a_D)
+        if rel != os.pardir and not rel.startswith(os.pardir + os.sep):
+            referenced.add(Path(rel).as_posix())
+
+    return referenced
+
+
+def copy_assets(
+    outputDir: str,
+    collaborators: dict[str, str],
+    referenced: set[str] | None = None,
+) -> None:
+    """
+    Sync the assets directories of all collaborators into outputDir.
     If multiple collaborators use the same asset subfolders, the contents are
-    merged without overwriting unchanged files.
+    merged. outputDir persists between builds: only the files changed since
+    the last sync are copied and the ones no longer needed are removed
+    (see sync_tree).
+
+    With referenced (paths relative to assets/) only those files and the
+    docfiles/ folder used by the YAML are staged, instead of every asset.
     """
+    sources: dict[str, str] = {}
     for name, main_md_path in collaborators.items():
         collab_assets_dir = os.path.join(
             os.path.dirname(main_md_path), "assets")
-        if os.path.exists(collab_assets_dir):
-            copy_dir_recursive(collab_assets_dir, outputDir)
-            print(f"Assets copied for {name} into {outputDir}")
-        else:
+        if not os.path.exists(collab_assets_dir):
             print(
                 f"Warning: assets not found for {name} in {collab_assets_dir}")
+        elif referenced is None:
+            collect_tree(collab_assets_dir, sources)
+        else:
+            collect_tree(os.path.join(collab_assets_dir, "docfiles"),
+                         sources, "docfiles/")
+            for rel in referenced:
+                src_file = os.path.join(collab_assets_dir, *rel.split("/"))
+                if os.path.isfile(src_file):
+                    sources[rel] = src_file
+
+    if referenced is not None:
+        for rel in sorted(referenced - sources.keys()):
+            print(f"Warning: asset '{rel}' not found in any collaborator.")
+
+    stats = sync_tree(sources, outputDir)
+    print(f"Assets synced into {outputDir}: {stats.copied} copied, "
+          f"{stats.unchanged} unchanged, {stats.removed} removed")
 
 
 def normalize_links_after_merge(
     CombinedPath: Path,
     vaultD: str,
     assetD: str,
+    assetIndex: AssetIndex | None = None,
+    relativeTo: Path | None = None,
 ) -> None:
     """
     Normalize asset links inside a merged markdown document.
@@ -1302,44 +1600,51 @@ def normalize_links_after_merge(
     - internal anchors (#x)      -> leave untouched
     - links in comments          -> ignored
     - assets resolved by full path under assets/ (not filename)
+    - an already built AssetIndex of assetD can be shared
+    - links are relative to relativeTo (default: the merged file folder)
     """
 
-    a_D = safe_path(assetD)
-
     if not CombinedPath.exists():
         raise FileNotFoundError(CombinedPath)
 
     content = CombinedPath.read_text(encoding="utf-8")
-    updated_content = content
 
     # -----------------------------
     # Build asset index by REL PATH
     # -----------------------------
-    asset_index: dict[str, Path] = {}
+    if assetIndex is None:
+        assetIndex = build_asset_index(safe_path(assetD))
+
+    if relativeTo is None:
+        relativeTo = CombinedPath.parent
 
-    for asset in a_D.rglob("*"):
-        if asset.is_file():
-            rel = asset.relative_to(a_D).as_posix()
-            asset_index[rel] = asset
+    updated_content = normalize_links_in_text(content, assetIndex, relativeTo)
 
     # -----------------------------
-    # Remove comments for parsing
+    # write only if changed
     # -----------------------------
-    content_without_comments = re.sub(
-        r"<!--.*?-->",
-        "",
-        content,
-        flags=re.DOTALL,
-    )
+    if updated_content != content:
+        CombinedPath.write_text(updated_content, encoding="utf-8")
+
 
-    local_links = _extract_markdown_link_targets(content_without_comments)
+def normalize_links_in_text(
+    content: str, assetIndex: AssetIndex, relativeTo: Path
+) -> str:
+    """
+    Same rules as normalize_links_after_merge() applied to a markdown text,
+    return the text with every asset link relative to relativeTo.
+    """
+
+    # -----------------------------
+    # Links outside comments, in order of appearance
+    # -----------------------------
+    local_links = extract_links_outside_comments(content)
 
+    replacements: dict[str, str] = {}
     processed: set[str] = set()
 
     for target in local_links:
-        target = target.strip()
-
-        if not target or target in processed:
+        if target in processed:
             continue
 
         processed.add(target)
@@ -1362,53 +1667,32 @@ def normalize_links_after_merge(
         if not path_part:
             continue
 
-        suffix = Path(path_part)
-
         # -----------------------------
         # skip markdown links entirely
         # -----------------------------
-        if suffix.suffix.lower() == ".md":
+        if Path(path_part).suffix.lower() == ".md":
             continue
 
         # -----------------------------
-        # normalize asset path under assets/
-        # -----------------------------
-        parts = Path(path_part).parts
-
-        if "assets" in parts:
-            suffix_key = Path(*parts[parts.index("assets") + 1:]).as_posix()
-        else:
-            suffix_key = suffix.as_posix()
-
-        # -----------------------------
-        # resolve asset
+        # resolve asset by its path under assets/, then by filename
         # -----------------------------
-        asset_path = asset_index.get(suffix_key)
-
-        # fallback: try filename only
-        if asset_path is None:
-            matches = [
-                p for rel, p in asset_index.items() if Path(rel).name == suffix.name
-            ]
-
-            if len(matches) == 0:
-                raise FileNotFoundError(
-                    f"Missing asset referenced in merged file: {target}"
-                )
-
-            if len(matches) > 1:
-                raise ValueError(
-                    f"Ambiguous asset reference '{target}'. "
-                    f"Multiple candidates found."
-                )
-
-            asset_path = matches[0]
+        try:
+            asset_path = assetIndex.resolve(path_part)
+        except FileNotFoundError:
+            raise BuildError(
+                f"Missing asset referenced in merged file: {target}"
+            ) from None
+        except ValueError:
+            raise BuildError(
+                f"Ambiguous asset reference '{target}'. "
+                f"Multiple candidates found."
+            ) from None
 
         # -----------------------------
         # build relative path from combined file
         # -----------------------------
         rel_target = Path(os.path.relpath(
-            asset_path, CombinedPath.parent)).as_posix()
+            asset_path, relativeTo)).as_posix()
 
         if not rel_target.startswith("."):
             rel_target = "./" + rel_target
@@ -1419,20 +1703,84 @@ def normalize_links_after_merge(
         if "#" in target:
             corrected_target += "#" + target.split("#", 1)[1]
 
-        # -----------------------------
-        # replace only outside comments
-        # -----------------------------
-        updated_content = _replace_target_outside_comments(
-            updated_content,
-            target,
-            corrected_target,
-        )
+        replacements[target] = corrected_target
 
     # -----------------------------
-    # write only if changed
+    # replace only outside comments, in a single pass
     # -----------------------------
-    if updated_content != content:
-        CombinedPath.write_text(updated_content, encoding="utf-8")
+    return rewrite_links(content, replacements)
+
+
+def collect_referenced_assets(
+    matchingFiles: list[str], assetD: str | None = None
+) -> list[str]:
+    """
+    Return the absolute paths of every local asset referenced by the notes,
+    plus the docfiles/ folder used by the YAML (logo, ...).
+
+    Links inside HTML comments, external URLs, anchors and .md links are ignored.
+    Missing assets are returned too: they are part of the build inputs, so a
+    build has to run again as soon as they appear.
+    By default assetD is the assets folder of the current vault (or bank).
+    """
+
+    if assetD is None:
+        assetD = str(current_context().assets_dir)
+
+    a_D = safe_path(assetD)
+    referenced: set[str] = set()
+
+    for note in scan_vault_notes(matchingFiles):
+        note_path = Path(note.path)
+
+        for target in note.targets:
+            if not target or is_external_link(target):
+                continue
+
+            path_part = link_path_part(target)
+            if not path_part or Path(path_part).suffix.lower() == ".md":
+                continue
+
+            referenced.add(str(safe_path(note_path.parent, path_part).resolve()))
+
+            # The merge step resolves assets by their path under assets/
+            parts = Path(path_part).parts
+            if "assets" in parts:
+                rel_asset = Path(*parts[parts.index("assets") + 1:])
+                referenced.add(str(safe_path(a_D, str(rel_asset))))
+
+    docfiles_dir = a_D / "docfiles"
+    if vault_snapshot().is_dir(docfiles_dir):
+        for _, asset in build_asset_index(docfiles_dir).items():
+            referenced.add(str(asset))
+
+    return sorted(referenced)
+
+
+def _execute_conversion(
+    tmpl: str,
+    luaf: str,
+    pndo: str,
+    src: MarkdownSource,
+    dsts: list[Path],
+    d_v: str,
+    d_a: str,
+    d_b: str,
+    auxDir: str | None = None,
+) -> None:
+    """
+    Convert src into every dst: a single output keeps the direct pandoc
+    run, several outputs share one parsed document (execute_pandoc_multi).
+    A failed pandoc (or latexmk) run is raised as a BuildError.
+    """
+    try:
+        if len(dsts) == 1:
+            execute_pandoc(tmpl, luaf, pndo, src, dsts[0], d_v, d_a, d_b, auxDir)
+        else:
+            execute_pandoc_multi(tmpl, luaf, pndo, src, dsts, d_v, d_a, d_b, auxDir)
+    except subprocess.CalledProcessError as e:
+        tool = Path(str(e.cmd[0])).name if e.cmd else "conversion"
+        raise BuildError(f"{tool} failed with exit status {e.returncode}") from e
 
 
 def combine_and_execute(
@@ -1440,158 +1788,435 @@ def combine_and_execute(
     collaborators: dict[str, str],
     cfgCstmPath: CustomPaths,
     buildOpts: BuildOptions,
-    dst: str,
+    dst: str | list[str],
+    scratch: bool = False,
 ) -> None:
     """
-    Combines all notes into a single .md file, removes the standard header
-    from each, prepends the YAML block, then runs the pandoc conversion.
+    Combines all notes into a single markdown document, removes the standard
+    header from each, prepends the YAML block, then pipes it to pandoc.
+    The document is written to combined_notes.md only with
+    buildOpts.keep_intermediate (e.g. to debug a conversion).
 
     Vault:  conversion runs directly in the vault build folder.
-    Bank:   files are staged in _APPL_DIR (local), converted there,
-            the result is copied back to the bank build folder,
-            then _APPL_DIR is deleted entirely.
+    Bank:   files are staged in the context staging_dir (local),
+            converted there,
+            the result is copied back to the bank build folder.
+            The staging is kept and synced incrementally by the next build.
 
     In both cases the build folder is cleaned afterwards,
     keeping only .md / .tex / .pdf files.
+
+    The hashes of every input (notes, referenced assets, config files) are
+    stored in the build manifest: if none of them changed and the output
+    still exists, the conversion is skipped and pandoc is never spawned.
+
+    dst can list several outputs of the same notes (e.g. .pdf and .docx):
+    the markdown is then parsed only once for all of them.
+
+    With scratch (vault only) the combined note and the intermediate files
+    live in build/.jobs/<dst>/ and only the final outputs are moved into
+    the build folder, so several conversions can run at the same time.
+
+    With buildOpts.incremental latexmk works in build/.aux/<dst>/, which
+    survives between builds (see remove_build_caches).
+
+    With buildOpts.fragments (.pdf and .tex only) every note is converted
+    to a cached LaTeX fragment and the combined file only holds the
+    fragments, so an edit to one note costs one small pandoc run.
+
+    Several invocations (e.g. the users of a shared bank) can build at the
+    same time: the outputs are locked by name (see lock_outputs) from the
+    manifest check to the publish, so the same output is built by one of
+    them while the others wait and then find it up to date. Every
+    invocation converts in its own scratch folders and publishes the
+    outputs with an atomic rename.
+    """
+    dst_names = [dst] if isinstance(dst, str) else dst
+    with lock_outputs(current_context().build_dir, dst_names):
+        _combine_and_execute(
+            matchingFiles, collaborators, cfgCstmPath, buildOpts, dst_names, scratch
+        )
+
+
+def _combine_and_execute(
+    matchingFiles: list[str],
+    collaborators: dict[str, str],
+    cfgCstmPath: CustomPaths,
+    buildOpts: BuildOptions,
+    dstNames: list[str],
+    scratch: bool,
+) -> None:
+    """
+    combine_and_execute() with the locks of the outputs held.
     """
 
-    # 1. Combine notes
+    # 0. Skip everything if the inputs did not change since the last build
     unified = chose_right_position(is_bank(), COMB_FILE_NAME)
-    dst_path = chose_right_position(is_bank(), dst)
+    dst_paths = [chose_right_position(is_bank(), name) for name in dstNames]
+    ctx = current_context()
+    job_id = new_job_id()
+    build_dir = ctx.build_dir
+    vault_dir = str(ctx.root)
+    assets_dir = str(safe_path(vault_dir, _ASSETS_DIR))
 
-    with open(unified, "w", encoding="utf-8") as out:
-        for file in matchingFiles:
-            if os.path.exists(file):
-                out.writelines(remove_std_header(Path(file)))
-                out.write("\n")
+    with phase("manifest", outputs=len(dst_paths)):
+        manifest = compute_manifest(
+            notes=matchingFiles,
+            assets=collect_referenced_assets(matchingFiles, assets_dir),
+            configFiles={
+                "template": str(cfgCstmPath.custom_teml_path),
+                "lua": str(cfgCstmPath.custom_luaf_path),
+                "yaml": str(cfgCstmPath.custom_yaml_path),
+                "pandoc": str(cfgCstmPath.custom_pandoc_opt_path),
+            },
+            options={
+                "title": buildOpts.title,
+                "toolchain": probe_toolchain().cache_key(),
+            },
+        )
+
+        stale_paths: list[Path] = []
+        for dst_path in dst_paths:
+            if is_up_to_date(build_dir, dst_path, manifest):
+                print(f"Nothing changed, '{dst_path.name}' is up to date.")
             else:
-                print(f"Warning: '{file}' not found, will be ignored.")
+                stale_paths.append(dst_path)
 
-    # 1.1. Attach the yaml from config files
-    copy_config_yaml(unified, cfgCstmPath, buildOpts.title)
-    print(f"File combinato creato: {normalize_unc_path(str(unified))}")
+    if not stale_paths:
+        return
 
-    # 2. Resolve base paths
-    vault_dir = str(_BANK_DIR) if is_bank() else str(_VAULT_DIR)
-    assets_dir = str(safe_path(vault_dir, _ASSETS_DIR))
-    build_dir = BUILD_B_PATH if is_bank() else BUILD_V_PATH
+    # Parallel builds must not share combined_notes.md nor the .tex files
+    scratch_dir = None
+    if scratch and not is_bank():
+        scratch_dir = build_dir / JOBS_DIR_NAME / f"{stale_paths[0].name}-{job_id}"
+        scratch_dir.mkdir(parents=True)
+        unified = scratch_dir / COMB_FILE_NAME
 
-    normalize_links_after_merge(unified, vault_dir, assets_dir)
+    # A failed conversion must not leave a stale entry behind
+    for dst_path in stale_paths:
+        invalidate_manifest(build_dir, dst_path)
+
+    use_fragments = buildOpts.fragments and all(
+        p.suffix.lower() in LATEX_OUTPUT_EXTENSIONS for p in stale_paths
+    )
+    if buildOpts.fragments and not use_fragments:
+        print("Warning: fragments are LaTeX, they are not used for "
+              ".docx and .odt outputs.")
+
+    # 1. Combine notes in a single pass: the yaml from config files first,
+    #    then each note without header and with the asset links fixed
+    #    for the build folder.
+    #    The combined document is piped to pandoc: it is written to disk only
+    #    with buildOpts.keep_intermediate. A vault streams it from the merge,
+    #    a bank keeps it in memory, its assets are staged before pandoc runs.
+    with phase("merge", notes=len(matchingFiles), fragments=use_fragments):
+        yaml_block = read_config_yaml(cfgCstmPath, buildOpts.title)
+        asset_index = build_asset_index(safe_path(assets_dir))
+        link_targets: set[str] = set()
+
+        document: MarkdownSource
+        if use_fragments:
+            document = combine_fragments(
+                matchingFiles, cfgCstmPath, vault_dir, assets_dir, build_dir,
+                yaml_block, asset_index, link_targets)
+        else:
+            document = iter_combined_notes(
+                matchingFiles, yaml_block, asset_index, build_dir,
+                link_targets)
+
+        if buildOpts.keep_intermediate:
+            # other outputs of the bank may be writing it too
+            tmp_unified = unified.with_name(f"{unified.name}.{job_id}.tmp")
+            with open(tmp_unified, "w", encoding="utf-8") as out:
+                out.writelines(document)
+            os.replace(tmp_unified, unified)
+            document = safe_path(normalize_unc_path(str(unified)))
+            print(f"File combinato creato: {normalize_unc_path(str(unified))}")
+        elif is_bank():
+            document = list(document)
 
     # 3a. Vault: direct conversion
     if not is_bank():
         # ===============================
         #           VAULT ELAB
         # ===============================
-        execute_pandoc(
-            str(normalize_unc_path(str(cfgCstmPath.custom_teml_path))),
-            str(normalize_unc_path(str(cfgCstmPath.custom_luaf_path))),
-            str(normalize_unc_path(str(cfgCstmPath.custom_pandoc_opt_path))),
-            safe_path(normalize_unc_path(str(unified))),
-            safe_path(normalize_unc_path(str(dst_path))),
-            str(normalize_unc_path(vault_dir)),
-            str(normalize_unc_path(assets_dir)),
-            str(normalize_unc_path(str(build_dir))),
+        out_paths = (
+            stale_paths if scratch_dir is None
+            else [scratch_dir / p.name for p in stale_paths]
         )
+        aux_dir = None
+        if buildOpts.incremental:
+            aux_dir = str(normalize_unc_path(
+                str(build_dir / AUX_DIR_NAME / stale_paths[0].name)))
+        try:
+            with phase("convert", outputs=[p.name for p in stale_paths]):
+                _execute_conversion(
+                    str(normalize_unc_path(str(cfgCstmPath.custom_teml_path))),
+                    str(normalize_unc_path(str(cfgCstmPath.custom_luaf_path))),
+                    str(normalize_unc_path(str(cfgCstmPath.custom_pandoc_opt_path))),
+                    document,
+                    [safe_path(normalize_unc_path(str(p))) for p in out_paths],
+                    str(normalize_unc_path(vault_dir)),
+                    str(normalize_unc_path(assets_dir)),
+                    str(normalize_unc_path(str(build_dir))),
+                    aux_dir,
+                )
+
+            # -- Publish the outputs --
+            if scratch_dir is not None:
+                for out_path, dst_path in zip(out_paths, stale_paths, strict=True):
+                    if out_path.exists():
+                        os.replace(out_path, dst_path)
+        finally:
+            if scratch_dir is not None:
+                _remove_scratch_dir(scratch_dir)
 
     # 3b. Bank: stage → convert locally → copy back → cleanup
     else:
         # ===============================
         #           BANK ELAB
         # ===============================
-        app_dir = safe_path(_APPL_DIR)
-        app_build = app_dir / _BUILD_DIR
-        app_config = app_dir / _CONFIG_DIR
-        app_assets = app_dir / _ASSETS_DIR
-
-        app_build.mkdir(parents=True, exist_ok=True)
-        app_config.mkdir(parents=True, exist_ok=True)
-
-        # -- Copy combined note --
-        print(f"1 - Moving combined note... to {app_build}")
-        local_unified = app_build / unified.name
-        shutil.copy2(unified, local_unified)
-
-        # -- Copy assets --
-        print(f"2 - Copying assets... to {app_assets}")
-        if app_assets.exists():
-            shutil.rmtree(app_assets)
-        app_assets.mkdir(parents=True, exist_ok=True)
-        copy_assets(str(app_assets), collaborators)
-
-        # -- Copy config files (renamed to default names so execute_pandoc
-        #    doesn't need to know which custom file is in use) --
-        print(f"3 - Copying config files... to {app_config}")
-        shutil.copy2(
-            str(cfgCstmPath.custom_teml_path),
-            app_config / TEMPLATE_NAME
-        )
-        shutil.copy2(
-            str(cfgCstmPath.custom_luaf_path),
-            app_config / LUA_FILTER_NAME
+        app_dir = safe_path(ctx.staging_dir)
+        # Outputs and intermediate files of this invocation only, locally
+        # and next to the bank outputs
+        app_job = app_dir / _BUILD_DIR / JOBS_DIR_NAME / job_id
+        publish_dir = build_dir / JOBS_DIR_NAME / job_id
+
+        app_job.mkdir(parents=True, exist_ok=True)
+        (app_dir / _CONFIG_DIR).mkdir(parents=True, exist_ok=True)
+        publish_dir.mkdir(parents=True, exist_ok=True)
+
+        try:
+            # The staged assets and config files are shared by the builds
+            # of this user, they are synced and used by one build at a time
+            with exclusive_lock(app_dir / LOCK_FILE_NAME,
+                                "another build in the staging folder"):
+                _stage_and_convert(
+                    document, unified, collaborators, cfgCstmPath, buildOpts,
+                    link_targets, build_dir, assets_dir, stale_paths,
+                    app_dir, app_job)
+
+            # -- Publish the results in the bank build --
+            # (copied next to their destination, then renamed: the other
+            # users never see a partial output)
+            for dst_path in stale_paths:
+                local_dst = app_job / dst_path.name
+                print(f"4 - Copying result... to {dst_path}")
+                if local_dst.exists():
+                    shutil.copy2(local_dst, publish_dir / dst_path.name)
+                    os.replace(publish_dir / dst_path.name, dst_path)
+                else:
+                    print(f"Warning: Output '{local_dst}' "
+                          "not found after the conversion.")
+        finally:
+            _remove_scratch_dir(publish_dir)
+            _remove_scratch_dir(app_job)
+
+    with phase("publish"):
+        # Remember the inputs of these outputs for the next build
+        for dst_path in stale_paths:
+            if dst_path.exists():
+                store_manifest(build_dir, dst_path, manifest)
+
+        # Remove temp files
+        clean_build_dir(build_dir, {output_stem(p.name) for p in stale_paths})
+
+
+def _remove_scratch_dir(scratchDir: Path) -> None:
+    """
+    Remove the scratch folder of an invocation, and the .jobs folder
+    holding it when no other invocation is using it.
+    """
+    shutil.rmtree(scratchDir, ignore_errors=True)
+    with suppress(OSError):
+        scratchDir.parent.rmdir()
+
+
+def _stage_and_convert(
+    document: MarkdownSource,
+    unified: Path,
+    collaborators: dict[str, str],
+    cfgCstmPath: CustomPaths,
+    buildOpts: BuildOptions,
+    linkTargets: set[str],
+    buildDir: Path,
+    assetsDir: str,
+    stalePaths: list[Path],
+    appDir: Path,
+    appJob: Path,
+) -> None:
+    """
+    Bank: sync the referenced assets and the config files into the staging
+    folder appDir, then convert document there, the outputs are written in
+    the scratch folder appJob.
+    """
+    app_build = appDir / _BUILD_DIR
+    app_config = appDir / _CONFIG_DIR
+    app_assets = appDir / _ASSETS_DIR
+
+    with phase("bank staging"):
+        # -- Copy combined note (otherwise it is piped from memory) --
+        if isinstance(document, Path):
+            print(f"1 - Moving combined note... to {appJob}")
+            document = appJob / unified.name
+            shutil.copy2(unified, document)
+
+        # -- Sync the referenced assets only (the staging folder is kept
+        #    between builds) --
+        print(f"2 - Syncing assets... to {app_assets}")
+        copy_assets(
+            str(app_assets),
+            collaborators,
+            referenced_asset_paths(linkTargets, buildDir, assetsDir),
         )
-        shutil.copy2(
-            str(cfgCstmPath.custom_pandoc_opt_path),
-            app_config / PANDOC_OPT_NAME
+
+        # -- Sync config files (renamed to default names so execute_pandoc
+        #    doesn't need to know which custom file is in use) --
+        print(f"3 - Syncing config files... to {app_config}")
+        sync_tree(
+            {
+                TEMPLATE_NAME: str(cfgCstmPath.custom_teml_path),
+                LUA_FILTER_NAME: str(cfgCstmPath.custom_luaf_path),
+                PANDOC_OPT_NAME: str(cfgCstmPath.custom_pandoc_opt_path),
+            },
+            app_config,
         )
 
-        # -- Convert locally --
-        local_dst = app_build / Path(dst_path).name
+    # -- Convert locally --
+    # (the latexmk state stays on the local disk, next to the staging;
+    # the tools run in the staging build folder, like for a vault scratch)
+    local_dsts = [appJob / p.name for p in stalePaths]
+    aux_dir = None
+    if buildOpts.incremental:
+        aux_dir = str(app_build / AUX_DIR_NAME / stalePaths[0].name)
 
-        execute_pandoc(
+    with phase("convert", outputs=[p.name for p in stalePaths]):
+        _execute_conversion(
             str(app_config / TEMPLATE_NAME),
             str(app_config / LUA_FILTER_NAME),
             str(app_config / PANDOC_OPT_NAME),
-            local_unified,
-            local_dst,
-            str(app_dir),
+            document,
+            local_dsts,
+            str(appDir),
             str(app_assets),
             str(app_build),
+            aux_dir,
         )
 
-        # -- Copy result back to bank build --
-        print(f"4 - Copying result... to {dst_path}")
-        if local_dst.exists():
-            shutil.copy2(local_dst, dst_path)
-        else:
-            print(
-                f"Warning: Output '{local_dst}' not found after the conversion.")
 
-        # -- Delete _APPL_DIR entirely --
-        remove_dir(app_assets)
+def combine_fragments(
+    matchingFiles: list[str],
+    cfgCstmPath: CustomPaths,
+    vaultD: str,
+    assetD: str,
+    buildDir: Path,
+    yamlBlock: str | None = None,
+    assetIndex: AssetIndex | None = None,
+    linkTargets: set[str] | None = None,
+) -> list[str]:
+    """
+    Return the combined document: the yamlBlock followed by the LaTeX
+    fragment of every note (see compile_fragments) as raw LaTeX blocks,
+    in the order of matchingFiles. The asset links of each note are fixed
+    before its conversion and added to linkTargets.
+    """
+
+    if assetIndex is None:
+        assetIndex = build_asset_index(safe_path(assetD))
+
+    chunks = list(
+        iter_combined_notes(matchingFiles, None, assetIndex, buildDir, linkTargets)
+    )
+
+    fragments = compile_fragments(
+        chunks,
+        str(normalize_unc_path(str(cfgCstmPath.custom_luaf_path))),
+        str(normalize_unc_path(str(cfgCstmPath.custom_pandoc_opt_path))),
+        str(normalize_unc_path(vaultD)),
+        str(normalize_unc_path(assetD)),
+        str(normalize_unc_path(str(buildDir))),
+    )
+
+    document = [f"{yamlBlock}\n\n"] if yamlBlock else []
+    for fragment in fragments:
+        # The fence must be longer than any backtick run of the fragment
+        longest = max((len(m) for m in re.findall(r"`+", fragment)), default=0)
+        fence = "`" * max(3, longest + 1)
+        document.append(f"{fence}{{=latex}}\n{fragment}\n{fence}\n\n")
 
-    # Remove temp files
-    clean_build_dir(build_dir)
+    return document
 
 
-def remove_std_header(filePath: Path) -> list[str]:
+def iter_note_body(filePath: Path) -> Iterator[str]:
     """
-    Reads a md file, return the content without the specified header.
+    Yield the lines of a md file without the specified header.
     Do not modify any other rows.
+    Only the header is kept in memory while looking for its end marker,
+    if the header does not exists the entire content is yielded.
     """
     if not os.path.exists(filePath):
-        print(f"Error: The file: '{filePath}' does not exist.")
-        sys.exit(1)
+        raise NotesError(f"The file: '{filePath}' does not exist.")
 
-    # Read all the file
     with open(filePath, encoding="utf-8") as file:
-        lines = file.readlines()
+        header: list[str] = []
+        for line in file:
+            if HEADER_END_MARKER in line:
+                # Header found: drop it and stream the rest
+                yield from file
+                return
+            header.append(line)
 
-    # Remove header rows
-    content_started = False
-    filtered_lines = []
-    for line in lines:
-        if "<!-- /code_chunk_output -->" in line:
-            content_started = True
+    yield from header
+
+
+def _strip_leading_yaml(content: str) -> str:
+    """
+    Remove a YAML block at the very beginning of content, it would
+    collide with the YAML block of the config files.
+    """
+    if content.lstrip().startswith("---"):
+        m = YAML_CLOSING_PATTERN.search(content)
+        if m:
+            return content[m.end():].lstrip()
+    return content
+
+
+def iter_combined_notes(
+    matchingFiles: list[str],
+    yamlBlock: str | None,
+    assetIndex: AssetIndex,
+    relativeTo: Path,
+    linkTargets: set[str] | None = None,
+) -> Iterator[str]:
+    """
+    Yield the combined document one note at a time: the yamlBlock first,
+    then every note without its header and with its asset links fixed
+    (see normalize_links_in_text). Only one note is in memory at a time.
+    The fixed link targets of the notes are added to linkTargets.
+    """
+
+    if yamlBlock:
+        yield f"{yamlBlock}\n\n"
+
+    first = True
+    for file in matchingFiles:
+        if not os.path.exists(file):
+            print(f"Warning: '{file}' not found, will be ignored.")
             continue
-        if content_started:
-            filtered_lines.append(line)
 
-    # If the header does not exists, return the entire content
-    if not content_started:
-        return lines
+        content = "".join(iter_note_body(Path(file)))
+
+        # Only one YAML block is allowed at the top of the document
+        if first and yamlBlock:
+            content = _strip_leading_yaml(content)
+        first = False
+
+        with phase("normalize links"):
+            content = normalize_links_in_text(content, assetIndex, relativeTo)
+        if linkTargets is not None:
+            linkTargets.update(extract_links_outside_comments(content))
 
-    return filtered_lines
+        yield content + "\n"
 
 
 def inject_title_into_yaml(yamlBlock: str, title: str) -> str:
@@ -1633,60 +2258,46 @@ def inject_title_into_yaml(yamlBlock: str, title: str) -> str:
     return yaml_block
 
 
-def copy_config_yaml(
-    CombinedPath: Path, cfgCstmPath: CustomPaths, cstmTitle: str | None
-) -> None:
+def read_config_yaml(
+    cfgCstmPath: CustomPaths, cstmTitle: str | None
+) -> str | None:
     """
-    Copy the YAML from the config/.conf file in the specified file
-    Paste this YAML to the top of combined_notes_path
+    Return the YAML block of the config yaml file, with the custom
+    title injected, or None if there is no YAML block.
     """
 
     try:
         # Read the contents of the config/my_yaml.yaml file
         with open(str(cfgCstmPath.custom_yaml_path), encoding="utf-8") as f:
             content = f.read()
+    except Exception as e:
+        print(f"Error during the copy of the YAML block: {str(e)}")
+        return None
 
-        yaml_block = None
-        # If the file starts with '---' I look for the closing marker ('---' or '...')
-        if content.lstrip().startswith("---"):
-            # Find the first closing marker that appears on a separate line
-            m = re.search(r"\n(---|\.\.\.)(?:\r?\n)", content)
-            if m:
-                yaml_block = content[: m.end()]
-
-        if yaml_block and cstmTitle:
-            yaml_block = inject_title_into_yaml(yaml_block, cstmTitle)
-
-        if yaml_block:
-            # Read the current contents of the combined_notes.md file
-            with open(CombinedPath, encoding="utf-8") as f:
-                combined_content = f.read()
-
-            # If the combined_notes.md file already has a YAML block I remove it
-            if combined_content.lstrip().startswith("---"):
-                m2 = re.search(r"\n(---|\.\.\.)(?:\r?\n)", combined_content)
-                if m2:
-                    combined_content = combined_content[m2.end():].lstrip()
-
-            # Add the new YAML block at the beginning
-            new_content = f"{yaml_block}\n\n{combined_content}"
+    yaml_block = None
+    # If the file starts with '---' I look for the closing marker ('---' or '...')
+    if content.lstrip().startswith("---"):
+        # Find the first closing marker that appears on a separate line
+        m = YAML_CLOSING_PATTERN.search(content)
+        if m:
+            yaml_block = content[: m.end()]
 
-            # Write the new content to the combined_notes.md file
-            with open(CombinedPath, "w", encoding="utf-8") as f:
-                f.write(new_content)
+    if yaml_block and cstmTitle:
+        yaml_block = inject_title_into_yaml(yaml_block, cstmTitle)
 
-        else:
-            print(f"No YAML block found in {cfgCstmPath.custom_yaml_path}")
+    if not yaml_block:
+        print(f"No YAML block found in {cfgCstmPath.custom_yaml_path}")
 
-    except Exception as e:
-        print(f"Error during the copy of the YAML block: {str(e)}")
+    return yaml_block
 
 
-def clean_build_dir(buildDir: Path) -> None:
+def clean_build_dir(buildDir: Path, stems: set[str] | None = None) -> None:
     """
     Removes from buildDir every file whose extension is not
     .md, .tex, .pdf, .docx or .odt (e.g. latexmk artefacts: .aux, .log, .fls, …).
-    Subdirectories are left untouched.
+    Subdirectories (e.g. the build manifests) are left untouched.
+    With stems only the files of those outputs (e.g. out.aux for out.pdf)
+    are removed: the other ones may belong to a build still running.
     """
     allowed = {".md", *SUPPORTED_OUTPUT_EXTENSIONS}
 
@@ -1694,6 +2305,10 @@ def clean_build_dir(buildDir: Path) -> None:
         return
 
     for item in buildDir.iterdir():
+        if stems is not None and not any(
+            item.name.startswith(f"{stem}.") for stem in stems
+        ):
+            continue
         if item.is_file() and item.suffix.lower() not in allowed:
             try:
                 item.unlink()
@@ -1702,30 +2317,156 @@ def clean_build_dir(buildDir: Path) -> None:
                 print(f"Warning: Impossible remove '{item.name}': {exc}")
 
 
-def update_bank_files() -> None:
+def remove_build_caches() -> None:
+    """
+    Wipe every cache kept in the build folder (latexmk state, parsed
+    documents, note fragments, scratch folders and manifests) and the
+    local staging of a bank, the outputs are kept.
+    The next conversion runs from scratch.
+    """
+    ctx = current_context()
+    build_dir = ctx.build_dir
+    cache_dirs = [
+        build_dir / AUX_DIR_NAME,
+        build_dir / AST_DIR_NAME,
+        build_dir / FRAGMENTS_DIR_NAME,
+        build_dir / JOBS_DIR_NAME,
+        build_dir / MANIFEST_DIR_NAME,
+    ]
+    if ctx.is_bank:
+        app_dir = safe_path(ctx.staging_dir)
+        cache_dirs += [
+            app_dir / _BUILD_DIR / AUX_DIR_NAME,
+            app_dir / _BUILD_DIR / JOBS_DIR_NAME,
+            app_dir / _ASSETS_DIR,
+            app_dir / _CONFIG_DIR,
+            app_dir / STAGING_MANIFEST_DIR_NAME,
+        ]
+
+    for cache_dir in cache_dirs:
+        if cache_dir.exists():
+            remove_dir(cache_dir)
+            print(f"Removed: {normalize_unc_path(str(cache_dir))}")
+
+    # the failed precompiled preambles (user cache) are tried again
+    for marker in forget_format_failures():
+        print(f"Removed: {marker}")
+
+
+def _render_bank_section(collaborator: str, mainMdPath: Path, content: str) -> str:
+    """
+    Render the section of a collaborator in the bank main.md: single #
+    titles are skipped, ## become ### and relative links become absolute.
+    """
+    lines = []
+    for line in content.splitlines(keepends=True):
+        # Skip single # titles
+        if re.match(r"^#(?!#)", line):
+            continue
+        # Convert ## to ###
+        if line.startswith("##"):
+            line = "#" + line
+        lines.append(line)
+    lines.append("\n")
+
+    # Convert relative links to absolute ones, the folder is resolved once
+    body = convert_link_to_absolute("".join(lines), str(mainMdPath))
+    return f"## {collaborator}\n\n{body}"
+
+
+def _load_bank_sections(cachePath: Path) -> dict[str, dict[str, object]]:
+    """
+    Rendered sections of the previous --update, a broken cache is ignored.
+    """
+    try:
+        with open(cachePath, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(data, dict) or data.get("version") != BANK_SECTIONS_VERSION:
+        return {}
+
+    sections = data.get("sections", {})
+    return sections if isinstance(sections, dict) else {}
+
+
+def _fetch_bank_section(
+    collaborator: str, mainMdPath: Path, cached: dict[str, object] | None
+) -> tuple[str | None, dict[str, object] | None]:
+    """
+    Return the rendered section of a collaborator and its cache entry,
+    (None, None) if the main.md does not exist.
+
+    The cached section is reused when the main.md has the same stat or,
+    after reading it, the same sha256.
+    """
+    main_md = normalize_unc_path(str(mainMdPath))
+    try:
+        st = os.stat(main_md)
+    except OSError:
+        return None, None
+
+    stamp = [st.st_size, st.st_mtime_ns]
+    if (
+        cached is not None
+        and cached.get("name") == collaborator
+        and cached.get("stat") == stamp
+    ):
+        return str(cached["section"]), cached
+
+    with open(main_md, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+
+    if (
+        cached is not None
+        and cached.get("name") == collaborator
+        and cached.get("sha256") == digest
+    ):
+        section = str(cached["section"])
+    else:
+        # Same newlines as a file opened in text mode
+        content = raw.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        section = _render_bank_section(collaborator, mainMdPath, content)
+
+    return section, {
+        "name": collaborator,
+        "stat": stamp,
+        "sha256": digest,
+        "section": section,
+    }
+
+
+def update_bank_files(jobs: int = DEFAULT_JOBS) -> None:
     """
     Update the collaborative bank by validating collaborator links to their
     `main.md` files and composing a combined `main.md` in the bank root.
+
+    The collaborators (usually on network folders) are fetched in parallel
+    by `jobs` threads. Every rendered section is cached in
+    .docscript/bank-sections.json and reused while its main.md does not
+    change; the bank main.md is rewritten only if its content changed.
     """
 
     print("Updating collaborative bank...")
 
-    bank_dir = safe_path(_BANK_DIR)
+    ctx = current_context()
+    bank_dir = safe_path(ctx.bank_dir)
     collab_file = safe_path(bank_dir, COLLAB_FILE_NAME)
     main_bank_path = safe_path(bank_dir, MAIN_FILE_NAME)
+    cache_path = bank_dir / INDEX_DIR_NAME / BANK_SECTIONS_FILE_NAME
 
     if not collab_file.exists():
-        print(f"Error: the file '{collab_file}' does not exist.")
-        sys.exit(1)
+        raise BankError(f"the file '{collab_file}' does not exist.")
 
     # Read collaborator file
     with open(normalize_unc_path(str(collab_file)), encoding="utf-8") as f:
         lines = f.readlines()
 
     collaborator = None
-    errors: list[str] = []
     # list of (name, path_to_main.md)
-    collab_mainmd: list[tuple[str, Path]] = []
+    collab_links: list[tuple[str, Path]] = []
 
     for line in lines:
         line = line.strip()
@@ -1735,44 +2476,70 @@ def update_bank_files() -> None:
         # Search for markdown link to main.md
         match = re.search(r"\[.*?\]\((.*?main\.md)\)", line)
         if match:
-            main_md_path = safe_path("..", match.group(1))
+            collab_links.append((
+                collaborator or "",
+                Path(safe_path(ctx.links_base_dir, match.group(1))),
+            ))
+
+    # Fetch and render every collaborator at the same time
+    cached_sections = _load_bank_sections(cache_path)
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(collab_links)))) as pool:
+        results = list(pool.map(
+            lambda link: _fetch_bank_section(
+                link[0], link[1], cached_sections.get(os.path.abspath(link[1]))),
+            collab_links,
+        ))
 
-            if not Path(main_md_path).exists():
-                errors.append(
-                    f"Collaborator '{collaborator}': "
-                    f"main.md not found at '{main_md_path}'"
-                )
-            else:
-                print(
-                    f"Collaborator '{collaborator}': "
-                    f"main.md found at '{main_md_path}'"
-                )
-                collab_mainmd.append((collaborator or "", Path(main_md_path)))
+    errors: list[str] = []
+    for (collaborator, main_md_path), (section, _) in zip(
+        collab_links, results, strict=True
+    ):
+        if section is None:
+            errors.append(
+                f"Collaborator '{collaborator}': "
+                f"main.md not found at '{main_md_path}'"
+            )
+        else:
+            print(
+                f"Collaborator '{collaborator}': "
+                f"main.md found at '{main_md_path}'"
+            )
 
     if errors:
-        print("The following errors were found in collaborator main.md links:")
-        for err in errors:
-            print(f"- {err}")
-        sys.exit(1)
+        raise BankError(
+            "The following errors were found in collaborator main.md links:\n"
+            + "\n".join(f"- {err}" for err in errors)
+        )
+    print("All collaborator main.md links are valid.")
+
+    # Compose the combined main.md from the sections
+    combined = "# Combined Index\n\n" + "".join(
+        str(section) for section, _ in results)
+
+    main_bank = normalize_unc_path(str(main_bank_path))
+    try:
+        with open(main_bank, encoding="utf-8") as f:
+            changed = f.read() != combined
+    except OSError:
+        changed = True
+
+    if changed:
+        _replace_text(Path(main_bank), combined)
+
+    sections = {
+        os.path.abspath(main_md_path): entry
+        for (_, main_md_path), (_, entry) in zip(collab_links, results, strict=True)
+    }
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{new_job_id()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": BANK_SECTIONS_VERSION, "sections": sections}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as exc:
+        print(f"Warning: impossible to save the bank sections cache: {exc}")
+
+    if changed:
+        print(f"Combined main.md updated at {main_bank_path}")
     else:
-        print("All collaborator main.md links are valid.")
-
-    # Read each collaborator's main.md and compose the combined main.md
-    with open(normalize_unc_path(str(main_bank_path)), "w", encoding="utf-8") as out:
-        out.write("# Combined Index\n\n")
-        for collaborator, main_md_path in collab_mainmd:
-            out.write(f"## {collaborator}\n\n")
-            with open(str(main_md_path), encoding="utf-8") as mf:
-                for line in mf:
-                    # Skip single # titles
-                    if re.match(r"^#(?!#)", line):
-                        continue
-                    # Convert ## to ###
-                    if line.startswith("##"):
-                        line = "#" + line
-                    # Convert relative links to absolute ones
-                    newline = convert_link_to_absolute(line, str(main_md_path))
-                    out.write(newline)
-                out.write("\n")
-
-    print(f"Combined main.md updated at {main_bank_path}")
+        print(f"Combined main.md already up to date at {main_bank_path}")
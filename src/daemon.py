@@ -0,0 +1,224 @@
+import hashlib
+import io
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections.abc import Callable
+from contextlib import redirect_stderr, redirect_stdout, suppress
+from pathlib import Path
+
+from src.version import DOCSCRIPT_VERSION as DCV
+
+###############
+# Description #
+###############
+"""
+The contents of this file are all the functions
+of the resident build daemon (--daemon) and of its thin client.
+
+The daemon keeps the imports, the parsed .conf, the note index and the
+toolchain probe of a vault in memory and serves the builds, lints and
+fix-links of the other invocations over a Unix domain socket.
+Every request is a JSON line {version, argv, cwd}, the answer is a stream
+of JSON lines {out} (the output of the command) closed by {exit}.
+The requests are served one at a time.
+"""
+
+###########
+# Defines #
+###########
+_PRJ_ROOT_DIR = Path(__file__).resolve().parent.parent  # /DocScript
+SOCKET_BACKLOG = 8
+
+
+def daemon_available() -> bool:
+    """
+    Unix domain sockets are not available on every platform (Windows).
+    """
+    return hasattr(socket, "AF_UNIX")
+
+
+def socket_path() -> Path:
+    """
+    Socket of the daemon of this DocScript copy (so of its vault and bank),
+    in the user runtime folder.
+    """
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    digest = hashlib.sha256(str(_PRJ_ROOT_DIR).encode("utf-8")).hexdigest()[:12]
+    return Path(base) / f"docscript-{os.getuid()}-{digest}.sock"
+
+
+def _send(conn: socket.socket, message: dict[str, object]) -> None:
+    conn.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+
+class _ClientStream(io.TextIOBase):
+    """
+    stdout and stderr of a served command: every write is sent to the
+    client. A client gone away does not stop the command.
+    """
+
+    def __init__(self, conn: socket.socket) -> None:
+        super().__init__()
+        self._conn = conn
+        self._lock = threading.Lock()
+        self._gone = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text and not self._gone:
+            try:
+                with self._lock:
+                    _send(self._conn, {"out": text})
+            except OSError:
+                self._gone = True
+        return len(text)
+
+
+def forward(argv: list[str]) -> int | None:
+    """
+    Run the command argv in the daemon, printing its output.
+    Return its exit status, None if no daemon is serving this copy
+    (the command is then run by this process).
+    """
+    if not daemon_available():
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(socket_path()))
+    except OSError:
+        sock.close()
+        return None
+
+    with sock:
+        _send(sock, {"version": DCV, "argv": argv, "cwd": os.getcwd()})
+        for line in sock.makefile("r", encoding="utf-8"):
+            message = json.loads(line)
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+            elif "refused" in message:
+                print(f"Warning: {message['refused']}, running without it.")
+                return None
+            elif "exit" in message:
+                return int(message["exit"])
+
+    print("Error: The DocScript daemon closed the connection.")
+    return 1
+
+
+def _exit_status(exc: SystemExit) -> int:
+    """
+    Exit status of sys.exit(code), a message is printed like the interpreter.
+    """
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code)
+    return 1
+
+
+def _serve_request(conn: socket.socket, handler: Callable[[list[str]], None]) -> None:
+    """
+    Run a single request with its output sent to the client.
+    """
+    line = conn.makefile("r", encoding="utf-8").readline()
+    if not line:
+        # e.g. the check of a second daemon
+        return
+
+    request = json.loads(line)
+    argv = [str(arg) for arg in request.get("argv", [])]
+
+    if request.get("version") != DCV:
+        _send(conn, {"refused": f"the daemon runs DocScript v{DCV}, restart it"})
+        return
+
+    start = time.perf_counter()
+    status = 0
+    cwd = os.getcwd()
+    stream = _ClientStream(conn)
+    with redirect_stdout(stream), redirect_stderr(stream):
+        try:
+            # relative paths of the request (-n, --targets) are the client ones
+            os.chdir(request.get("cwd", cwd))
+            handler(argv)
+        except SystemExit as exc:
+            status = _exit_status(exc)
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        finally:
+            os.chdir(cwd)
+
+    with suppress(OSError):
+        _send(conn, {"exit": status})
+
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{' '.join(argv)} -> exit {status} ({elapsed:.0f} ms)")
+
+
+def _stop(_signum: int, _frame: object) -> None:
+    raise KeyboardInterrupt
+
+
+def serve(handler: Callable[[list[str]], None]) -> None:
+    """
+    Serve the requests until Ctrl+C (or SIGTERM), handler(argv) runs
+    a command.
+    """
+    if not daemon_available():
+        print(
+            "Error: --daemon needs Unix domain sockets, "
+            "not available on this platform."
+        )
+        sys.exit(1)
+
+    path = socket_path()
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(path))
+        print(f"Error: A DocScript daemon is already running on {path}.")
+        sys.exit(1)
+    except OSError:
+        # no daemon behind it: a socket left by a killed daemon
+        if path.exists():
+            path.unlink()
+    finally:
+        probe.close()
+
+    signal.signal(signal.SIGTERM, _stop)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        # created already private: no other user can connect in between
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(str(path))
+        finally:
+            os.umask(old_umask)
+        server.listen(SOCKET_BACKLOG)
+        print(f"DocScript daemon listening on {path}, Ctrl+C to stop.")
+
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    _serve_request(conn, handler)
+                except (OSError, ValueError) as exc:
+                    print(f"Warning: request dropped: {exc}")
+    except KeyboardInterrupt:
+        print("\nDocScript daemon stopped.")
+    finally:
+        server.close()
+        if path.exists():
+            path.unlink()
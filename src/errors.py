@@ -0,0 +1,50 @@
+###############
+# Description #
+###############
+"""
+The contents of this file are all the exceptions
+raised by DocScript when used as a library (see src/api.py).
+The command line prints their message after "Error: " and exits with 1.
+"""
+
+
+class DocScriptError(Exception):
+    """
+    Base of every error of DocScript.
+    """
+
+
+class VaultError(DocScriptError):
+    """
+    No vault (or bank) where one is needed, or the wrong kind of it.
+    """
+
+
+class ConfigError(DocScriptError):
+    """
+    Invalid .conf, option file (yaml, template, lua) or output name.
+    """
+
+
+class NotesError(DocScriptError):
+    """
+    main.md, custom.md or the notes they list are missing or inconsistent.
+    """
+
+
+class BankError(DocScriptError):
+    """
+    Invalid collaborator.md or collaborator main.md.
+    """
+
+
+class ToolchainError(DocScriptError):
+    """
+    pandoc, xelatex or the fonts are missing.
+    """
+
+
+class BuildError(DocScriptError):
+    """
+    The conversion failed (pandoc or latexmk error, missing asset, ...).
+    """
@@ -0,0 +1,187 @@
+import os
+import re
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+
+###############
+# Description #
+###############
+"""
+The contents of this file are all the functions
+that read the notes and extract their links,
+shared by the linter, the link fixer and the merge.
+"""
+
+###########
+# Defines #
+###########
+LINK_PATTERN = re.compile(r"!?\[[^\]]*\]\(([^)]+)\)")
+NOTE_LINK_PATTERN = re.compile(r"\[[^\]]*\]\(([^)]+\.md)\)")
+SUB_MAIN_PATTERN = re.compile(r"^main\.[^.]+\.[^.]+(?:\.[^.]+)*\.main\.md$")
+EXTERNAL_PATTERN = re.compile(r"^(?:[a-z][a-z0-9+.-]*:|#)", re.IGNORECASE)
+COMMENT_OPEN = "<!--"
+COMMENT_CLOSE = "-->"
+
+# Same default as ThreadPoolExecutor: the work is I/O bound
+DEFAULT_JOBS = min(32, (os.cpu_count() or 1) + 4)
+
+
+# Links found in a single note
+@dataclass
+class NoteLinks:
+    path: str
+    targets: list[str] = field(default_factory=list)
+
+
+# Target of a markdown link: content[start:end] == target
+@dataclass(frozen=True)
+class LinkSpan:
+    start: int
+    end: int
+    target: str
+    in_comment: bool
+
+
+def _iter_spans_between(
+    content: str, start: int, end: int, inComment: bool
+) -> Iterator[LinkSpan]:
+    """
+    Yield the link targets of content[start:end], without the
+    surrounding whitespace.
+    """
+    for match in LINK_PATTERN.finditer(content, start, end):
+        raw = match.group(1)
+        target = raw.strip()
+        if not target:
+            continue
+        target_start = match.start(1) + (len(raw) - len(raw.lstrip()))
+        yield LinkSpan(target_start, target_start + len(target), target, inComment)
+
+
+def iter_link_spans(content: str) -> Iterator[LinkSpan]:
+    """
+    Scan content once and yield every link target (regular and image
+    links) with its character offsets, in order of appearance.
+    Targets inside HTML comments are flagged with in_comment. A <!-- that
+    is never closed is not a comment (like the <!--.*?--> pattern the
+    notes were read with): the links after it are regular links.
+    """
+    pos = 0
+    length = len(content)
+
+    while pos < length:
+        comment_start = content.find(COMMENT_OPEN, pos)
+        comment_end = -1
+        if comment_start != -1:
+            comment_end = content.find(
+                COMMENT_CLOSE, comment_start + len(COMMENT_OPEN))
+        if comment_end == -1:
+            yield from _iter_spans_between(content, pos, length, False)
+            return
+
+        comment_end += len(COMMENT_CLOSE)
+        yield from _iter_spans_between(content, pos, comment_start, False)
+        yield from _iter_spans_between(content, comment_start, comment_end, True)
+        pos = comment_end
+
+
+def extract_links_outside_comments(content: str) -> list[str]:
+    """
+    Extract the link targets of content, skipping the ones in comments.
+    """
+    return [span.target for span in iter_link_spans(content) if not span.in_comment]
+
+
+def rewrite_links(content: str, replacements: Mapping[str, str]) -> str:
+    """
+    Replace every link target found in replacements, outside comments,
+    in a single pass over content. Comments and any other text are
+    left exactly as they are.
+    """
+    if not replacements:
+        return content
+
+    parts: list[str] = []
+    pos = 0
+    for span in iter_link_spans(content):
+        if span.in_comment or span.target not in replacements:
+            continue
+        parts.append(content[pos:span.start])
+        parts.append(replacements[span.target])
+        pos = span.end
+
+    if not parts:
+        return content
+
+    parts.append(content[pos:])
+    return "".join(parts)
+
+
+def extract_note_links(content: str) -> list[str]:
+    """
+    Extract the links to other .md notes, line by line, the way main.md
+    and sub-main files are read (comments are not stripped).
+
+    Example:
+        [Title](path/file.md)
+    """
+    links: list[str] = []
+    for line in content.splitlines():
+        links.extend(NOTE_LINK_PATTERN.findall(line))
+    return links
+
+
+def is_sub_main(fileName: str) -> bool:
+    """
+    Check if a file name is a sub-main.md file.
+    Pattern: main.folder.*.main.md
+    """
+    return SUB_MAIN_PATTERN.match(fileName.split("/")[-1]) is not None
+
+
+def link_path_part(target: str) -> str:
+    """
+    Return the path of a link without fragment (#...) and query string (?...).
+    """
+    return target.split("#", 1)[0].split("?", 1)[0]
+
+
+def is_external_link(target: str) -> bool:
+    """
+    True for URLs (http:, mailto:, ...) and internal anchors (#...).
+    """
+    return EXTERNAL_PATTERN.match(target) is not None
+
+
+def scan_note(filePath: str) -> NoteLinks | None:
+    """
+    Read a note once and return the link targets outside comments.
+    Return None if the note is not a file.
+    """
+    note_path = Path(filePath)
+
+    if not note_path.is_file():
+        return None
+
+    with open(note_path, encoding="utf-8") as note_file:
+        content = note_file.read()
+
+    return NoteLinks(str(note_path), extract_links_outside_comments(content))
+
+
+def scan_notes(files: list[str], jobs: int = DEFAULT_JOBS) -> list[NoteLinks]:
+    """
+    Scan every note with a pool of jobs threads.
+    The result keeps the order of files whatever the scheduling, notes that
+    are not files are left out.
+    """
+    if jobs <= 1 or len(files) <= 1:
+        scanned = [scan_note(file) for file in files]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            scanned = list(pool.map(scan_note, files))
+
+    return [note for note in scanned if note is not None]
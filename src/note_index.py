@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+
+from src.links import (
+    DEFAULT_JOBS,
+    NoteLinks,
+    extract_links_outside_comments,
+    extract_note_links,
+    is_external_link,
+    is_sub_main,
+    link_path_part,
+)
+
+###############
+# Description #
+###############
+"""
+The contents of this file are all the functions
+that keep a persistent index of the links of every note,
+so that only the notes changed since the last run are parsed again.
+"""
+
+###########
+# Defines #
+###########
+INDEX_DIR_NAME = ".docscript"
+INDEX_FILE_NAME = "index.json"
+INDEX_VERSION = 2
+# mtime granularity of the coarsest filesystems (FAT, SMB shares): a note
+# written this close to the index may change again with the same stat
+RACY_WINDOW_NS = 2 * 10**9
+
+
+# Everything DocScript needs to know about a note, plus its stat
+@dataclass
+class NoteRecord:
+    mtime_ns: int
+    size: int
+    sha256: str
+    # link targets outside comments (notes and assets)
+    links: list[str] = field(default_factory=list)
+    # .md links, read line by line like main.md
+    note_links: list[str] = field(default_factory=list)
+    # local links that are not .md notes
+    asset_links: list[str] = field(default_factory=list)
+    # .md links to sub-main files
+    sub_mains: list[str] = field(default_factory=list)
+
+
+def parse_note(content: bytes, st: os.stat_result) -> NoteRecord:
+    """
+    Parse the content of a note into a NoteRecord.
+    """
+    text = content.decode("utf-8")
+    links = extract_links_outside_comments(text)
+    note_links = extract_note_links(text)
+
+    asset_links = []
+    for target in links:
+        path_part = link_path_part(target)
+        if not target or is_external_link(target) or not path_part:
+            continue
+        if Path(path_part).suffix.lower() != ".md":
+            asset_links.append(target)
+
+    return NoteRecord(
+        mtime_ns=st.st_mtime_ns,
+        size=st.st_size,
+        sha256=hashlib.sha256(content).hexdigest(),
+        links=links,
+        note_links=note_links,
+        asset_links=asset_links,
+        sub_mains=[link for link in note_links if is_sub_main(link)],
+    )
+
+
+class NoteIndex:
+    """
+    Persistent index of the notes of a vault, stored in
+    <vault>/.docscript/index.json and keyed by the absolute note path.
+    A note is read again only when its mtime or size changed, and parsed
+    again only when its content (sha256) changed too.
+
+    Like git's racily clean entries, a note whose mtime is within
+    RACY_WINDOW_NS of the index write is saved with mtime 0: its stat
+    cannot tell a later same-size edit, so the next run checks its hash.
+    """
+
+    def __init__(self, rootDir: str | Path) -> None:
+        self.path = Path(rootDir) / INDEX_DIR_NAME / INDEX_FILE_NAME
+        self._records: dict[str, NoteRecord] = {}
+        self._seen: set[str] = set()
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """
+        Read the index, a missing or outdated file is treated as empty.
+        """
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+            return
+
+        for note_path, record in data.get("notes", {}).items():
+            try:
+                self._records[note_path] = NoteRecord(**record)
+            except TypeError:
+                continue
+
+    def get(
+        self,
+        filePath: str | Path,
+        statFn: Callable[[str], os.stat_result] = os.stat,
+    ) -> NoteRecord | None:
+        """
+        Return the record of a note, parsing it again only if its content
+        changed (a different stat with the same size is checked by hash).
+        Return None if the note is not a file.
+        statFn can answer from an already known stat (see VaultSnapshot).
+        """
+        note_path = str(filePath)
+
+        try:
+            st = statFn(note_path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+
+        record = self._records.get(note_path)
+        with self._lock:
+            self._seen.add(note_path)
+
+        if (
+            record is not None
+            and record.mtime_ns == st.st_mtime_ns
+            and record.size == st.st_size
+        ):
+            return record
+
+        with open(note_path, "rb") as f:
+            content = f.read()
+
+        if (
+            record is not None
+            and record.size == st.st_size
+            and record.sha256 == hashlib.sha256(content).hexdigest()
+        ):
+            # only touched (checkout, sync, save without changes): not parsed
+            new_record = replace(record, mtime_ns=st.st_mtime_ns)
+        else:
+            new_record = parse_note(content, st)
+
+        with self._lock:
+            self._records[note_path] = new_record
+            self._dirty = True
+
+        return new_record
+
+    def scan(
+        self,
+        files: list[str],
+        jobs: int = DEFAULT_JOBS,
+        statFn: Callable[[str], os.stat_result] = os.stat,
+    ) -> list[NoteLinks]:
+        """
+        Same as links.scan_notes(), but unchanged notes are not read at all.
+        """
+        if jobs <= 1 or len(files) <= 1:
+            records = [self.get(file, statFn) for file in files]
+        else:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                records = list(pool.map(lambda f: self.get(f, statFn), files))
+
+        return [
+            NoteLinks(str(Path(file)), list(record.links))
+            for file, record in zip(files, records, strict=True)
+            if record is not None
+        ]
+
+    def _smudge_racy(self, writtenNs: int) -> None:
+        """
+        Set mtime 0 on the notes modified within RACY_WINDOW_NS of
+        writtenNs: their stat no longer matches, their hash is checked.
+        """
+        for note_path, record in self._records.items():
+            if record.mtime_ns > writtenNs - RACY_WINDOW_NS:
+                self._records[note_path] = replace(record, mtime_ns=0)
+
+    def save(self) -> None:
+        """
+        Write the index back if something changed, dropping the notes
+        that no longer exist. The file is replaced atomically.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+
+            for note_path in list(self._records):
+                if note_path not in self._seen and not os.path.isfile(note_path):
+                    del self._records[note_path]
+
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                # a temporary file of its own: other processes (watch, the
+                # daemon, the users of a bank) may be saving the same index
+                with tempfile.NamedTemporaryFile(
+                    "w", encoding="utf-8", dir=self.path.parent,
+                    prefix=f"{INDEX_FILE_NAME}.", suffix=".tmp", delete=False,
+                ) as f:
+                    # time of the write, by the clock of the filesystem
+                    self._smudge_racy(os.fstat(f.fileno()).st_mtime_ns)
+                    data = {
+                        "version": INDEX_VERSION,
+                        "notes": {
+                            note_path: asdict(record)
+                            for note_path, record in sorted(self._records.items())
+                        },
+                    }
+                    json.dump(data, f)
+                os.replace(f.name, self.path)
+            except OSError as exc:
+                print(f"Warning: impossible to save the note index: {exc}")
+                return
+
+            self._dirty = False
@@ -0,0 +1,270 @@
+import hashlib
+import os
+import subprocess
+import time
+from contextlib import suppress
+from pathlib import Path
+
+from src.build_lock import exclusive_lock
+from src.pandoc.toolchain import probe_toolchain, user_cache_dir
+
+###############
+# Description #
+###############
+"""
+The contents of this file are all the functions
+that precompile the static preamble of the LaTeX template into a format
+(a .fmt file loaded by xelatex with -fmt), so that every PDF compile
+starts with the packages already loaded instead of reading them again.
+
+The static preamble is the part of the template before the line
+\\csname endofdump\\endcsname: it must not use pandoc variables nor load
+fonts (XeTeX cannot dump them), e.g. fontspec goes after it. The format
+is dumped by the mylatexformat package, which also makes the compiles
+that load it skip the template up to that line.
+A template without the line is compiled as before.
+
+Formats are per machine: they live in the user cache folder, keyed by the
+hash of the static preamble and by the xelatex version. A format that
+TeX cannot dump (e.g. a missing package), or that breaks a compile, is
+marked as failed with the reason and not tried again for
+FAILED_RETRY_AFTER, or until --clean. Failures that do not come from TeX
+(full disk, killed process) are not remembered: the next build retries.
+"""
+
+###########
+# Defines #
+###########
+FORMATS_DIR_NAME = "formats"
+DUMP_MARKER = r"\csname endofdump\endcsname"
+FORMAT_VERSION = 1  # bump to drop the formats dumped by older versions
+MAX_FORMATS = 8  # the least recently used formats beyond are removed
+FAILED_SUFFIX = ".failed"  # marker of a failed format, holds the reason
+FAILED_RETRY_AFTER = 24 * 60 * 60  # seconds before a failed format is retried
+
+
+def static_preamble(tmpl: str | Path) -> str | None:
+    """
+    Text of the template before the dump marker, None if the template
+    has no marker or its preamble depends on pandoc variables.
+    """
+    try:
+        text = Path(tmpl).read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        return None
+
+    head, marker, _ = text.partition(DUMP_MARKER)
+    if not marker or "$" in head:
+        return None
+    return head
+
+
+def _formats_dir() -> Path:
+    return user_cache_dir() / FORMATS_DIR_NAME
+
+
+def _format_key(preamble: str, xelatexVersion: str) -> str:
+    key = f"{FORMAT_VERSION}:{xelatexVersion}:{preamble}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _last_used(fmtPath: Path) -> float:
+    try:
+        return fmtPath.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def _prune_formats(formatsDir: Path, keep: Path) -> None:
+    """
+    Remove the least recently used formats (a format is a few MB).
+    """
+    formats = sorted(
+        (p for p in formatsDir.glob("*.fmt") if p != keep),
+        key=_last_used,
+        reverse=True,
+    )
+    for old in formats[MAX_FORMATS - 1 :]:
+        old.unlink(missing_ok=True)
+
+
+def _failed_recently(marker: Path) -> bool:
+    """
+    A failure marker younger than FAILED_RETRY_AFTER.
+    """
+    try:
+        return time.time() - marker.stat().st_mtime < FAILED_RETRY_AFTER
+    except OSError:
+        return False
+
+
+def _mark_failed(marker: Path, reason: str) -> None:
+    with suppress(OSError):
+        marker.write_text(f"{reason}\n", encoding="utf-8")
+
+
+def _tex_error(logPath: Path) -> str:
+    """
+    First error of a TeX log (the line starting with "!").
+    """
+    try:
+        with open(logPath, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if line.startswith("!"):
+                    return line[1:].strip()
+    except OSError:
+        pass
+    return "xelatex failed"
+
+
+def _dump_format(formatsDir: Path, key: str, preamble: str) -> bool:
+    """
+    Dump formatsDir/<key>.fmt from the static preamble, True on success.
+    A TeX error marks the format as failed, the log is kept next to it.
+    """
+    fmt_path = formatsDir / f"{key}.fmt"
+    log_path = formatsDir / f"{key}.log"
+    tex_path = formatsDir / f"{key}.tex"
+
+    print("Precompiling the LaTeX preamble (once per template)...")
+    try:
+        tex_path.write_text(f"{preamble}{DUMP_MARKER}\n", encoding="utf-8")
+        result = subprocess.run(
+            [
+                "xelatex",
+                "-ini",
+                "-interaction=nonstopmode",
+                "-halt-on-error",
+                f"-jobname={key}",
+                "&xelatex",
+                "mylatexformat.ltx",
+                tex_path.name,
+            ],
+            cwd=formatsDir,
+            capture_output=True,
+            check=False,
+        )
+    except OSError as exc:
+        # not a TeX error (e.g. full disk): retried by the next build
+        fmt_path.unlink(missing_ok=True)
+        print(
+            f"Warning: impossible to precompile the LaTeX preamble: {exc}, "
+            "compiling without it."
+        )
+        return False
+    finally:
+        tex_path.unlink(missing_ok=True)
+
+    if result.returncode < 0:
+        # killed by a signal: retried by the next build
+        fmt_path.unlink(missing_ok=True)
+        print(
+            "Warning: the precompilation of the LaTeX preamble was "
+            "interrupted, compiling without it."
+        )
+        return False
+
+    if result.returncode != 0 or not fmt_path.exists():
+        fmt_path.unlink(missing_ok=True)
+        reason = _tex_error(log_path)
+        _mark_failed(formatsDir / f"{key}{FAILED_SUFFIX}", reason)
+        print(
+            f"Warning: impossible to precompile the LaTeX preamble "
+            f"({reason}, see {log_path}), compiling without it. "
+            "Retried in a day or after --clean."
+        )
+        return False
+
+    log_path.unlink(missing_ok=True)
+    (formatsDir / f"{key}{FAILED_SUFFIX}").unlink(missing_ok=True)
+    return True
+
+
+def preamble_format(tmpl: str | Path) -> Path | None:
+    """
+    Return the format of the static preamble of tmpl, dumped on first use.
+    None if the template has no static preamble, xelatex is missing or
+    the format cannot be used.
+    """
+    preamble = static_preamble(tmpl)
+    if preamble is None:
+        return None
+
+    xelatex_version = probe_toolchain().version("xelatex")
+    if xelatex_version is None:
+        return None
+
+    formats_dir = _formats_dir()
+    key = _format_key(preamble, xelatex_version)
+    fmt_path = formats_dir / f"{key}.fmt"
+
+    failed_marker = formats_dir / f"{key}{FAILED_SUFFIX}"
+    if _failed_recently(failed_marker):
+        return None
+
+    try:
+        if not fmt_path.exists():
+            # a single dump even when several builds start together
+            with exclusive_lock(
+                formats_dir / f"{key}.lock", "the precompilation of the LaTeX preamble"
+            ):
+                if _failed_recently(failed_marker):
+                    return None
+                if not fmt_path.exists() and not _dump_format(
+                    formats_dir, key, preamble
+                ):
+                    return None
+                _prune_formats(formats_dir, fmt_path)
+        else:
+            os.utime(fmt_path)
+    except OSError as exc:
+        print(f"Warning: impossible to use the precompiled LaTeX preamble: {exc}")
+        return None
+
+    return fmt_path
+
+
+def reject_format(fmtPath: Path) -> None:
+    """
+    The format broke a compile that succeeds without it: mark it as failed.
+    """
+    print(
+        "Warning: the precompiled LaTeX preamble does not work with this "
+        "template, it is not used (retried in a day or after --clean)."
+    )
+    _mark_failed(
+        fmtPath.with_suffix(FAILED_SUFFIX),
+        "the format broke a compile that succeeds without it",
+    )
+    with suppress(OSError):
+        fmtPath.unlink(missing_ok=True)
+
+
+def forget_format_failures() -> list[Path]:
+    """
+    Remove every failure marker (--clean): the formats are tried again.
+    Return the markers removed.
+    """
+    removed = []
+    for marker in _formats_dir().glob(f"*{FAILED_SUFFIX}"):
+        try:
+            marker.unlink()
+        except OSError:
+            continue
+        removed.append(marker)
+    return removed
+
+
+def latexmk_format_args(fmtPath: Path) -> list[str]:
+    """
+    latexmk options that make xelatex load the format
+    (the default xelatex command of latexmk, plus -fmt).
+    """
+    return [f'-xelatex=xelatex -no-pdf -fmt="{fmtPath}" %O %S']
+
+
+def pandoc_format_args(fmtPath: Path) -> list[str]:
+    """
+    pandoc options that make its xelatex runs load the format.
+    """
+    return [f"--pdf-engine-opt=-fmt={fmtPath}"]
@@ -1,9 +1,23 @@
+import hashlib
 import os
 import shutil
 import subprocess
-import sys
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
 from pathlib import Path
 
+from src.build_cache import file_digest
+from src.build_lock import new_job_id
+from src.errors import ToolchainError
+from src.pandoc.latex_format import (
+    latexmk_format_args,
+    pandoc_format_args,
+    preamble_format,
+    reject_format,
+)
+from src.pandoc.toolchain import Toolchain, probe_toolchain
+from src.profiler import command as profile_command
 from src.utils import (
     is_network_path,
     normalize_unc_path,
@@ -20,103 +34,171 @@ that describe the behavior of pandoc env
 
 SUPPORTED_OUTPUT_EXTENSIONS = (".pdf", ".tex", ".docx", ".odt")
 SUPPORTED_OUTPUT_EXTENSIONS_TEXT = ".pdf, .tex, .docx, or .odt."
+LATEX_OUTPUT_EXTENSIONS = (".pdf", ".tex")
+
+AST_DIR_NAME = ".ast"  # Cached pandoc JSON AST of the combined notes
+AUX_DIR_NAME = ".aux"  # Persistent latexmk folders, one per target
+FRAGMENTS_DIR_NAME = ".fragments"  # LaTeX of every note, keyed by its hash
+# Reader of the renders from the AST, passed after --defaults: the options
+# given before it are overridden by the defaults file (e.g. its from: key)
+_AST_READER_ARGS = ("-f", "json")
+
+# The markdown to convert: a file, or its text piped to the stdin of pandoc
+MarkdownSource = Path | Iterable[str]
 
 
 def _run_logged_command(
     command: list[str],
     *,
     cwd: str | None = None,
+    stdin: Iterable[str] | None = None,
 ) -> subprocess.CompletedProcess[str]:
-    """Print the command before executing it and run it with the same options."""
+    """Print the command before executing it and run it with the same options.
+    The chunks of stdin, if any, are written to the command as they come."""
     print("run the command:")
     if cwd:
         print(f"cwd: {cwd}")
     for item in command:
         print(f"  {item}")
+    if stdin is not None:
+        print("  < merged notes")
     print()
 
-    return subprocess.run(
-        command,
-        cwd=cwd,
-        check=True,
-        capture_output=True,
-        text=True,
-        encoding="utf-8",
-        errors="replace",
-    )
+    with profile_command(Path(command[0]).stem, argv=command) as info:
+        if stdin is None:
+            result = subprocess.run(
+                command,
+                cwd=cwd,
+                check=True,
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+            )
+        else:
+            result = _run_with_stdin(command, cwd, stdin)
+        if Path(command[0]).stem == "latexmk":
+            # every xelatex pass is announced by latexmk
+            info["passes"] = (result.stdout + result.stderr).count("Run number")
 
+    return result
 
-def check_precondition() -> None:
+
+def _run_with_stdin(
+    command: list[str], cwd: str | None, stdin: Iterable[str]
+) -> subprocess.CompletedProcess[str]:
     """
-    Verify if the system meets the necessary prerequisites for conversion.
-    Check whether xelatex and pandoc are installed and available in your PATH.
+    subprocess.run(check=True, capture_output=True) writing the chunks of
+    stdin to the command while they are produced (e.g. by the merge).
+    stdout and stderr are drained by two threads, so that a full pipe
+    never blocks the command while it is still reading its input.
     """
+    with (
+        subprocess.Popen(
+            command,
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        ) as proc,
+        ThreadPoolExecutor(max_workers=2) as pool,
+    ):
+        # all three are pipes, as requested above
+        assert proc.stdin is not None
+        assert proc.stdout is not None
+        assert proc.stderr is not None
+        stdout = pool.submit(proc.stdout.read)
+        stderr = pool.submit(proc.stderr.read)
+        try:
+            # the command stopped reading: its exit status tells why
+            with suppress(BrokenPipeError):
+                for chunk in stdin:
+                    proc.stdin.write(chunk)
+        except BaseException:
+            # the input cannot be completed (e.g. a missing asset)
+            proc.kill()
+            raise
+        finally:
+            with suppress(BrokenPipeError):
+                proc.stdin.close()
+        returncode = proc.wait()
+        result = subprocess.CompletedProcess(
+            command, returncode, stdout.result(), stderr.result()
+        )
 
-    if sys.platform.startswith("win"):
-        if os.system("where xelatex >nul 2>nul") != 0:
-            print("Error: xelatex not installed or not in PATH.")
-            sys.exit(1)
-        else:
-            print("xelatex installed.")
+    result.check_returncode()
+    return result
 
-    if sys.platform.startswith("linux"):
-        if os.system("which xelatex > /dev/null") != 0:
-            print("Error: xelatex not installed or not in PATH.")
-            sys.exit(1)
-        else:
-            print("xelatex installed.")
 
-    if sys.platform.startswith("win"):
-        if os.system("where pandoc >nul 2>nul") != 0:
-            print("Error: pandoc not installed or not in PATH.")
-            sys.exit(1)
-        else:
-            print("pandoc installed.")
+def _input_args(src: MarkdownSource) -> list[str]:
+    """
+    Input file of pandoc: none when the document comes from its stdin.
+    """
+    if isinstance(src, Path):
+        return [str(normalize_unc_path(str(src)))]
+    return []
 
-    if sys.platform.startswith("linux"):
-        if os.system("which pandoc > /dev/null") != 0:
-            print("Error: pandoc not installed or not in PATH.")
-            sys.exit(1)
-        else:
-            print("pandoc installed.")
-
-    if sys.platform.startswith("win"):
-        if (
-            os.system(
-                'fc-list | findstr /i "FreeSerif FreeSans FreeMono" >nul 2>nul')
-            != 0
-        ):
-            print("Error: GNU FreeFonts not installed.")
-            sys.exit(1)
-        else:
-            print("GNU FreeFonts installed.")
 
-    if sys.platform.startswith("linux"):
-        if os.system("locate Free .ttf | grep /usr/share/fonts/TTF/ > /dev/null") != 0:
-            print(
-                "Error: GNU FreeFonts not installed "
-                "in /usr/share/fonts/TTF ."
-            )
-            sys.exit(1)
-        else:
-            print("GNU FreeFonts installed.")
+def _input_text(src: MarkdownSource) -> Iterable[str] | None:
+    return None if isinstance(src, Path) else src
+
+
+def check_precondition() -> Toolchain:
+    """
+    Verify if the system meets the necessary prerequisites for conversion.
+    Check whether xelatex and pandoc are installed and available in your PATH
+    and the GNU FreeFonts are installed. The probe is cached between runs.
+    """
+    toolchain = probe_toolchain()
+
+    for tool in ("xelatex", "pandoc"):
+        if toolchain.tools[tool].path is None:
+            raise ToolchainError(f"{tool} not installed or not in PATH.")
+        print(f"{tool} installed ({toolchain.version(tool)}).")
+
+    if toolchain.tools["latexmk"].path is None:
+        print("latexmk not found, PDF outputs need it.")
+
+    missing_fonts = toolchain.missing_fonts()
+    if missing_fonts:
+        raise ToolchainError(
+            f"GNU FreeFonts not installed ({', '.join(missing_fonts)})."
+        )
+    print("GNU FreeFonts installed.")
+
+    return toolchain
 
 
 def execute_pandoc(
     tmpl: str,
     luaf: str,
     pndo: str,
-    src: Path,
+    src: MarkdownSource,
     dst: Path,
     d_v: str,  # dir vault
     d_a: str,  # dir assets
     d_b: str,  # dir build finale
+    auxDir: str | None = None,
 ) -> None:
     """
     Convert the src path: vault/build/combined_notes.md,
     to a destination using template and files passed.
     Write the document in dst path: vault/build/.
     Supports .pdf, .tex, .docx and .odt outputs.
+
+    src can also be the text of the document (e.g. the merge generator):
+    it is then piped to pandoc, without writing the combined file.
+
+    The tools run inside the build directory d_b, relative paths of the
+    document are resolved from there even when src and dst live in a
+    scratch subfolder. The process CWD is never changed.
+
+    With auxDir a PDF is always compiled by latexmk inside auxDir, which
+    is never cleaned: the next compile starts from the previous .aux/.toc
+    and usually needs a single xelatex pass.
     """
 
     out_path = safe_path(dst)
@@ -128,8 +210,6 @@ def execute_pandoc(
             f"Use {SUPPORTED_OUTPUT_EXTENSIONS_TEXT}"
         )
 
-    # Entrer the Build Directory
-    os.chdir(d_b)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     print("conversion Started, wait please...")
@@ -137,10 +217,15 @@ def execute_pandoc(
     tex_path = out_path.with_suffix(".tex")
 
     try:
-        if is_network_path():
+        if auxDir is not None and output_ext == ".pdf":
+            _compile_pdf_incremental(
+                tmpl, luaf, pndo, src, out_path, d_v, d_a, d_b, auxDir
+            )
+
+        elif is_network_path():
             cmd = [
                 "pandoc",
-                str(normalize_unc_path(str(src))),
+                *_input_args(src),
                 "-o",
                 str(normalize_unc_path(str(tex_path))),
                 "--defaults",
@@ -157,13 +242,10 @@ def execute_pandoc(
                 str(normalize_unc_path(d_b)),
             ]
 
-            _run_logged_command(cmd)
+            _run_logged_command(cmd, cwd=d_b, stdin=_input_text(src))
 
             if output_ext == ".pdf":
-                _run_logged_command(
-                    ["latexmk", "-xelatex", tex_path.name],
-                    cwd=str(tex_path.parent),
-                )
+                _run_latexmk(tmpl, tex_path, tex_path.parent, d_b)
                 generated_pdf = tex_path.with_suffix(".pdf")
                 if generated_pdf.exists() and generated_pdf != out_path:
                     shutil.copy2(generated_pdf, out_path)
@@ -175,7 +257,8 @@ def execute_pandoc(
                         str(normalize_unc_path(str(tex_path))),
                         "-o",
                         str(normalize_unc_path(str(out_path))),
-                    ]
+                    ],
+                    cwd=d_b,
                 )
 
             elif output_ext == ".tex" and tex_path != out_path:
@@ -201,7 +284,7 @@ def execute_pandoc(
         else:
             cmd = [
                 "pandoc",
-                str(normalize_unc_path(str(src))),
+                *_input_args(src),
                 "-o",
                 str(normalize_unc_path(str(out_path))),
                 "--template",
@@ -218,10 +301,366 @@ def execute_pandoc(
                 str(normalize_unc_path(d_b)),
             ]
 
-            if output_ext == ".pdf":
-                cmd.insert(2, "--pdf-engine=xelatex")
+            if output_ext != ".pdf":
+                _run_logged_command(cmd, cwd=d_b, stdin=_input_text(src))
+            else:
+                cmd.insert(1, "--pdf-engine=xelatex")
+                fmt_path = preamble_format(tmpl)
+                if fmt_path is not None and not isinstance(src, Path):
+                    src = list(src)  # kept to compile again without the format
+                _with_preamble_format(
+                    fmt_path,
+                    lambda args: _run_logged_command(
+                        [cmd[0], *args, *cmd[1:]], cwd=d_b, stdin=_input_text(src)
+                    ),
+                    pandoc_format_args,
+                )
+
+    except subprocess.CalledProcessError as e:
+        print("STDOUT:")
+        print(e.stdout)
+
+        print("STDERR:")
+        print(e.stderr)
+
+        raise
+
+
+def _compile_pdf_incremental(
+    tmpl: str,
+    luaf: str,
+    pndo: str,
+    src: MarkdownSource,
+    out_path: Path,
+    d_v: str,
+    d_a: str,
+    d_b: str,
+    auxDir: str,
+) -> None:
+    """
+    Write the .tex inside auxDir and compile it there with latexmk,
+    then copy the PDF to out_path. latexmk compares the .tex with its
+    database (.fdb_latexmk) and reruns xelatex only when needed.
+    """
+    aux_dir = safe_path(auxDir)
+    aux_dir.mkdir(parents=True, exist_ok=True)
+    tex_path = aux_dir / f"{out_path.stem}.tex"
+
+    _run_logged_command(
+        [
+            "pandoc",
+            *_input_args(src),
+            "-o",
+            str(normalize_unc_path(str(tex_path))),
+            "--defaults",
+            str(normalize_unc_path(str(pndo))),
+            "--template",
+            str(normalize_unc_path(str(tmpl))),
+            "--lua-filter",
+            str(normalize_unc_path(str(luaf))),
+            *_resource_args(d_v, d_a, d_b),
+        ],
+        cwd=d_b,
+        stdin=_input_text(src),
+    )
+
+    _run_latexmk(tmpl, tex_path, aux_dir, d_b)
+
+    shutil.copy2(tex_path.with_suffix(".pdf"), out_path)
+
+
+def _with_preamble_format(
+    fmtPath: Path | None,
+    run: Callable[[list[str]], object],
+    formatArgs: Callable[[Path], list[str]],
+    retryArgs: list[str] | None = None,
+) -> None:
+    """
+    run(args) compiles a PDF: run it with the formatArgs that load the
+    precompiled preamble fmtPath, if there is one (see latex_format).
+    When that compile fails it is run again without the format (with
+    retryArgs), and the format is dropped if this time it succeeds.
+    """
+    if fmtPath is None:
+        run([])
+        return
+
+    try:
+        run(formatArgs(fmtPath))
+    except subprocess.CalledProcessError:
+        print("Compiling again without the precompiled preamble...")
+        # raised again if the document itself is broken
+        run(retryArgs or [])
+        reject_format(fmtPath)
+
+
+def _run_latexmk(tmpl: str, texPath: Path, outDir: Path, d_b: str) -> None:
+    """
+    Compile texPath with latexmk into outDir, loading the precompiled
+    preamble of tmpl when there is one.
+    """
+    _with_preamble_format(
+        preamble_format(tmpl),
+        lambda args: _run_logged_command(
+            [
+                "latexmk",
+                "-xelatex",
+                *args,
+                f"-outdir={normalize_unc_path(str(outDir))}",
+                str(normalize_unc_path(str(texPath))),
+            ],
+            cwd=d_b,
+        ),
+        latexmk_format_args,
+        # latexmk does not rerun a failed compile of unchanged sources
+        retryArgs=["-g"],
+    )
+
+
+def _resource_args(d_v: str, d_a: str, d_b: str) -> list[str]:
+    """
+    --resource-path options shared by every pandoc run.
+    """
+    return [
+        "--resource-path",
+        str(normalize_unc_path(d_v)),
+        "--resource-path",
+        str(normalize_unc_path(d_a)),
+        "--resource-path",
+        str(normalize_unc_path(d_b)),
+    ]
+
+
+def build_intermediate(
+    src: MarkdownSource, pndo: str, d_v: str, d_a: str, d_b: str, name: str
+) -> Path:
+    """
+    Parse the markdown src once into a pandoc JSON AST stored in
+    d_b/.ast/<name>-<key>.json, where the key is the hash of src and of
+    the pandoc options. An AST with the same key is reused as it is.
+    name identifies the document (e.g. its first output file name).
+    """
+    if isinstance(src, Path):
+        src_digest = file_digest(src)
+    else:
+        src = list(src)  # hashed, then piped to pandoc
+        digest = hashlib.sha256()
+        for chunk in src:
+            digest.update(chunk.encode("utf-8"))
+        src_digest = digest.hexdigest()
+
+    key = src_digest + file_digest(pndo) + probe_toolchain().cache_key()
+    key = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+    ast_dir = safe_path(d_b) / AST_DIR_NAME
+    ast_path = ast_dir / f"{name}-{key}.json"
+
+    if ast_path.exists():
+        print(f"Reuse the parsed document: {ast_path.name}")
+        return ast_path
+
+    ast_dir.mkdir(parents=True, exist_ok=True)
+    # Drop the outdated ASTs of the same document
+    for old in ast_dir.glob(f"{name}-*.json"):
+        old.unlink(missing_ok=True)
+
+    tmp_path = ast_path.with_suffix(f".{new_job_id()}.tmp")
+    # No --lua-filter here: the filter branches on FORMAT (\includepdf,
+    # emoji, raw LaTeX only when FORMAT is latex), which is "json" while
+    # the AST is written. It runs once per writer, see execute_pandoc_multi.
+    _run_logged_command(
+        [
+            "pandoc",
+            *_input_args(src),
+            "-o",
+            str(normalize_unc_path(str(tmp_path))),
+            "--defaults",
+            str(normalize_unc_path(str(pndo))),
+            # after --defaults, like _AST_READER_ARGS
+            "-t",
+            "json",
+            *_resource_args(d_v, d_a, d_b),
+        ],
+        cwd=d_b,
+        stdin=_input_text(src),
+    )
+    os.replace(tmp_path, ast_path)
 
-            _run_logged_command(cmd)
+    return ast_path
+
+
+def execute_pandoc_multi(
+    tmpl: str,
+    luaf: str,
+    pndo: str,
+    src: MarkdownSource,
+    dsts: list[Path],
+    d_v: str,  # dir vault
+    d_a: str,  # dir assets
+    d_b: str,  # dir build finale
+    auxDir: str | None = None,
+) -> None:
+    """
+    Same as execute_pandoc() for several outputs of the same document.
+
+    The markdown is parsed once into a JSON AST (see build_intermediate),
+    then every format is rendered from it:
+    - .tex and .pdf share a single LaTeX render, the PDF is compiled
+      from that .tex by latexmk
+    - .docx and .odt are rendered straight from the AST
+
+    The Lua filter runs at render time, once per writer: it produces
+    different blocks for FORMAT latex and for the office formats, and
+    FORMAT is only known by the writer. With auxDir latexmk keeps its
+    state there.
+    """
+
+    out_paths = [safe_path(dst) for dst in dsts]
+    for out_path in out_paths:
+        if out_path.suffix.lower() not in SUPPORTED_OUTPUT_EXTENSIONS:
+            raise ValueError(
+                f"Unsupported output extension '{out_path.suffix}'. "
+                f"Use {SUPPORTED_OUTPUT_EXTENSIONS_TEXT}"
+            )
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    print("conversion Started, wait please...")
+
+    try:
+        ast_path = build_intermediate(src, pndo, d_v, d_a, d_b, out_paths[0].name)
+
+        # 1. LaTeX family: one .tex, then latexmk for the PDF
+        latex_outs = [
+            p for p in out_paths if p.suffix.lower() in LATEX_OUTPUT_EXTENSIONS
+        ]
+        if latex_outs:
+            tex_path = next(
+                (p for p in latex_outs if p.suffix.lower() == ".tex"),
+                latex_outs[0].with_suffix(".tex"),
+            )
+            _run_logged_command(
+                [
+                    "pandoc",
+                    str(normalize_unc_path(str(ast_path))),
+                    "-o",
+                    str(normalize_unc_path(str(tex_path))),
+                    "--defaults",
+                    str(normalize_unc_path(str(pndo))),
+                    *_AST_READER_ARGS,
+                    "--template",
+                    str(normalize_unc_path(str(tmpl))),
+                    "--lua-filter",
+                    str(normalize_unc_path(str(luaf))),
+                    *_resource_args(d_v, d_a, d_b),
+                ],
+                cwd=d_b,
+            )
+
+            pdf_outs = [p for p in latex_outs if p.suffix.lower() == ".pdf"]
+            if pdf_outs:
+                out_dir = tex_path.parent if auxDir is None else Path(auxDir)
+                out_dir.mkdir(parents=True, exist_ok=True)
+                _run_latexmk(tmpl, tex_path, out_dir, d_b)
+                generated_pdf = out_dir / f"{tex_path.stem}.pdf"
+                for pdf_path in pdf_outs:
+                    if generated_pdf.exists() and generated_pdf != pdf_path:
+                        shutil.copy2(generated_pdf, pdf_path)
+
+        # 2. Office formats, rendered from the same AST
+        for out_path in out_paths:
+            if out_path.suffix.lower() in LATEX_OUTPUT_EXTENSIONS:
+                continue
+            _run_logged_command(
+                [
+                    "pandoc",
+                    str(normalize_unc_path(str(ast_path))),
+                    "-o",
+                    str(normalize_unc_path(str(out_path))),
+                    "--defaults",
+                    str(normalize_unc_path(str(pndo))),
+                    *_AST_READER_ARGS,
+                    "--lua-filter",
+                    str(normalize_unc_path(str(luaf))),
+                    *_resource_args(d_v, d_a, d_b),
+                ],
+                cwd=d_b,
+            )
+
+    except subprocess.CalledProcessError as e:
+        print("STDOUT:")
+        print(e.stdout)
+
+        print("STDERR:")
+        print(e.stderr)
+
+        raise
+
+
+def compile_fragments(
+    chunks: list[str],
+    luaf: str,
+    pndo: str,
+    d_v: str,
+    d_a: str,
+    d_b: str,
+) -> list[str]:
+    """
+    Convert every markdown chunk (one per note) into a LaTeX fragment and
+    return the fragments in the same order.
+
+    Fragments are cached in d_b/.fragments/ under the hash of the chunk,
+    of the Lua filter and of the pandoc options: only the notes changed
+    since the last build are converted again, in parallel.
+    """
+    cache_dir = safe_path(d_b) / FRAGMENTS_DIR_NAME
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    config_key = (
+        f"{file_digest(luaf)}:{file_digest(pndo)}:{probe_toolchain().cache_key()}"
+    )
+    keys = [
+        hashlib.sha256(f"{config_key}:{chunk}".encode()).hexdigest() for chunk in chunks
+    ]
+    missing = {
+        key: chunk
+        for key, chunk in zip(keys, chunks, strict=True)
+        if not (cache_dir / f"{key}.tex").exists()
+    }
+    print(
+        f"Notes converted: {len(missing)}, "
+        f"reused from the cache: {len(chunks) - len(missing)}"
+    )
+
+    def _compile(key: str) -> None:
+        # names of this job: the same note may be converted by another
+        # build (of this or of another process) at the same time
+        job_id = new_job_id()
+        md_path = cache_dir / f"{key}.{job_id}.md"
+        tmp_path = cache_dir / f"{key}.{job_id}.tmp.tex"
+        md_path.write_text(missing[key], encoding="utf-8")
+        try:
+            _run_logged_command(
+                [
+                    "pandoc",
+                    str(normalize_unc_path(str(md_path))),
+                    "-o",
+                    str(normalize_unc_path(str(tmp_path))),
+                    "--defaults",
+                    str(normalize_unc_path(str(pndo))),
+                    "--lua-filter",
+                    str(normalize_unc_path(str(luaf))),
+                    *_resource_args(d_v, d_a, d_b),
+                ],
+                cwd=d_b,
+            )
+            os.replace(tmp_path, cache_dir / f"{key}.tex")
+        finally:
+            md_path.unlink(missing_ok=True)
+
+    try:
+        if missing:
+            with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+                list(pool.map(_compile, missing))
 
     except subprocess.CalledProcessError as e:
         print("STDOUT:")
@@ -231,3 +670,5 @@ def execute_pandoc(
         print(e.stderr)
 
         raise
+
+    return [(cache_dir / f"{key}.tex").read_text(encoding="utf-8") for key in keys]
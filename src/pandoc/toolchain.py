@@ -0,0 +1,274 @@
+import json
+import os
+import shutil
+import subprocess
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from src.build_lock import new_job_id
+
+###############
+# Description #
+###############
+"""
+The contents of this file are all the functions
+that detect the conversion toolchain (pandoc, xelatex, latexmk and the
+GNU FreeFonts) and remember the result between runs.
+"""
+
+###########
+# Defines #
+###########
+TOOLS = ("pandoc", "xelatex", "latexmk")
+FREE_FONTS = ("FreeSans", "FreeMono")  # the fonts of the default template
+FONT_EXTENSIONS = (".ttf", ".otf")
+PROBE_VERSION = 1
+PROBE_FILE_NAME = "toolchain.json"
+
+
+# A program of the toolchain, path and version are None if it is missing
+@dataclass
+class ToolInfo:
+    path: str | None = None
+    version: str | None = None
+
+
+# Result of a probe, plus the key used to know if it is still valid
+@dataclass
+class Toolchain:
+    tools: dict[str, ToolInfo] = field(default_factory=dict)
+    # font family -> font files
+    fonts: dict[str, list[str]] = field(default_factory=dict)
+    key: dict[str, object] = field(default_factory=dict)
+
+    def version(self, tool: str) -> str | None:
+        info = self.tools.get(tool)
+        return info.version if info else None
+
+    def missing_fonts(self) -> list[str]:
+        return [family for family in FREE_FONTS if not self.fonts.get(family)]
+
+    def cache_key(self) -> str:
+        """
+        Versions of the toolchain, to be part of every build cache key.
+        """
+        return ";".join(f"{tool}={self.version(tool)}" for tool in TOOLS)
+
+
+def user_cache_dir() -> Path:
+    """
+    Folder of what DocScript remembers per machine (not per vault).
+    """
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or str(Path.home() / "AppData" / "Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "DocScript"
+
+
+def _probe_cache_path() -> Path:
+    """
+    The probe is per machine: it lives in the user cache folder.
+    """
+    return user_cache_dir() / PROBE_FILE_NAME
+
+
+def _stamp(path: str | None) -> int | None:
+    """
+    mtime of a file, None if it does not exist.
+    """
+    if path is None:
+        return None
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _tools_key() -> dict[str, object]:
+    """
+    PATH and path/mtime of every tool: a cheap lookup, no process spawned.
+    """
+    tools: dict[str, list[object]] = {}
+    for tool in TOOLS:
+        path = shutil.which(tool)
+        tools[tool] = [path, _stamp(path)]
+    return {"PATH": os.environ.get("PATH", ""), "tools": tools}
+
+
+def _tool_version(path: str) -> str | None:
+    """
+    First line printed by `<tool> --version`.
+    """
+    try:
+        result = subprocess.run(
+            [path, "--version"],
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            check=False,
+            timeout=30,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+    for line in result.stdout.splitlines():
+        if line.strip():
+            return line.strip()
+    return None
+
+
+def _font_dirs() -> list[Path]:
+    """
+    Usual font folders, searched when fontconfig is not available.
+    """
+    if os.name == "nt":
+        dirs = [Path(os.environ.get("WINDIR", r"C:\Windows")) / "Fonts"]
+        local = os.environ.get("LOCALAPPDATA")
+        if local:
+            dirs.append(Path(local) / "Microsoft" / "Windows" / "Fonts")
+        return dirs
+
+    return [
+        Path("/usr/share/fonts"),
+        Path("/usr/local/share/fonts"),
+        Path.home() / ".local" / "share" / "fonts",
+        Path.home() / ".fonts",
+        Path("/Library/Fonts"),
+        Path.home() / "Library" / "Fonts",
+    ]
+
+
+def _find_fonts() -> dict[str, list[str]]:
+    """
+    Resolve the files of every FreeFont family with fontconfig (fc-list),
+    or by name in the usual font folders if fc-list is missing.
+    """
+    fonts: dict[str, list[str]] = {family: [] for family in FREE_FONTS}
+
+    fc_list = shutil.which("fc-list")
+    if fc_list is not None:
+        for family in FREE_FONTS:
+            try:
+                result = subprocess.run(
+                    [fc_list, f":family={family}", "file"],
+                    capture_output=True,
+                    text=True,
+                    encoding="utf-8",
+                    errors="replace",
+                    check=False,
+                    timeout=60,
+                )
+            except (OSError, subprocess.SubprocessError):
+                continue
+            fonts[family] = sorted(
+                line.strip().rstrip(":")
+                for line in result.stdout.splitlines()
+                if line.strip()
+            )
+        return fonts
+
+    for font_dir in _font_dirs():
+        if not font_dir.is_dir():
+            continue
+        for root, _, files in os.walk(font_dir):
+            for file in files:
+                if not file.lower().endswith(FONT_EXTENSIONS):
+                    continue
+                for family in FREE_FONTS:
+                    if file.startswith(family):
+                        fonts[family].append(os.path.join(root, file))
+
+    return {family: sorted(files) for family, files in fonts.items()}
+
+
+def _load_probe(cachePath: Path) -> Toolchain | None:
+    """
+    Read the saved probe, None if it is missing or unreadable.
+    """
+    try:
+        with open(cachePath, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(data, dict) or data.get("version") != PROBE_VERSION:
+        return None
+
+    try:
+        return Toolchain(
+            tools={name: ToolInfo(**info) for name, info in data["tools"].items()},
+            fonts=data["fonts"],
+            key=data["key"],
+        )
+    except (KeyError, TypeError, AttributeError):
+        return None
+
+
+def _save_probe(cachePath: Path, toolchain: Toolchain) -> None:
+    """
+    Save the probe atomically, a failure only costs a new probe next time.
+    """
+    try:
+        cachePath.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cachePath.with_name(f"{cachePath.name}.{new_job_id()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": PROBE_VERSION, **asdict(toolchain)}, f, indent=1)
+        os.replace(tmp_path, cachePath)
+    except OSError as exc:
+        print(f"Warning: impossible to save the toolchain probe: {exc}")
+
+
+def _is_still_valid(toolchain: Toolchain, key: dict[str, object]) -> bool:
+    """
+    Same PATH, same binaries and every font file still in place.
+    Missing fonts are always looked for again.
+    """
+    if toolchain.key != key or toolchain.missing_fonts():
+        return False
+
+    return all(
+        os.path.isfile(file) for files in toolchain.fonts.values() for file in files
+    )
+
+
+# Last probe of this process, checked against the key on every call
+_TOOLCHAIN: Toolchain | None = None
+
+
+def probe_toolchain(refresh: bool = False) -> Toolchain:
+    """
+    Return the toolchain of this machine.
+
+    The probe (versions and fonts) is saved in the user cache folder and
+    reused until PATH or one of the binaries changes, so that a build
+    normally spawns no process at all to check its prerequisites.
+    A resident process (--daemon, src/api.py) notices an upgrade of
+    pandoc or TeX on its next call: the key costs a few stat, no process.
+    """
+    global _TOOLCHAIN
+
+    key = _tools_key()
+    if _TOOLCHAIN is not None and not refresh and _TOOLCHAIN.key == key:
+        return _TOOLCHAIN
+
+    cache_path = _probe_cache_path()
+
+    toolchain = None if refresh else _load_probe(cache_path)
+    if toolchain is None or not _is_still_valid(toolchain, key):
+        tools_stamps = key["tools"]
+        assert isinstance(tools_stamps, dict)
+
+        toolchain = Toolchain(key=key)
+        for tool in TOOLS:
+            path = tools_stamps[tool][0]
+            toolchain.tools[tool] = ToolInfo(
+                path=path,
+                version=_tool_version(path) if path else None,
+            )
+        toolchain.fonts = _find_fonts()
+        _save_probe(cache_path, toolchain)
+
+    _TOOLCHAIN = toolchain
+    return toolchain
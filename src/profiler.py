@@ -0,0 +1,252 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+###############
+# Description #
+###############
+"""
+The contents of this file are all the functions
+that time the phases of a build when --profile is given:
+wall time, CPU time, bytes read/written and the external commands.
+The result is a summary table and a Chrome trace (chrome://tracing,
+https://ui.perfetto.dev).
+"""
+
+###########
+# Defines #
+###########
+PROFILE_DIR_NAME = ".profile"  # Chrome traces written by --profile
+PROC_IO_PATH = "/proc/self/io"  # Linux only, bytes read/written
+
+
+# A finished phase, times in microseconds from the start of the profile
+@dataclass
+class Span:
+    name: str
+    category: str
+    start_us: float
+    dur_us: float
+    cpu_ms: float
+    read_bytes: int | None
+    written_bytes: int | None
+    pid: int
+    tid: int
+    args: dict[str, Any] = field(default_factory=dict)
+
+
+def _io_counters() -> tuple[int, int] | None:
+    """
+    Bytes read and written by this process so far, None where unknown.
+    """
+    try:
+        with open(PROC_IO_PATH, encoding="ascii") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _cpu_seconds(children: bool = False) -> float:
+    times = os.times()
+    if children:
+        return times.children_user + times.children_system
+    return times.user + times.system
+
+
+class Profiler:
+    """
+    Collect the spans of a run. Every process has its own profiler,
+    the spans of a worker are merged into the parent one (see merge_spans).
+    """
+
+    def __init__(self, origin: float | None = None) -> None:
+        # wall clock origin, shared with the workers so that the trace
+        # of a parallel build is aligned
+        self.origin = time.time() if origin is None else origin
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def _now_us(self) -> float:
+        return (time.time() - self.origin) * 1_000_000
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def phase(
+        self, name: str, category: str, args: dict[str, Any]
+    ) -> Iterator[dict[str, Any]]:
+        start = self._now_us()
+        cpu = _cpu_seconds()
+        io = _io_counters()
+        try:
+            yield args
+        finally:
+            io_end = _io_counters()
+            read = written = None
+            if io is not None and io_end is not None:
+                read, written = io_end[0] - io[0], io_end[1] - io[1]
+            self.add(
+                Span(
+                    name=name,
+                    category=category,
+                    start_us=start,
+                    dur_us=self._now_us() - start,
+                    cpu_ms=(_cpu_seconds() - cpu) * 1000,
+                    read_bytes=read,
+                    written_bytes=written,
+                    pid=os.getpid(),
+                    tid=threading.get_ident(),
+                    args=args,
+                )
+            )
+
+    @contextmanager
+    def command(self, name: str, args: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        """
+        Time an external command, its CPU is the one of the children.
+        """
+        start = self._now_us()
+        cpu = _cpu_seconds(children=True)
+        try:
+            yield args
+        finally:
+            self.add(
+                Span(
+                    name=name,
+                    category="command",
+                    start_us=start,
+                    dur_us=self._now_us() - start,
+                    cpu_ms=(_cpu_seconds(children=True) - cpu) * 1000,
+                    read_bytes=None,
+                    written_bytes=None,
+                    pid=os.getpid(),
+                    tid=threading.get_ident(),
+                    args=args,
+                )
+            )
+
+    def summary(self) -> str:
+        """
+        One line per phase name: count, wall, CPU and I/O totals.
+        Nested phases are also counted in their parents.
+        """
+        totals: dict[tuple[str, str], list[float]] = {}
+        for span in self.spans:
+            row = totals.setdefault((span.category, span.name), [0, 0.0, 0.0, 0, 0])
+            row[0] += 1
+            row[1] += span.dur_us / 1000
+            row[2] += span.cpu_ms
+            row[3] += span.read_bytes or 0
+            row[4] += span.written_bytes or 0
+
+        lines = [
+            f"{'phase':<28} {'n':>4} {'wall ms':>10} {'cpu ms':>10} "
+            f"{'read KiB':>10} {'write KiB':>10}"
+        ]
+        for (category, name), row in sorted(totals.items(), key=lambda t: -t[1][1]):
+            label = f"{name} ({category})" if category != "phase" else name
+            lines.append(
+                f"{label:<28} {row[0]:>4} {row[1]:>10.1f} {row[2]:>10.1f} "
+                f"{row[3] / 1024:>10.1f} {row[4] / 1024:>10.1f}"
+            )
+        return "\n".join(lines)
+
+    def write_trace(self, tracePath: str | Path) -> Path:
+        """
+        Write the spans as a Chrome trace (complete "X" events).
+        """
+        events = []
+        for span in self.spans:
+            args = dict(span.args)
+            args["cpu_ms"] = round(span.cpu_ms, 3)
+            if span.read_bytes is not None:
+                args["read_bytes"] = span.read_bytes
+                args["written_bytes"] = span.written_bytes
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": round(span.start_us, 1),
+                    "dur": round(span.dur_us, 1),
+                    "pid": span.pid,
+                    "tid": span.tid,
+                    "args": args,
+                }
+            )
+
+        trace_path = Path(tracePath)
+        trace_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(trace_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return trace_path
+
+
+# Profiler of this process, None when --profile is not given
+_PROFILER: Profiler | None = None
+
+
+def enable_profiling(origin: float | None = None) -> Profiler:
+    """
+    Start recording the phases of this process, from scratch: a worker
+    forked from a profiled process does not keep the parent spans.
+    """
+    global _PROFILER
+
+    _PROFILER = Profiler(origin)
+    return _PROFILER
+
+
+def get_profiler() -> Profiler | None:
+    return _PROFILER
+
+
+def phase(
+    name: str, category: str = "phase", **args: Any
+) -> AbstractContextManager[dict[str, Any]]:
+    """
+    Context manager timing a phase of the build, free when not profiling.
+    It yields the args of the span, more can be added before it ends.
+
+        with phase("merge", notes=len(files)):
+            ...
+    """
+    if _PROFILER is None:
+        return nullcontext({})
+    return _PROFILER.phase(name, category, args)
+
+
+def command(name: str, **args: Any) -> AbstractContextManager[dict[str, Any]]:
+    """
+    Context manager timing an external command (pandoc, latexmk, ...).
+    """
+    if _PROFILER is None:
+        return nullcontext({})
+    return _PROFILER.command(name, args)
+
+
+def export_spans() -> list[dict[str, Any]]:
+    """
+    Spans of this process as plain data, to be sent to the parent process.
+    """
+    if _PROFILER is None:
+        return []
+    return [asdict(span) for span in _PROFILER.spans]
+
+
+def merge_spans(spans: list[dict[str, Any]]) -> None:
+    """
+    Add the spans recorded by a worker process.
+    """
+    if _PROFILER is not None:
+        for span in spans:
+            _PROFILER.add(Span(**span))
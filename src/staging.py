@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+from contextlib import suppress
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.build_cache import file_digest
+
+###############
+# Description #
+###############
+"""
+The contents of this file are all the functions
+that keep the local staging folder of the bank builds in sync with the
+collaborators' files, copying only what changed since the last build.
+"""
+
+###########
+# Defines #
+###########
+STAGING_MANIFEST_DIR_NAME = ".staging"  # One manifest per staged folder
+STAGING_MANIFEST_VERSION = 1
+_CHUNK_SIZE = 1024 * 1024
+# Manifest entry of a staged file: [source, size, mtime_ns, sha256]
+_Entry = list[str | int]
+
+
+# What a sync did, printed at the end of the staging
+@dataclass
+class SyncStats:
+    copied: int = 0
+    unchanged: int = 0
+    removed: int = 0
+
+
+def collect_tree(
+    srcDir: str | Path, sources: dict[str, str] | None = None, prefix: str = ""
+) -> dict[str, str]:
+    """
+    Add every file of srcDir to sources as prefix + relative path -> source
+    path. A file already in sources is replaced (the last tree wins).
+    """
+    if sources is None:
+        sources = {}
+
+    src_dir = str(srcDir)
+    for root, _, files in os.walk(src_dir):
+        for file in files:
+            src_file = os.path.join(root, file)
+            rel = os.path.relpath(src_file, src_dir).replace(os.sep, "/")
+            sources[prefix + rel] = src_file
+
+    return sources
+
+
+def _manifest_path(stagingDir: Path) -> Path:
+    """
+    The manifests live next to the staged folders, never inside them.
+    """
+    return stagingDir.parent / STAGING_MANIFEST_DIR_NAME / f"{stagingDir.name}.json"
+
+
+def _load_manifest(stagingDir: Path) -> dict[str, _Entry]:
+    """
+    relative path -> entry of the last sync.
+    """
+    try:
+        with open(_manifest_path(stagingDir), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(data, dict) or data.get("version") != STAGING_MANIFEST_VERSION:
+        return {}
+
+    files = data.get("files", {})
+    return files if isinstance(files, dict) else {}
+
+
+def _store_manifest(stagingDir: Path, files: dict[str, _Entry]) -> None:
+    manifest_path = _manifest_path(stagingDir)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = manifest_path.with_name(f"{manifest_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": STAGING_MANIFEST_VERSION, "files": files}, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+def _copy_with_digest(src: str, tmpPath: Path) -> str:
+    """
+    Copy src into tmpPath reading it only once, return its sha256.
+    """
+    digest = hashlib.sha256()
+    with open(src, "rb") as fin, open(tmpPath, "wb") as fout:
+        for chunk in iter(lambda: fin.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            fout.write(chunk)
+    return digest.hexdigest()
+
+
+def sync_tree(sources: dict[str, str], stagingDir: str | Path) -> SyncStats:
+    """
+    Make stagingDir hold exactly the files of sources
+    (relative path -> source path).
+
+    - same source, size and mtime as the last sync -> nothing is read
+    - changed mtime, same size and sha256 (touched) -> hashed where it is,
+                                                      nothing is copied
+    - new or changed content                        -> copied
+    - staged files no longer in sources             -> removed
+    """
+    staging_dir = Path(stagingDir)
+    staging_dir.mkdir(parents=True, exist_ok=True)
+
+    previous = _load_manifest(staging_dir)
+    current: dict[str, _Entry] = {}
+    stats = SyncStats()
+
+    for rel, src in sorted(sources.items()):
+        try:
+            src_stat = os.stat(src)
+        except OSError as exc:
+            print(f"Warning: impossible to stage '{src}': {exc}")
+            continue
+
+        dst = staging_dir / rel
+        entry = previous.get(rel)
+        stamp: _Entry = [src, src_stat.st_size, src_stat.st_mtime_ns]
+
+        if entry is not None and dst.is_file():
+            if entry[:3] == stamp:
+                current[rel] = entry
+                stats.unchanged += 1
+                continue
+
+            # same size: read the source once where it is (e.g. on the
+            # share), the copy is paid only if the content changed
+            if entry[1] == src_stat.st_size:
+                try:
+                    digest = file_digest(src)
+                except OSError as exc:
+                    print(f"Warning: impossible to stage '{src}': {exc}")
+                    continue
+                if digest == entry[3]:
+                    current[rel] = [*stamp, digest]
+                    stats.unchanged += 1
+                    continue
+
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = dst.with_name(f"{dst.name}.{os.getpid()}.tmp")
+        try:
+            digest = _copy_with_digest(src, tmp_path)
+        except OSError as exc:
+            tmp_path.unlink(missing_ok=True)
+            print(f"Warning: impossible to stage '{src}': {exc}")
+            continue
+
+        os.utime(tmp_path, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+        os.replace(tmp_path, dst)
+        stats.copied += 1
+        current[rel] = [*stamp, digest]
+
+    # Prune everything that is not a source anymore
+    for root, dirs, files in os.walk(staging_dir, topdown=False):
+        for file in files:
+            path = Path(root) / file
+            rel = path.relative_to(staging_dir).as_posix()
+            if rel not in current:
+                path.unlink()
+                stats.removed += 1
+        for directory in dirs:
+            with suppress(OSError):
+                (Path(root) / directory).rmdir()  # only if empty
+
+    _store_manifest(staging_dir, current)
+    return stats
@@ -2,7 +2,6 @@ import os
 import re
 import shutil
 import stat
-import subprocess
 import textwrap
 import time
 from collections.abc import Callable
@@ -15,6 +14,12 @@ from pathlib import Path
 Generic all-rounded function
 """
 
+###########
+# Defines #
+###########
+# A markdown link on a single line (label, target)
+LINK_TO_ABSOLUTE_PATTERN = re.compile(r"\[([^\]\n]+)\]\(([^)\n]+)\)")
+
 
 def is_network_path() -> bool:
     """
@@ -33,27 +38,70 @@ def is_network_path() -> bool:
     return False
 
 
-def normalize_unc_path(windowsPath: str) -> str:
+# Mapped network drives ({"Z:": "\\\\server\\share"}), read once per process
+_MAPPED_DRIVES: dict[str, str] | None = None
+
+
+def _read_mapped_drives() -> dict[str, str]:
     """
-    Convert a UNC Windows path with backslash (\\\\server\\share\\path)
-    in a compatible path with external instruments like pandoc (//server/share/path).
+    Read all the network disk drive mapped into the system with `net use`.
     """
+    # Only needed on Windows, not paid at startup
+    import subprocess
 
-    windows_path = windowsPath
+    try:
+        result = subprocess.run(
+            ["net", "use"], capture_output=True, text=True, check=False
+        )
+    except OSError:
+        return {}
 
-    # Read all the network disk drive into the system
-    result = subprocess.run(
-        "net use", capture_output=True, text=True, shell=True)
-    lines = result.stdout.splitlines()
     mapped_drives = {}
-
-    for line in lines:
+    for line in result.stdout.splitlines():
         parts = line.strip().split()
         if len(parts) >= 2 and parts[0].endswith(":") and parts[1].startswith("\\\\"):
             drive_letter = parts[0]
             unc_path = parts[1]
             mapped_drives[drive_letter] = unc_path
 
+    return mapped_drives
+
+
+def get_mapped_drives() -> dict[str, str]:
+    """
+    Return the table of mapped network drives, loaded on the first call
+    and then reused for the whole process.
+    On Linux there are no mapped drives: the table is always empty.
+    """
+    global _MAPPED_DRIVES
+
+    if _MAPPED_DRIVES is None:
+        _MAPPED_DRIVES = _read_mapped_drives() if os.name == "nt" else {}
+
+    return _MAPPED_DRIVES
+
+
+def invalidate_mapped_drives() -> None:
+    """
+    Forget the mapped drives table, the next lookup reads it again.
+    Use it when a drive can be mapped or removed while the process runs.
+    """
+    global _MAPPED_DRIVES
+    _MAPPED_DRIVES = None
+
+
+def normalize_unc_path(windowsPath: str) -> str:
+    """
+    Convert a UNC Windows path with backslash (\\\\server\\share\\path)
+    in a compatible path with external instruments like pandoc (//server/share/path).
+    """
+
+    windows_path = windowsPath
+
+    mapped_drives = get_mapped_drives()
+    if not mapped_drives:
+        return windows_path  # bypass
+
     # Normalize the path preserving the original casing for the returned path.
     normalized_path = Path(windows_path).resolve().as_posix()
     path_parts = normalized_path.strip("/").split("/")
@@ -72,7 +120,7 @@ def normalize_unc_path(windowsPath: str) -> str:
             idx = path_parts_lower.index(unc_parts[-1].lower())
 
             # Build the path starting from the first folder found.
-            relative_parts = path_parts[idx + 1:]
+            relative_parts = path_parts[idx + 1 :]
             final_path = Path(drive + "/") / Path(*relative_parts)
 
             return str(final_path).replace("\\", "/")
@@ -235,15 +283,16 @@ def should_skip_file(filePath: str, BLACKLIST: list[str]) -> bool:
 def convert_link_to_absolute(markdownText: str, base_path: str) -> str:
     """
     Convert relative Markdown links in `markdownText` to absolute paths
-    based on `base_path` and return the transformed line.
+    based on `base_path` and return the transformed text.
+    Only the base folder is resolved on disk, the links are joined to it
+    lexically, so a whole file can be converted with a single syscall.
     """
-    base_dir = Path(base_path).parent.resolve()
+    base_dir = str(Path(base_path).parent.resolve())
 
     def replacer(match: re.Match[str]) -> str:
         label = match.group(1)
         rel_path = match.group(2)
-        abs_path = (base_dir / rel_path).resolve()
+        abs_path = os.path.normpath(os.path.join(base_dir, rel_path))
         return f"[{label}]({abs_path})"
 
-    pattern = re.compile(r"\[([^\]]+)\]\(([^)]+)\)")
-    return pattern.sub(replacer, markdownText).replace("\\", "/")
+    return LINK_TO_ABSOLUTE_PATTERN.sub(replacer, markdownText).replace("\\", "/")
@@ -0,0 +1,163 @@
+import os
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+###############
+# Description #
+###############
+"""
+The contents of this file are all the functions
+that take a snapshot of the vault (or bank) tree with a single
+os.scandir walk, so that every existence check, listing and stat of a
+run is answered from memory instead of the disk.
+"""
+
+###########
+# Defines #
+###########
+# (name, entry) of a folder, folders have entry None
+_Child = tuple[str, os.DirEntry[str] | None]
+
+
+def _key(path: str | Path) -> str:
+    """
+    Lookup key of a path: absolute, normalized, case folded where the
+    filesystem is case insensitive. No syscall is made.
+    """
+    return os.path.normcase(os.path.normpath(os.path.abspath(str(path))))
+
+
+class VaultSnapshot:
+    """
+    Immutable view of every file and folder under root, taken once.
+
+    Folders named in skipDirs and symlinked folders are not walked: every
+    query about a path inside them, or outside root, is answered by the
+    disk as before. The stat of a file comes from its os.DirEntry, which
+    caches it (on Windows it is even part of the directory listing).
+    """
+
+    def __init__(self, root: str | Path, skipDirs: tuple[str, ...] = ()) -> None:
+        self.root = str(root)
+        self._root_key = _key(root)
+        self._skip_dirs = set(skipDirs)
+        self._files: dict[str, os.DirEntry[str]] = {}
+        self._dirs: dict[str, list[_Child]] = {}
+        # folders known to exist whose content is not in the snapshot
+        self._opaque: list[str] = []
+        self._scan()
+
+    def _scan(self) -> None:
+        if not os.path.isdir(self.root):
+            return
+
+        stack = [self.root]
+        while stack:
+            dir_path = stack.pop()
+            try:
+                with os.scandir(dir_path) as entries:
+                    children = sorted(entries, key=lambda e: e.name)
+            except OSError:
+                self._opaque.append(_key(dir_path))
+                continue
+
+            listing: list[_Child] = []
+            for entry in children:
+                if entry.is_dir(follow_symlinks=False):
+                    listing.append((entry.name, None))
+                    if entry.name in self._skip_dirs:
+                        self._opaque.append(_key(entry.path))
+                    else:
+                        stack.append(entry.path)
+                elif entry.is_dir():
+                    # symlinked folder: listed, but answered by the disk
+                    listing.append((entry.name, None))
+                    self._opaque.append(_key(entry.path))
+                elif entry.is_file():
+                    listing.append((entry.name, entry))
+                    self._files[_key(entry.path)] = entry
+
+            self._dirs[_key(dir_path)] = listing
+
+    def covers(self, path: str | Path) -> bool:
+        """
+        True if the snapshot can answer for path without the disk.
+        """
+        key = _key(path)
+        if key != self._root_key and not key.startswith(
+            self._root_key.rstrip(os.sep) + os.sep
+        ):
+            return False
+
+        return not any(
+            key == opaque or key.startswith(opaque + os.sep) for opaque in self._opaque
+        )
+
+    def is_file(self, path: str | Path) -> bool:
+        if not self.covers(path):
+            return os.path.isfile(path)
+        return _key(path) in self._files
+
+    def is_dir(self, path: str | Path) -> bool:
+        if not self.covers(path):
+            return os.path.isdir(path)
+        return _key(path) in self._dirs
+
+    def exists(self, path: str | Path) -> bool:
+        if not self.covers(path):
+            return os.path.exists(path)
+        key = _key(path)
+        return key in self._files or key in self._dirs
+
+    def stat(self, path: str | Path) -> os.stat_result:
+        """
+        Same as os.stat(path), FileNotFoundError if it is not a file.
+        """
+        if not self.covers(path):
+            return os.stat(path)
+
+        entry = self._files.get(_key(path))
+        if entry is None:
+            raise FileNotFoundError(str(path))
+        return entry.stat()
+
+    def resolve(self, path: str | Path) -> Path:
+        """
+        Same as Path(path).resolve(): lexical inside the snapshot, where
+        no symlink can be crossed, by the disk everywhere else.
+        """
+        if self.covers(path):
+            return Path(os.path.normpath(os.path.abspath(str(path))))
+        return Path(path).resolve()
+
+    def iter_files(
+        self,
+        top: str | Path | None = None,
+        skipDir: Callable[[str], bool] | None = None,
+    ) -> Iterator[tuple[str, str]]:
+        """
+        Yield (path relative to top, absolute path) of every file under top,
+        in alphabetical depth-first order (the files of a folder before its
+        sub folders). Folders for which skipDir(name) is true are skipped.
+        top must be covered by the snapshot.
+        """
+        top_path = self.root if top is None else str(top)
+        stack = [(top_path, _key(top_path), "")]
+
+        while stack:
+            dir_path, dir_key, rel_dir = stack.pop()
+            sub_dirs = []
+            for name, entry in self._dirs.get(dir_key, []):
+                if entry is not None:
+                    yield f"{rel_dir}{name}", os.path.join(dir_path, name)
+                elif skipDir is None or not skipDir(name):
+                    sub_dirs.append(
+                        (
+                            os.path.join(dir_path, name),
+                            os.path.join(dir_key, os.path.normcase(name)),
+                            f"{rel_dir}{name}/",
+                        )
+                    )
+
+            # reversed so that folders are visited in alphabetical order
+            stack.extend(reversed(sub_dirs))
@@ -0,0 +1,85 @@
+import os
+import time
+from collections.abc import Iterable
+
+###############
+# Description #
+###############
+"""
+The contents of this file are all the functions
+that poll a set of files and report when they change,
+used by the watch mode to rebuild only the affected outputs.
+"""
+
+###########
+# Defines #
+###########
+DEFAULT_POLL_INTERVAL = 1.0  # seconds between two polls
+DEFAULT_DEBOUNCE = 0.5  # quiet time that closes a burst of saves
+
+# (mtime_ns, size) of a file, None if it does not exist
+FileStamp = tuple[int, int] | None
+
+
+def take_snapshot(files: Iterable[str]) -> dict[str, FileStamp]:
+    """
+    Stat every file once and return its stamp.
+    """
+    snapshot: dict[str, FileStamp] = {}
+
+    for file in files:
+        try:
+            st = os.stat(file)
+            snapshot[file] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            snapshot[file] = None
+
+    return snapshot
+
+
+def changed_files(
+    before: dict[str, FileStamp], after: dict[str, FileStamp]
+) -> set[str]:
+    """
+    Return the files created, deleted or modified between two snapshots.
+    """
+    return {
+        file
+        for file in before.keys() | after.keys()
+        if before.get(file) != after.get(file)
+    }
+
+
+def wait_for_changes(
+    snapshot: dict[str, FileStamp],
+    interval: float = DEFAULT_POLL_INTERVAL,
+    debounce: float = DEFAULT_DEBOUNCE,
+) -> set[str]:
+    """
+    Block until at least one of the files in snapshot changes, then keep
+    polling until no change is seen for debounce seconds, so that a burst
+    of saves produces a single rebuild. Return every file changed.
+
+    The snapshot should be taken before the previous build started,
+    so that saves done while it was running are not lost.
+    """
+    files = list(snapshot)
+
+    # 1. Wait for the first change
+    while True:
+        current = take_snapshot(files)
+        changed = changed_files(snapshot, current)
+        if changed:
+            snapshot = current
+            break
+        time.sleep(interval)
+
+    # 2. Collect the rest of the burst
+    while True:
+        time.sleep(debounce)
+        current = take_snapshot(files)
+        more = changed_files(snapshot, current)
+        if not more:
+            return changed
+        changed |= more
+        snapshot = current
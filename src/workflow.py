@@ -1,30 +1,66 @@
-import sys
+import multiprocessing
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Any
 
 from src.config import (
-    CustomPaths,
     AssetsExtList,
+    BuildContext,
     BuildOptions,
+    CustomPaths,
     check_inconsistency,
-    find_main_inconsistency,
-    find_broken_links,
-    find_unused_assets,
-    fix_links_return_errors,
     check_integrity,
+    chose_right_position,
+    collect_referenced_assets,
     combine_and_execute,
     create_build_dir,
     create_new_note,
     create_vault_structure,
+    current_context,
+    find_broken_links,
+    find_main_inconsistency,
+    find_unused_assets,
+    fix_links_return_errors,
     get_all_files_from_bank,
     get_all_files_from_main,
     get_all_files_from_root,
+    get_main_tree_files,
     is_bank,
     is_vault,
+    read_config_file,
+    remove_build_caches,
+    scan_vault_notes,
     update_bank_files,
+    use_context,
 )
+from src.errors import BuildError, ConfigError, DocScriptError, VaultError
+from src.links import DEFAULT_JOBS
 from src.modes import CMode
-from src.pandoc.runner import check_precondition
+from src.pandoc.runner import (
+    SUPPORTED_OUTPUT_EXTENSIONS,
+    SUPPORTED_OUTPUT_EXTENSIONS_TEXT,
+    check_precondition,
+)
+from src.pandoc.toolchain import probe_toolchain
+from src.profiler import (
+    PROFILE_DIR_NAME,
+    enable_profiling,
+    export_spans,
+    get_profiler,
+    merge_spans,
+    phase,
+)
 from src.utils import safe_path
+from src.watch import (
+    DEFAULT_DEBOUNCE,
+    DEFAULT_POLL_INTERVAL,
+    take_snapshot,
+    wait_for_changes,
+)
 
 ###############
 # Description #
@@ -43,12 +79,10 @@ def init_vault(bankFlag: bool = False) -> None:
     """
 
     if is_bank():
-        print("Error: The current folder is already initialized as a Bank.")
-        sys.exit(1)
+        raise VaultError("The current folder is already initialized as a Bank.")
 
     if is_vault():
-        print("Error: The current folder is already initialized as a Vault.")
-        sys.exit(1)
+        raise VaultError("The current folder is already initialized as a Vault.")
 
     try:
         # Verify the DocScript infrastructure before copying necessary files
@@ -67,9 +101,10 @@ def init_vault(bankFlag: bool = False) -> None:
         else:
             print("Enjoy working with your team mates! <3")
 
+    except DocScriptError:
+        raise
     except Exception as e:
-        print(f"Error while building the Vault: {e}")
-        sys.exit(1)
+        raise VaultError(f"Impossible to build the Vault: {e}") from e
 
 
 def start_note(ConfigPath: CustomPaths, noteName: str | Path) -> None:
@@ -81,17 +116,17 @@ def start_note(ConfigPath: CustomPaths, noteName: str | Path) -> None:
     noteName = str(noteName)
 
     if is_bank():
-        print("Error: You can add a note only in a private Vault")
-        sys.exit(1)
+        raise VaultError("You can add a note only in a private Vault")
 
     try:
         check_integrity()
 
         create_new_note(ConfigPath, noteName)
 
+    except DocScriptError:
+        raise
     except Exception as e:
-        print(f"Error while creating the new note: {e}")
-        sys.exit(1)
+        raise VaultError(f"Impossible to create the new note: {e}") from e
 
 
 def conversion_procedure(
@@ -115,15 +150,67 @@ def conversion_procedure(
     modality = mode.name
     if modality is CMode.NONE.name:
         print("Error: Conversion request not applicable")
-        sys.exit(0)
+        return
+
+    with phase("collect notes"):
+        only_used_files, collaborators = collect_conversion_files(mode, src)
+
+    # Create Build dir
+    create_build_dir()
+
+    # Check system requirements
+    with phase("check precondition"):
+        check_precondition()
+
+    # Effective conversion
+    if dst is None:
+        raise BuildError("No output file selected")
+
+    with phase("build", output=dst):
+        combine_and_execute(only_used_files, collaborators, cfgCstmPath, buildOpts, dst)
+    current_context().save_note_indexes()
+
+
+def validate_output(output: str | None) -> None:
+    """
+    Verify that the output file has a supported extension.
+    """
+    outPath = safe_path(str(output))
+    ext = os.path.splitext(outPath)[1].lower()
+    if ext not in SUPPORTED_OUTPUT_EXTENSIONS:
+        raise ConfigError(
+            f"The output file '{output}' must be {SUPPORTED_OUTPUT_EXTENSIONS_TEXT}"
+        )
+
+
+def collect_conversion_files(
+    mode: CMode,
+    src: str | None = None,
+    fileFoundRoot: list[str] | None = None,
+    fileFoundMain: list[str] | None = None,
+) -> tuple[list[str], dict[str, str]]:
+    """
+    Return the ordered list of notes converted by mode (and src)
+    and the active collaborators when working in a bank.
+    The consistency between main.md and the vault is checked here.
+
+    The notes of the vault and of main.md (or custom.md) can be passed
+    when already known, so that a build plan scans the vault only once.
+    """
+
+    modality = mode.name
 
-    file_found_root: list[str] = []
-    file_found_main: list[str] = []
     collaborators: dict[str, str] = {}
     if not is_bank():
         # Find files in vault
-        file_found_root = get_all_files_from_root()
-        file_found_main = get_all_files_from_main(mode)
+        file_found_root = (
+            fileFoundRoot if fileFoundRoot is not None else get_all_files_from_root()
+        )
+        file_found_main = (
+            fileFoundMain
+            if fileFoundMain is not None
+            else get_all_files_from_main(mode)
+        )
 
         # Reduce the number of notes to only those of interest
         filter_file_list_main: list[str] = []
@@ -154,8 +241,7 @@ def conversion_procedure(
             filter_file_list_root = file_found_root
 
         # Check of consistency if not custom
-        check_inconsistency(filter_file_list_main,
-                            filter_file_list_root, bypassFlag)
+        check_inconsistency(filter_file_list_main, filter_file_list_root, bypassFlag)
 
     else:
         # Bank: files live in multiple collaborator vaults.
@@ -167,50 +253,339 @@ def conversion_procedure(
         filter_file_list_root = filter_file_list_main
         bypassFlag = True
 
-    # Create Build dir
+    # Create a list for combined_file.md
+    root_map = {Path(p).name: p for p in filter_file_list_root}
+    only_used_files = [root_map[Path(name).name] for name in filter_file_list_main]
+
+    return only_used_files, collaborators
+
+
+def _build_target(
+    files: list[str],
+    collaborators: dict[str, str],
+    cfgCstmPath: CustomPaths,
+    buildOpts: BuildOptions,
+    dst: list[str],
+    scratch: bool,
+    ctx: BuildContext,
+    profileOrigin: float | None = None,
+) -> tuple[str | None, list[dict[str, Any]]]:
+    """
+    Build the outputs of a single document of a plan in ctx, return None
+    on success or the error message (runs in a worker process).
+    With profileOrigin (--profile in a worker) the spans recorded by the
+    worker are returned too, to be merged in the parent trace.
+    """
+    if profileOrigin is not None:
+        enable_profiling(profileOrigin)
+
+    error = None
+    try:
+        with use_context(ctx), phase("build", output=", ".join(dst)):
+            combine_and_execute(
+                files, collaborators, cfgCstmPath, buildOpts, dst, scratch=scratch
+            )
+    except Exception as e:
+        error = str(e)
+
+    return error, export_spans() if profileOrigin is not None else []
+
+
+def build_plan_procedure(
+    targets: list[tuple[CMode, str | None, str]],
+    cfgCstmPath: CustomPaths,
+    buildOpts: BuildOptions,
+) -> None:
+    """
+    Build every target (mode, src, dst) of a plan from a single invocation.
+
+    The vault is scanned once for the whole plan, then the conversions run
+    concurrently in a pool of spawned processes sized to the CPU count,
+    each one inside its own scratch folder build/.jobs/<dst>/.
+    Targets with the same notes (mode and src) are a single job, the
+    markdown is parsed once for all their formats.
+    In a bank the staging folder is shared, so the targets run one by one.
+    """
+
+    for mode, _, _ in targets:
+        if mode is CMode.NONE:
+            print("Error: Conversion request not applicable")
+            return
+
+    outputs = [Path(dst).name for _, _, dst in targets]
+    duplicates = sorted({name for name in outputs if outputs.count(name) > 1})
+    if duplicates:
+        raise BuildError(
+            f"Output file used by more than one target: " f"{', '.join(duplicates)}"
+        )
+
+    # 1. Scan the vault once and collect the notes of every target
+    with phase("collect notes", targets=len(targets)):
+        file_found_root = None if is_bank() else get_all_files_from_root()
+        file_found_main: dict[CMode, list[str]] = {}
+
+        documents: dict[tuple[CMode, str | None], list[str]] = {}
+        for mode, src, dst in targets:
+            documents.setdefault((mode, src), []).append(dst)
+
+        plans: list[tuple[list[str], dict[str, str], list[str]]] = []
+        for (mode, src), dsts in documents.items():
+            if not is_bank() and mode not in file_found_main:
+                file_found_main[mode] = get_all_files_from_main(mode)
+            files, collaborators = collect_conversion_files(
+                mode, src, file_found_root, file_found_main.get(mode)
+            )
+            plans.append((files, collaborators, dsts))
+
+    current_context().save_note_indexes()
+
+    # 2. Paid only once for the whole plan
     create_build_dir()
+    with phase("check precondition"):
+        check_precondition()
+
+    # 3. Run the conversions
+    failed: list[str] = []
+    ctx = current_context()
+    if is_bank() or len(plans) == 1:
+        for files, collaborators, dsts in plans:
+            error, _ = _build_target(
+                files, collaborators, cfgCstmPath, buildOpts, dsts, False, ctx
+            )
+            if error is not None:
+                failed.extend(dsts)
+                print(f"Error: Build of '{', '.join(dsts)}' failed: {error}")
+    else:
+        workers = min(os.cpu_count() or 1, len(plans))
+        print(f"Building {len(targets)} targets with {workers} processes...")
+        profiler = get_profiler()
+        origin = profiler.origin if profiler is not None else None
+        # spawned, not forked: the caller can be multi-threaded (the API,
+        # the daemon) and its sys.stdout can be a client socket
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            futures = {
+                pool.submit(
+                    _build_target,
+                    files,
+                    collaborators,
+                    cfgCstmPath,
+                    buildOpts,
+                    dsts,
+                    True,
+                    ctx,
+                    origin,
+                ): dsts
+                for files, collaborators, dsts in plans
+            }
+            for future in as_completed(futures):
+                dsts = futures[future]
+                try:
+                    error, spans = future.result()
+                    merge_spans(spans)
+                except Exception as e:
+                    error = str(e)
+                if error is not None:
+                    failed.extend(dsts)
+                    print(f"Error: Build of '{', '.join(dsts)}' failed: {error}")
+                else:
+                    print(f"Target '{', '.join(dsts)}' done.")
+
+    if failed:
+        raise BuildError(f"{len(failed)} of {len(targets)} targets failed.")
+
+
+def _watch_inputs(
+    mode: CMode, cfgCstmPath: CustomPaths, src: str | None
+) -> tuple[list[str], dict[str, str], set[str]]:
+    """
+    Return the notes and collaborators of a conversion plus every file
+    that can change its output: notes and their folders, main/sub-main
+    tree, referenced assets and config files.
+    If the notes cannot be collected (e.g. a note missing from main.md)
+    only the tree and the config files are watched.
+    """
+    try:
+        files, collaborators = collect_conversion_files(mode, src)
+    except DocScriptError:
+        files, collaborators = [], {}
+
+    tree = get_main_tree_files(mode)
+
+    inputs = set(files)
+    inputs.update(tree)
+    # Folders change when a note is added or removed (e.g. -a consistency)
+    inputs.update(str(Path(file).parent) for file in [*files, *tree])
+    inputs.update(collect_referenced_assets(files))
+    inputs.update(
+        str(path)
+        for path in (
+            cfgCstmPath.custom_teml_path,
+            cfgCstmPath.custom_luaf_path,
+            cfgCstmPath.custom_yaml_path,
+            cfgCstmPath.custom_pandoc_opt_path,
+        )
+    )
 
-    # Check system requirements
+    return files, collaborators, inputs
+
+
+def watch_procedure(
+    targets: list[tuple[CMode, str | None, str]],
+    cfgCstmPath: CustomPaths,
+    buildOpts: BuildOptions,
+    interval: float = DEFAULT_POLL_INTERVAL,
+    debounce: float = DEFAULT_DEBOUNCE,
+) -> None:
+    """
+    Build every target (mode, src, dst), then keep running and rebuild
+    only the targets whose inputs changed, until Ctrl+C.
+
+    Inputs are polled by stat; a burst of saves is collected for
+    debounce seconds before rebuilding. Failed builds are reported
+    and retried at the next change.
+    """
+
+    for mode, _, _ in targets:
+        if mode is CMode.NONE:
+            print("Error: Conversion request not applicable")
+            return
+
+    # Paid only once for the whole session
+    create_build_dir()
     check_precondition()
 
-    # Create a list for combined_file.md
-    root_map = {Path(p).name: p for p in filter_file_list_root}
-    only_used_files = [
-        root_map[Path(name).name]
-        for name in filter_file_list_main
-    ]
+    inputs: dict[int, set[str]] = {}
+    pending = set(range(len(targets)))
 
-    # Effective conversion
-    if dst is not None:
-        combine_and_execute(only_used_files, collaborators,
-                            cfgCstmPath, buildOpts, dst)
-    else:
-        print("Error: No output file selected")
-        sys.exit(1)
+    try:
+        while True:
+            # Collect the inputs and stamp them before building, so that
+            # saves done during the build trigger the next one
+            plans: dict[int, tuple[list[str], dict[str, str]]] = {}
+            current_context().drop_snapshots()
+            for i in sorted(pending):
+                mode, src, _ = targets[i]
+                files, collaborators, inputs[i] = _watch_inputs(mode, cfgCstmPath, src)
+                plans[i] = (files, collaborators)
+
+            snapshot = take_snapshot(set().union(*inputs.values()))
+
+            for i in sorted(pending):
+                _, _, dst = targets[i]
+                files, collaborators = plans[i]
+                if not files:
+                    print(
+                        f"Error: No notes to convert for '{dst}', fix it "
+                        "and save again."
+                    )
+                    continue
+                try:
+                    combine_and_execute(
+                        files, collaborators, cfgCstmPath, buildOpts, dst
+                    )
+                except Exception as e:
+                    print(f"Error: Build of '{dst}' failed: {e}")
+                current_context().save_note_indexes()
+
+            print(f"\nWatching {len(snapshot)} files, press Ctrl+C to stop...")
+            changed = wait_for_changes(snapshot, interval, debounce)
+
+            for file in sorted(changed):
+                print(f"Changed: {file}")
+
+            pending = {i for i, files in inputs.items() if files & changed}
+
+    except KeyboardInterrupt:
+        print("\nWatch stopped.")
+
+
+def clean_build() -> None:
+    """
+    Remove the build caches, so that the next conversion starts cold.
+    """
+
+    if not is_vault() and not is_bank():
+        raise VaultError("No Vault or Bank found, run -i or -ib first.")
+
+    remove_build_caches()
+
+
+def serve_daemon(handler: Callable[[list[str]], None]) -> None:
+    """
+    Keep DocScript resident (--daemon) and run with handler(argv) the builds,
+    lints and fix-links sent by the other invocations.
+    The .conf, the toolchain and every note of the vault are read before the
+    first request, so that no request pays the cold start.
+    """
+    from src.daemon import serve
+
+    if not is_vault() and not is_bank():
+        raise VaultError("No Vault or Bank found, run -i or -ib first.")
+
+    read_config_file()
+    probe_toolchain()
+    if not is_bank():
+        scan_vault_notes(get_all_files_from_root())
+        current_context().save_note_indexes()
+
+    serve(handler)
 
 
-def update_bank() -> None:
+def report_profile() -> None:
+    """
+    Print the time spent in every phase of the run (--profile) and write
+    the Chrome trace in build/.profile/, to be opened with chrome://tracing
+    or https://ui.perfetto.dev.
+    """
+    profiler = get_profiler()
+    if profiler is None or not profiler.spans:
+        return
+
+    trace_name = time.strftime("trace-%Y%m%d-%H%M%S.json")
+    trace_path = chose_right_position(is_bank(), PROFILE_DIR_NAME) / trace_name
+
+    print("\nProfile:")
+    print(profiler.summary())
+    try:
+        profiler.write_trace(trace_path)
+        print(f"Chrome trace written to {trace_path}")
+    except OSError as exc:
+        print(f"Warning: impossible to write the trace: {exc}")
+
+
+def update_bank(jobs: int = DEFAULT_JOBS) -> None:
     """
     Update the collaborative bank by validating collaborator links to their
     `main.md` files and composing a combined `main.md` in the bank root.
+    The collaborators are read by a pool of jobs threads.
     """
 
-    update_bank_files()
+    update_bank_files(jobs)
+
+
+# Findings of the linter (see lint_vault)
+@dataclass
+class LintReport:
+    missing_from_main: list[str] = field(default_factory=list)
+    broken_links: dict[str, list[str]] = field(default_factory=dict)
+    unused_assets: list[Path] = field(default_factory=list)
+
+    @property
+    def clean(self) -> bool:
+        return not (self.missing_from_main or self.broken_links or self.unused_assets)
 
 
-def run_linter(sstCstmXt: AssetsExtList) -> None:
+def lint_vault(sstCstmXt: AssetsExtList, jobs: int = DEFAULT_JOBS) -> LintReport:
     """
-    Verify that the links to all notes in the main file are correctly written
-    by checking the correct paths.
-    Verify that all paths within each note correspond to real assets.
-    Report any inconsistencies to be fixed using the appropriate command.
+    Collect the notes missing from main.md, the broken links of every note
+    and the unreferenced assets (with an accepted extension) of the vault.
+    Every note is read only once, by a pool of jobs threads.
     """
 
     if is_bank():
-        print("Error: Use this cmd only in a personal Vault.")
-        sys.exit(1)
-
-    print("Start parsing all the repo, please wait...")
+        raise VaultError("Use this cmd only in a personal Vault.")
 
     # Check if all the files are in the main
     mode = CMode.ALL
@@ -219,17 +594,49 @@ def run_linter(sstCstmXt: AssetsExtList) -> None:
     file_found_main = get_all_files_from_main(mode)
     missed_links = find_main_inconsistency(file_found_main, file_found_root)
 
-    if missed_links:
-        print("\nWarning: The following .md files are NOT included in main:\n")
-        for f in sorted(missed_links):
-            print(f"- {f}")
+    # Read every single note once, the links are shared by all the checks
+    note_links = scan_vault_notes(file_found_main, jobs)
 
     # Parse every single file searching broken links
-    broken_links = find_broken_links(file_found_main)
+    broken_links = find_broken_links(file_found_main, jobs, note_links)
+
+    # Check of unused assets
+    unreferred_assets = find_unused_assets(file_found_main, noteLinks=note_links)
+    current_context().save_note_indexes()
+
+    if sstCstmXt.assets_accepted_ext is not None:
+        unreferred_assets = [
+            asset
+            for asset in unreferred_assets
+            if asset.suffix.lower() in sstCstmXt.assets_accepted_ext
+        ]
+
+    return LintReport(sorted(missed_links), broken_links, unreferred_assets)
+
+
+def run_linter(sstCstmXt: AssetsExtList, jobs: int = DEFAULT_JOBS) -> None:
+    """
+    Verify that the links to all notes in the main file are correctly written
+    by checking the correct paths.
+    Verify that all paths within each note correspond to real assets.
+    Report any inconsistencies to be fixed using the appropriate command.
+    """
+
+    if is_bank():
+        raise VaultError("Use this cmd only in a personal Vault.")
+
+    print("Start parsing all the repo, please wait...")
+
+    report = lint_vault(sstCstmXt, jobs)
+
+    if report.missing_from_main:
+        print("\nWarning: The following .md files are NOT included in main:\n")
+        for f in report.missing_from_main:
+            print(f"- {f}")
 
-    if broken_links:
+    if report.broken_links:
         print("\nWarning: The following .md files contains broken links:\n")
-        for key, values in broken_links.items():
+        for key, values in report.broken_links.items():
             print(f"{key}:")
             for value in values:
                 print(f"  - {value}")
@@ -241,20 +648,10 @@ def run_linter(sstCstmXt: AssetsExtList) -> None:
     else:
         print("No links appear to be broken in this Vault, enjoy!")
 
-    # Check of unused assets
-    unreferred_assets = find_unused_assets(file_found_main)
-
-    if sstCstmXt.assets_accepted_ext is not None:
-        filtered_unref_assets = [
-            asset
-            for asset in unreferred_assets
-            if asset.suffix.lower() in sstCstmXt.assets_accepted_ext
-        ]
-
-    if filtered_unref_assets:
+    if report.unused_assets:
         print("\nWarning: There is some unreferred assets files:\n")
 
-        for element in filtered_unref_assets:
+        for element in report.unused_assets:
             print(f"  - {element}")
         print("\n")
 
@@ -264,30 +661,32 @@ def run_linter(sstCstmXt: AssetsExtList) -> None:
         )
 
 
-def fix_links() -> None:
+def fix_links(jobs: int = DEFAULT_JOBS) -> dict[str, list[str]]:
     """
     Verify that the links to all notes in the main file are written correctly,
     checking the correct paths.
     Verify that all paths within each note correspond to real assets.
     Looks for the corresponding assets and corrects them if they exist;
     otherwise, it corrects them but reports that the file they refer to does not exist.
+    Notes are analysed by a pool of jobs threads.
+    Return the links left broken, by note.
     """
 
     if is_bank():
-        print("Error: Use this cmd only in a personal Vault.")
-        sys.exit(1)
+        raise VaultError("Use this cmd only in a personal Vault.")
 
     print("Start parsing all the repo, please wait...")
 
     mode = CMode.ALL
     file_found_main = get_all_files_from_main(mode)
 
-    broken_links = find_broken_links(file_found_main)
+    broken_links = find_broken_links(file_found_main, jobs)
 
     # Fixes file locations for assets.
     # Returns all links that have no reference to real objects.
 
     not_found_resources = fix_links_return_errors(broken_links)
+    current_context().save_note_indexes()
 
     if not_found_resources:
 
@@ -299,3 +698,5 @@ def fix_links() -> None:
             print("\n")
     else:
         print("No links appear to be broken in this Vault, enjoy!")
+
+    return not_found_resources
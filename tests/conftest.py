@@ -0,0 +1,73 @@
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+import src.config as config
+from benchmarks.synthetic_vault import VaultSpec, generate_vault
+from src.config import BuildContext, use_context
+
+###############
+# Description #
+###############
+"""
+Fixtures shared by the tests: a small synthetic vault (see
+benchmarks/synthetic_vault.py) written in a temporary folder, the
+BuildContext running on it and a stub of the pandoc conversion.
+"""
+
+###########
+# Defines #
+###########
+# 2 macros, 1 level of sub-mains, every note links 2 images of its own
+VAULT_SPEC = VaultSpec(notes=8, macros=2, depth=1, assets_per_note=2, seed=1)
+
+
+@pytest.fixture
+def vault(tmp_path: Path) -> Path:
+    return generate_vault(tmp_path / "vault", VAULT_SPEC)
+
+
+@pytest.fixture
+def notes(vault: Path) -> list[str]:
+    """
+    Every note of the vault (sub-mains included), sorted.
+    """
+    return sorted(str(p) for p in vault.rglob("*.md") if p.name != "main.md")
+
+
+@pytest.fixture
+def ctx(vault: Path, tmp_path: Path) -> Iterator[BuildContext]:
+    """
+    Run the test on the vault instead of the folders next to DocScript.
+    """
+    context = BuildContext(
+        vault_dir=vault,
+        bank_dir=tmp_path / "bank",
+        staging_dir=tmp_path / "staging",
+        links_base_dir=tmp_path,
+        jobs=2,
+    )
+    with use_context(context):
+        yield context
+
+
+@pytest.fixture
+def conversions(monkeypatch: pytest.MonkeyPatch) -> list[list[str]]:
+    """
+    Replace pandoc with a conversion that writes the merged document into
+    every output, record the outputs of every conversion.
+    """
+    calls = []
+
+    def fake_conversion(_tmpl, _luaf, _pndo, src, dsts, *_args, **_kwargs):
+        if isinstance(src, Path):
+            document = src.read_text(encoding="utf-8")
+        else:
+            document = "".join(src)
+        for dst in dsts:
+            Path(dst).write_text(document, encoding="utf-8")
+        calls.append([Path(dst).name for dst in dsts])
+
+    monkeypatch.setattr(config, "_execute_conversion", fake_conversion)
+    return calls
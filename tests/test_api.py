@@ -0,0 +1,95 @@
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+import src.workflow as workflow
+from benchmarks.synthetic_vault import generate_vault
+from src import api
+from src.config import BuildContext, current_context
+from tests.conftest import VAULT_SPEC
+
+
+@pytest.fixture(autouse=True)
+def no_toolchain(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(workflow, "check_precondition", lambda: None)
+
+
+def _context(vault: Path) -> BuildContext:
+    """
+    A context of its own, not the current one of the test.
+    """
+    return BuildContext(
+        vault_dir=vault,
+        bank_dir=vault.parent / "bank",
+        staging_dir=vault.parent / "staging",
+        links_base_dir=vault.parent,
+        jobs=2,
+    )
+
+
+def test_build_runs_on_the_context(vault: Path, conversions: list[list[str]]):
+    ctx = _context(vault)
+    cwd = os.getcwd()
+    api.build(ctx, api.CMode.GROUP, "m0.docx", src="m0")
+    api.build(ctx, api.CMode.GROUP, "m0.docx", src="m0")
+
+    output = (ctx.build_dir / "m0.docx").read_text(encoding="utf-8")
+    assert "# Note 0" in output and "# Note 4" not in output
+    assert conversions == [["m0.docx"]]
+    assert os.getcwd() == cwd
+    # the context is set only during the call
+    assert current_context() is not ctx
+
+
+def test_errors_are_raised_not_exits(vault: Path):
+    ctx = _context(vault)
+
+    with pytest.raises(api.BuildError):
+        api.build(ctx, api.CMode.NONE, "main.pdf")
+    with pytest.raises(api.ConfigError, match="main.exe"):
+        api.build(ctx, api.CMode.ALL, "main.exe")
+    with pytest.raises(api.BuildError):
+        api.build_plan(ctx, [])
+    assert issubclass(api.ConfigError, api.DocScriptError)
+
+
+def test_lint_and_fix_links(vault: Path):
+    ctx = _context(vault)
+    report = api.lint(ctx)
+
+    assert not report.clean
+    assert report.unused_assets == [vault / "assets" / "m0" / "imgs" / "unused-0.png"]
+    assert report.broken_links and not report.missing_from_main
+
+    assert api.fix_links(ctx) == {}
+    # every call sees the vault as it is when it starts
+    assert api.lint(ctx).broken_links == {}
+
+
+def test_calls_from_threads_on_different_vaults(
+    tmp_path: Path, conversions: list[list[str]]
+):
+    contexts = [
+        _context(generate_vault(tmp_path / name / "vault", VAULT_SPEC))
+        for name in ("a", "b")
+    ]
+    errors: list[BaseException] = []
+
+    def run(ctx: BuildContext) -> None:
+        try:
+            api.build(ctx, api.CMode.ALL, "all.docx")
+        except BaseException as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=run, args=(ctx,)) for ctx in contexts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert conversions == [["all.docx"], ["all.docx"]]
+    for ctx in contexts:
+        assert (ctx.build_dir / "all.docx").is_file()
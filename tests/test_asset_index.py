@@ -0,0 +1,69 @@
+from pathlib import Path
+
+import pytest
+
+from benchmarks.synthetic_vault import ASSET_BYTES
+from src.asset_index import AssetIndex, asset_key
+from src.vault_snapshot import VaultSnapshot
+
+
+def test_asset_key():
+    assert asset_key("../../assets/arg1/imgs/a.png") == "arg1/imgs/a.png"
+    assert asset_key("./imgs/../a.png") == "imgs/a.png"
+    assert asset_key("imgs\\a.png") == "imgs/a.png"
+
+
+def test_index_every_file(vault: Path):
+    assets = vault / "assets"
+    index = AssetIndex(assets)
+
+    on_disk = sorted(
+        p.relative_to(assets).as_posix() for p in assets.rglob("*") if p.is_file()
+    )
+    assert sorted(index) == on_disk
+    assert len(index) == len(on_disk)
+    assert "docfiles/logo.png" in index
+    assert index.get("m0/imgs/n0-0.png") == assets / "m0" / "imgs" / "n0-0.png"
+
+
+def test_skip_dirs(vault: Path):
+    index = AssetIndex(vault / "assets", skipDirs=("docfiles",))
+
+    assert "docfiles/logo.png" not in index
+    assert "m0/imgs/n0-0.png" in index
+
+
+def test_resolve(vault: Path):
+    assets = vault / "assets"
+    index = AssetIndex(assets)
+    expected = assets / "m0" / "imgs" / "n0-0.png"
+
+    # exact path, unique suffix (a moved note), unique file name
+    assert index.resolve("../assets/m0/imgs/n0-0.png") == expected
+    assert index.resolve("imgs/n0-0.png") == expected
+    assert index.resolve("wrong/n0-0.png") == expected
+
+    with pytest.raises(FileNotFoundError):
+        index.resolve("imgs/nothing.png")
+    with pytest.raises(FileNotFoundError):
+        index.resolve("../..")
+
+
+def test_resolve_ambiguous(vault: Path):
+    assets = vault / "assets"
+    (assets / "m1" / "imgs" / "n0-0.png").write_bytes(ASSET_BYTES)
+    index = AssetIndex(assets)
+
+    assert len(index.find_by_name("n0-0.png")) == 2
+    with pytest.raises(ValueError):
+        index.resolve("imgs/n0-0.png")
+    # still unique with more path components
+    assert index.resolve("m1/imgs/n0-0.png") == assets / "m1" / "imgs" / "n0-0.png"
+
+
+def test_from_snapshot_matches_the_disk(vault: Path):
+    assets = vault / "assets"
+    snapshot = VaultSnapshot(vault)
+    index = AssetIndex.from_files(assets, snapshot.iter_files(assets))
+
+    assert list(index.items()) == list(AssetIndex(assets).items())
@@ -0,0 +1,77 @@
+import hashlib
+import os
+from pathlib import Path
+
+from src.build_cache import (
+    MANIFEST_DIR_NAME,
+    MISSING_DIGEST,
+    compute_manifest,
+    file_digest,
+    invalidate_manifest,
+    is_up_to_date,
+    load_manifest,
+    store_manifest,
+)
+
+
+def _manifest(vault: Path, notes: list[str]) -> dict:
+    return compute_manifest(
+        notes,
+        [str(vault / "assets" / "docfiles" / "logo.png")],
+        {"template": str(vault / "template.tex")},
+        {"title": "Main"},
+    )
+
+
+def test_file_digest(vault: Path):
+    note = vault / "main.md"
+
+    assert file_digest(note) == hashlib.sha256(note.read_bytes()).hexdigest()
+    assert file_digest(vault / "missing.md") == MISSING_DIGEST
+    assert file_digest(vault / "m0") == MISSING_DIGEST
+
+
+def test_manifest_follows_the_inputs(vault: Path, notes: list[str]):
+    manifest = _manifest(vault, notes)
+
+    assert manifest == _manifest(vault, notes)
+    assert manifest["config"]["template"][1] == MISSING_DIGEST
+    # the order of the notes is part of the key
+    assert manifest != _manifest(vault, notes[::-1])
+
+    with open(notes[0], "a", encoding="utf-8") as f:
+        f.write("changed\n")
+    assert manifest != _manifest(vault, notes)
+
+
+def test_up_to_date(vault: Path, notes: list[str], tmp_path: Path):
+    build_dir = tmp_path / "build"
+    output = build_dir / "main.pdf"
+    manifest = _manifest(vault, notes)
+
+    # no output, then no manifest
+    assert not is_up_to_date(build_dir, output, manifest)
+    build_dir.mkdir()
+    output.write_bytes(b"%PDF")
+    assert not is_up_to_date(build_dir, output, manifest)
+
+    store_manifest(build_dir, output, manifest)
+    assert load_manifest(build_dir, output) == manifest
+    assert is_up_to_date(build_dir, output, manifest)
+    assert not is_up_to_date(build_dir, output, _manifest(vault, notes[1:]))
+    # one manifest per output, no temporary file left
+    assert os.listdir(build_dir / MANIFEST_DIR_NAME) == ["main.pdf.json"]
+
+    invalidate_manifest(build_dir, output)
+    invalidate_manifest(build_dir, output)
+    assert not is_up_to_date(build_dir, output, manifest)
+
+
+def test_unreadable_manifest_is_empty(tmp_path: Path):
+    manifest_dir = tmp_path / MANIFEST_DIR_NAME
+    manifest_dir.mkdir()
+    (manifest_dir / "a.pdf.json").write_text("{not json", encoding="utf-8")
+    (manifest_dir / "b.pdf.json").write_text('{"version": 0}', encoding="utf-8")
+
+    assert load_manifest(tmp_path, "a.pdf") == {}
+    assert load_manifest(tmp_path, "b.pdf") == {}
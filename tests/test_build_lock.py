@@ -0,0 +1,112 @@
+import subprocess
+import sys
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from src.build_lock import LOCKS_DIR_NAME, exclusive_lock, lock_outputs, new_job_id
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Holds the lock until a line is written on its stdin (or until killed)
+HOLDER_SCRIPT = """\
+import sys
+
+sys.path.insert(0, {root!r})
+from src.build_lock import exclusive_lock
+
+with exclusive_lock({lock!r}, "the holder"):
+    print("locked", flush=True)
+    sys.stdin.readline()
+"""
+
+
+@pytest.fixture
+def lock_path(tmp_path: Path) -> Path:
+    return tmp_path / "build" / LOCKS_DIR_NAME / "main.lock"
+
+
+@pytest.fixture
+def holder(lock_path: Path) -> Iterator[subprocess.Popen[str]]:
+    """
+    Another process holding the lock of lock_path.
+    """
+    script = HOLDER_SCRIPT.format(root=str(ROOT), lock=str(lock_path))
+    proc = subprocess.Popen(
+        [sys.executable, "-c", script],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert proc.stdout is not None
+    assert proc.stdout.readline() == "locked\n"
+    yield proc
+    proc.kill()
+    proc.communicate()
+
+
+def _lock_in_thread(lockPath: Path) -> tuple[threading.Thread, threading.Event]:
+    """
+    Take the lock in a thread, the event is set once it holds it.
+    """
+    locked = threading.Event()
+
+    def take() -> None:
+        with exclusive_lock(lockPath, "the holder"):
+            locked.set()
+
+    thread = threading.Thread(target=take)
+    thread.start()
+    return thread, locked
+
+
+def test_waits_for_another_process(
+    lock_path: Path,
+    holder: subprocess.Popen[str],
+    capsys: pytest.CaptureFixture[str],
+):
+    thread, locked = _lock_in_thread(lock_path)
+
+    assert not locked.wait(0.5)
+    assert holder.stdin is not None
+    holder.stdin.write("release\n")
+    holder.stdin.flush()
+    assert locked.wait(10)
+    thread.join()
+    assert "Waiting for the holder to finish..." in capsys.readouterr().out
+
+
+def test_released_when_the_holder_is_killed(
+    lock_path: Path, holder: subprocess.Popen[str]
+):
+    thread, locked = _lock_in_thread(lock_path)
+
+    assert not locked.wait(0.5)
+    holder.kill()
+    assert locked.wait(10)
+    thread.join()
+
+
+def test_threads_of_a_process_wait_for_each_other(lock_path: Path):
+    with exclusive_lock(lock_path, "the holder"):
+        thread, locked = _lock_in_thread(lock_path)
+        assert not locked.wait(0.3)
+    assert locked.wait(10)
+    thread.join()
+
+
+def test_outputs_with_the_same_stem_share_a_lock(tmp_path: Path):
+    with lock_outputs(tmp_path, ["b.docx", "a.pdf", "a.tex"]):
+        locks = sorted(p.name for p in (tmp_path / LOCKS_DIR_NAME).iterdir())
+        assert locks == ["a.lock", "b.lock"]
+
+        # another output can be built meanwhile
+        thread, locked = _lock_in_thread(tmp_path / LOCKS_DIR_NAME / "c.lock")
+        assert locked.wait(10)
+        thread.join()
+
+
+def test_job_ids_are_unique():
+    assert len({new_job_id() for _ in range(100)}) == 100
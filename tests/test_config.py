@@ -0,0 +1,88 @@
+from pathlib import Path
+
+import src.config as config
+from src.build_cache import MANIFEST_DIR_NAME
+from src.config import BuildContext
+from src.modes import CMode
+
+OUTPUT = "main.pdf"
+
+
+def _build(ctx: BuildContext, dst: str | list[str] = OUTPUT) -> None:
+    """
+    Convert the whole vault, as a new run of the CLI would.
+    """
+    ctx.new_run()
+    files = config.get_all_files_from_main(CMode.ALL)
+    config.create_build_dir()
+    config.combine_and_execute(
+        files, {}, config.CustomPaths(), config.BuildOptions(), dst
+    )
+
+
+def test_first_build_converts(ctx: BuildContext, conversions: list[list[str]]):
+    _build(ctx)
+
+    output = ctx.build_dir / OUTPUT
+    assert conversions == [[OUTPUT]]
+    assert "# Note 0" in output.read_text(encoding="utf-8")
+    assert (ctx.build_dir / MANIFEST_DIR_NAME / f"{OUTPUT}.json").is_file()
+
+
+def test_unchanged_build_is_skipped(ctx: BuildContext, conversions: list[list[str]]):
+    _build(ctx)
+    _build(ctx)
+
+    assert conversions == [[OUTPUT]]
+
+
+def test_changed_inputs_convert_again(
+    ctx: BuildContext, vault: Path, conversions: list[list[str]]
+):
+    _build(ctx)
+
+    with open(vault / "m0" / "main.m0.n0.md", "a", encoding="utf-8") as f:
+        f.write("Edited.\n")
+    _build(ctx)
+    assert "Edited." in (ctx.build_dir / OUTPUT).read_text(encoding="utf-8")
+
+    # a referenced asset
+    (vault / "assets" / "m0" / "imgs" / "n0-0.png").write_bytes(b"new image")
+    _build(ctx)
+
+    # an asset nobody links
+    (vault / "assets" / "m0" / "imgs" / "unused-0.png").write_bytes(b"new image")
+    _build(ctx)
+
+    assert len(conversions) == 3
+
+
+def test_removed_output_converts_again(ctx: BuildContext, conversions: list[list[str]]):
+    _build(ctx)
+    (ctx.build_dir / OUTPUT).unlink()
+    _build(ctx)
+
+    assert len(conversions) == 2
+    assert (ctx.build_dir / OUTPUT).is_file()
+
+
+def test_only_stale_outputs_are_converted(
+    ctx: BuildContext, conversions: list[list[str]]
+):
+    _build(ctx)
+    _build(ctx, [OUTPUT, "main.tex"])
+
+    assert conversions == [[OUTPUT], ["main.tex"]]
+
+
+def test_fix_links_after_an_unclosed_comment(ctx: BuildContext, vault: Path):
+    note = vault / "m0" / "main.m0.n0.md"
+    with open(note, "a", encoding="utf-8") as f:
+        f.write("<!-- never closed\n![moved](imgs/n1-0.png)\n")
+    files = config.get_all_files_from_main(CMode.ALL)
+
+    broken = config.find_broken_links(files, ctx.jobs)
+    assert "imgs/n1-0.png" in broken[str(note)]
+
+    assert str(note) not in config.fix_links_return_errors(broken)
+    assert "](../assets/m0/imgs/n1-0.png)" in note.read_text(encoding="utf-8")
@@ -0,0 +1,126 @@
+import json
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from src import daemon
+from src.version import DOCSCRIPT_VERSION as DCV
+
+pytestmark = pytest.mark.skipif(
+    not daemon.daemon_available(), reason="needs Unix domain sockets"
+)
+
+# A daemon whose commands print their argv, "fail" exits with status 2
+DAEMON_SCRIPT = """\
+import sys
+
+sys.path.insert(0, {root!r})
+from src.daemon import serve
+
+
+def handler(argv):
+    print("ran", *argv)
+    if argv == ["fail"]:
+        sys.exit(2)
+
+
+serve(handler)
+"""
+
+
+@pytest.fixture
+def runtime_dir(monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """
+    A short private XDG_RUNTIME_DIR: socket paths are limited to ~100 bytes.
+    """
+    path = Path(tempfile.mkdtemp(prefix="ds-"))
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(path))
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def _handler(argv: list[str]) -> None:
+    print("ran", *argv)
+    if argv == ["fail"]:
+        sys.exit(2)
+    if argv == ["crash"]:
+        raise RuntimeError("boom")
+
+
+def _serve_one(request: dict[str, object]) -> list[dict[str, object]]:
+    """
+    Serve request over a socket pair, return the messages of the answer.
+    """
+    client, server = socket.socketpair()
+    with client, server:
+        client.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        daemon._serve_request(server, _handler)
+        server.close()
+        return [json.loads(line) for line in client.makefile("r", encoding="utf-8")]
+
+
+@pytest.mark.parametrize(
+    ("argv", "status"), [(["a", "b"], 0), (["fail"], 2), (["crash"], 1)]
+)
+def test_request_output_and_exit_status(tmp_path: Path, argv: list[str], status: int):
+    messages = _serve_one({"version": DCV, "argv": argv, "cwd": str(tmp_path)})
+
+    output = "".join(str(m["out"]) for m in messages if "out" in m)
+    assert output.startswith(f"ran {' '.join(argv)}\n")
+    assert messages[-1] == {"exit": status}
+    if argv == ["crash"]:
+        assert "RuntimeError: boom" in output
+
+
+def test_other_version_is_refused():
+    messages = _serve_one({"version": "0.0.0", "argv": ["a"], "cwd": "."})
+
+    assert len(messages) == 1 and "refused" in messages[0]
+
+
+@pytest.mark.usefixtures("runtime_dir")
+def test_forward_without_daemon():
+    assert not daemon.socket_path().exists()
+    assert daemon.forward(["a"]) is None
+
+
+@pytest.mark.usefixtures("runtime_dir")
+def test_daemon_serves_forwarded_commands(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+):
+    script = tmp_path / "daemon.py"
+    root = str(Path(__file__).resolve().parent.parent)
+    script.write_text(DAEMON_SCRIPT.format(root=root), encoding="utf-8")
+    proc = subprocess.Popen(
+        [sys.executable, str(script)], stdout=subprocess.PIPE, text=True
+    )
+    try:
+        path = daemon.socket_path()
+        deadline = time.monotonic() + 10
+        while not path.exists() and proc.poll() is None:
+            assert time.monotonic() < deadline, "the daemon did not start"
+            time.sleep(0.05)
+
+        assert daemon.forward(["a", "b"]) == 0
+        assert daemon.forward(["fail"]) == 2
+        assert capsys.readouterr().out == "ran a b\nran fail\n"
+
+        # a second daemon on the same copy refuses to start
+        with pytest.raises(SystemExit):
+            daemon.serve(_handler)
+        assert "already running" in capsys.readouterr().out
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        out, _ = proc.communicate(timeout=10)
+
+    assert proc.returncode == 0
+    assert "DocScript daemon stopped." in out
+    assert not path.exists()
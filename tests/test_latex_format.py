@@ -0,0 +1,72 @@
+import os
+from pathlib import Path
+
+import pytest
+
+import src.pandoc.latex_format as latex_format
+from src.pandoc.latex_format import DUMP_MARKER, FAILED_SUFFIX, static_preamble
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_TEMPLATE = ROOT / "config" / "default-template.tex"
+
+
+def test_default_template_has_a_static_preamble():
+    preamble = static_preamble(DEFAULT_TEMPLATE)
+
+    assert preamble is not None
+    assert r"\documentclass" in preamble
+    # fonts cannot be dumped: they are loaded after the marker
+    assert r"\usepackage{fontspec}" not in preamble
+    assert r"\setmainfont" not in preamble
+
+
+def test_default_template_keeps_the_package_order():
+    template = DEFAULT_TEMPLATE.read_text(encoding="utf-8")
+    packages = [
+        r"\usepackage{hyperref}",
+        r"\usepackage{bookmark}",
+        DUMP_MARKER,
+        r"\usepackage{fontspec}",
+        r"\usepackage{tikz}",
+        r"\usepackage{fancyhdr}",
+    ]
+
+    positions = [template.index(package) for package in packages]
+    assert positions == sorted(positions)
+
+
+def test_static_preamble(tmp_path: Path):
+    tmpl = tmp_path / "t.tex"
+
+    tmpl.write_text(f"\\usepackage{{a}}\n{DUMP_MARKER}\n$body$\n", encoding="utf-8")
+    assert static_preamble(tmpl) == "\\usepackage{a}\n"
+
+    # no marker: compiled as before
+    tmpl.write_text("\\usepackage{a}\n$body$\n", encoding="utf-8")
+    assert static_preamble(tmpl) is None
+
+    # pandoc variables before the marker cannot be precompiled
+    tmpl.write_text(f"\\usepackage{{a}}\n$if(x)$\n{DUMP_MARKER}\n", encoding="utf-8")
+    assert static_preamble(tmpl) is None
+
+    assert static_preamble(tmp_path / "missing.tex") is None
+
+
+def test_failed_formats_are_retried(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(latex_format, "_formats_dir", lambda: tmp_path)
+    fmt_path = tmp_path / "key.fmt"
+    fmt_path.write_bytes(b"fmt")
+    marker = fmt_path.with_suffix(FAILED_SUFFIX)
+
+    latex_format.reject_format(fmt_path)
+    assert not fmt_path.exists()
+    assert marker.read_text(encoding="utf-8").strip()
+    assert latex_format._failed_recently(marker)
+
+    # after FAILED_RETRY_AFTER the format is tried again
+    os.utime(marker, (0, 0))
+    assert not latex_format._failed_recently(marker)
+
+    # --clean forgets every failure
+    assert latex_format.forget_format_failures() == [marker]
+    assert not marker.exists()
@@ -0,0 +1,87 @@
+from pathlib import Path
+
+from src.links import (
+    extract_links_outside_comments,
+    extract_note_links,
+    is_external_link,
+    is_sub_main,
+    iter_link_spans,
+    link_path_part,
+    rewrite_links,
+    scan_notes,
+)
+
+
+def test_spans_point_at_the_targets():
+    content = "![a]( imgs/a.png ) and [b](b.md)"
+    spans = list(iter_link_spans(content))
+
+    assert [s.target for s in spans] == ["imgs/a.png", "b.md"]
+    for span in spans:
+        assert content[span.start : span.end] == span.target
+        assert not span.in_comment
+
+
+def test_links_in_comments_are_flagged():
+    content = "[a](a.md) <!-- [b](b.md) --> [c](c.md) <!-- [d](d.md) -->"
+    spans = list(iter_link_spans(content))
+
+    assert [(s.target, s.in_comment) for s in spans] == [
+        ("a.md", False),
+        ("b.md", True),
+        ("c.md", False),
+        ("d.md", True),
+    ]
+    assert extract_links_outside_comments(content) == ["a.md", "c.md"]
+
+
+def test_rewrite_links_leaves_comments_and_text_alone():
+    content = "x [a](old.png) y <!-- [a](old.png) --> ![b](old.png) z"
+    rewritten = rewrite_links(content, {"old.png": "new.png"})
+
+    assert rewritten == "x [a](new.png) y <!-- [a](old.png) --> ![b](new.png) z"
+    assert rewrite_links(content, {}) is content
+    assert rewrite_links(content, {"other.png": "x.png"}) == content
+
+
+def test_note_links_are_read_inside_comments_too():
+    content = "- [n](a/n.md)\n<!-- [old](old.md) -->\n![img](a.png)\n"
+
+    assert extract_note_links(content) == ["a/n.md", "old.md"]
+
+
+def test_sub_main_names():
+    assert is_sub_main("main.m0.l1.main.md")
+    assert is_sub_main("m0/main.m0.l1.l2.main.md")
+    assert not is_sub_main("main.md")
+    assert not is_sub_main("main.m0.n0.md")
+
+
+def test_path_part_and_external_links():
+    assert link_path_part("a/b.md#title?x=1") == "a/b.md"
+    assert link_path_part("a.png?raw=1") == "a.png"
+    assert is_external_link("https://example.com")
+    assert is_external_link("mailto:me@example.com")
+    assert is_external_link("#anchor")
+    assert not is_external_link("../assets/a.png")
+
+
+def test_unclosed_comment_is_not_a_comment():
+    content = "[a](a.md) <!-- [b](b.md) --> [c](c.md) <!-- [d](d.md)"
+
+    assert extract_links_outside_comments(content) == ["a.md", "c.md", "d.md"]
+    assert rewrite_links(content, {"b.md": "x.md", "d.md": "y.md"}) == (
+        "[a](a.md) <!-- [b](b.md) --> [c](c.md) <!-- [d](y.md)"
+    )
+
+
+def test_scan_notes_keeps_the_order(notes: list[str], tmp_path: Path):
+    missing = str(tmp_path / "missing.md")
+    files = notes[:3] + [missing] + notes[3:]
+
+    serial = scan_notes(files, jobs=1)
+    threaded = scan_notes(files, jobs=4)
+
+    assert [n.path for n in serial] == notes
+    assert serial == threaded
+    assert all(n.targets for n in serial)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+import src.note_index as note_index
+from src.links import scan_notes
+from src.note_index import INDEX_DIR_NAME, INDEX_FILE_NAME, NoteIndex
+
+
+@pytest.fixture
+def parsed(monkeypatch: pytest.MonkeyPatch) -> list[int]:
+    """
+    Count the notes parsed by the index.
+    """
+    calls = []
+    parse_note = note_index.parse_note
+
+    def counting(content, st):
+        calls.append(1)
+        return parse_note(content, st)
+
+    monkeypatch.setattr(note_index, "parse_note", counting)
+    return calls
+
+
+def test_record_of_a_note(vault: Path):
+    note = vault / "m0" / "main.m0.n0.md"
+    record = NoteIndex(vault).get(note)
+
+    assert record is not None
+    assert record.size == note.stat().st_size
+    assert record.asset_links == record.links
+    assert len(record.links) == 2
+    assert record.note_links == [] and record.sub_mains == []
+
+    sub_main = NoteIndex(vault).get(vault / "m0" / "main.m0.l1.main.md")
+    assert sub_main.note_links == ["l1/main.m0.l1.n2.md", "l1/main.m0.l1.n3.md"]
+    assert sub_main.asset_links == []
+
+
+def test_missing_note(vault: Path):
+    assert NoteIndex(vault).get(vault / "missing.md") is None
+    assert NoteIndex(vault).get(vault / "m0") is None
+
+
+def test_scan_matches_scan_notes(vault: Path, notes: list[str]):
+    assert NoteIndex(vault).scan(notes, jobs=4) == scan_notes(notes)
+
+
+def test_unchanged_notes_are_not_parsed_again(
+    vault: Path, notes: list[str], parsed: list[int]
+):
+    index = NoteIndex(vault)
+    index.scan(notes)
+    index.save()
+    assert len(parsed) == len(notes)
+    assert (vault / INDEX_DIR_NAME / INDEX_FILE_NAME).is_file()
+
+    NoteIndex(vault).scan(notes)
+    assert len(parsed) == len(notes)
+
+
+def test_touched_note_is_not_parsed_again(vault: Path, parsed: list[int]):
+    note = vault / "m0" / "main.m0.n0.md"
+    index = NoteIndex(vault)
+    first = index.get(note)
+    index.save()
+
+    st = note.stat()
+    os.utime(note, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    record = NoteIndex(vault).get(note)
+
+    assert len(parsed) == 1
+    assert record.links == first.links
+    assert record.mtime_ns == note.stat().st_mtime_ns
+
+
+def test_changed_note_is_parsed_again(vault: Path, parsed: list[int]):
+    note = vault / "m0" / "main.m0.n0.md"
+    index = NoteIndex(vault)
+    index.get(note)
+    index.save()
+
+    with open(note, "a", encoding="utf-8") as f:
+        f.write("![new](../assets/docfiles/logo.png)\n")
+    record = NoteIndex(vault).get(note)
+
+    assert len(parsed) == 2
+    assert record.links[-1] == "../assets/docfiles/logo.png"
+
+
+def test_save_drops_deleted_notes(vault: Path, notes: list[str]):
+    index = NoteIndex(vault)
+    index.scan(notes)
+    index.save()
+
+    os.remove(notes[0])
+    with open(notes[1], "a", encoding="utf-8") as f:
+        f.write("changed\n")
+    index = NoteIndex(vault)
+    index.get(notes[1])
+    index.save()
+
+    data = json.loads((vault / INDEX_DIR_NAME / INDEX_FILE_NAME).read_text())
+    assert notes[0] not in data["notes"]
+    assert set(data["notes"]) == set(notes[1:])
+    # no temporary file is left next to the index
+    assert os.listdir(vault / INDEX_DIR_NAME) == [INDEX_FILE_NAME]
+
+
+def test_outdated_index_is_ignored(vault: Path, parsed: list[int]):
+    index_path = vault / INDEX_DIR_NAME / INDEX_FILE_NAME
+    index_path.parent.mkdir()
+    index_path.write_text(json.dumps({"version": 0, "notes": {"x": {}}}))
+
+    NoteIndex(vault).get(vault / "m0" / "main.m0.n0.md")
+    assert len(parsed) == 1
+
+
+def test_same_size_edit_right_after_the_index_is_seen(vault: Path, parsed: list[int]):
+    note = vault / "m0" / "main.m0.n0.md"
+    index = NoteIndex(vault)
+    index.get(note)
+    index.save()
+
+    # same size, same mtime (a coarse filesystem, or an edit in the same tick)
+    st = note.stat()
+    content = note.read_text(encoding="utf-8")
+    note.write_text(content.replace("Lorem", "Ipsum", 1), encoding="utf-8")
+    os.utime(note, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    record = NoteIndex(vault).get(note)
+    assert len(parsed) == 2
+    assert record.sha256 != hashlib.sha256(content.encode()).hexdigest()
+
+
+def test_old_notes_keep_their_stat(vault: Path, parsed: list[int]):
+    note = vault / "m0" / "main.m0.n0.md"
+    hour_ago = time.time_ns() - 3600 * 10**9
+    os.utime(note, ns=(hour_ago, hour_ago))
+    index = NoteIndex(vault)
+    index.get(note)
+    index.save()
+
+    data = json.loads((vault / INDEX_DIR_NAME / INDEX_FILE_NAME).read_text())
+    assert data["notes"][str(note)]["mtime_ns"] == hour_ago
+    NoteIndex(vault).get(note)
+    assert len(parsed) == 1
@@ -0,0 +1,81 @@
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import src.pandoc.runner as runner
+from src.pandoc.runner import AST_DIR_NAME, execute_pandoc_multi
+
+
+@pytest.fixture
+def commands(monkeypatch: pytest.MonkeyPatch) -> list[list[str]]:
+    """
+    Record the pandoc commands instead of running them, write their stdin
+    into their -o file.
+    """
+    calls = []
+
+    def fake_run(command, *, stdin=None, **_kwargs):
+        document = "".join(stdin) if stdin is not None else ""
+        out = Path(command[command.index("-o") + 1])
+        out.write_text(document, encoding="utf-8")
+        calls.append(command)
+
+    monkeypatch.setattr(runner, "_run_logged_command", fake_run)
+    monkeypatch.setattr(
+        runner, "probe_toolchain", lambda: SimpleNamespace(cache_key=lambda: "tools")
+    )
+    return calls
+
+
+def _convert(tmp_path: Path, outputs: list[str]) -> None:
+    pndo = tmp_path / "pandoc-options.yaml"
+    pndo.write_text("from: markdown+emoji\n", encoding="utf-8")
+    execute_pandoc_multi(
+        str(tmp_path / "template.tex"),
+        str(tmp_path / "filter.lua"),
+        str(pndo),
+        iter(["# Title\n", "text\n"]),
+        [tmp_path / "out" / name for name in outputs],
+        str(tmp_path),
+        str(tmp_path),
+        str(tmp_path),
+    )
+
+
+def test_ast_options_come_after_the_defaults(tmp_path: Path, commands: list[list[str]]):
+    _convert(tmp_path, ["main.tex", "main.docx"])
+
+    parse, *renders = commands
+    assert parse.index("-t") > parse.index("--defaults")
+    assert parse[parse.index("-t") + 1] == "json"
+    assert len(renders) == 2
+    for render in renders:
+        assert render.index("-f") > render.index("--defaults")
+        assert render[render.index("-f") + 1] == "json"
+
+
+def test_unchanged_document_reuses_the_ast(tmp_path: Path, commands: list[list[str]]):
+    _convert(tmp_path, ["main.tex", "main.docx"])
+    _convert(tmp_path, ["main.tex", "main.docx"])
+
+    assert len(commands) == 5
+    assert len(list((tmp_path / AST_DIR_NAME).glob("*.json"))) == 1
+
+
+def test_stdin_is_streamed_to_the_command(tmp_path: Path):
+    echo = [sys.executable, "-c", "import sys; sys.stdout.write(sys.stdin.read())"]
+    result = runner._run_with_stdin(echo, str(tmp_path), iter(["a\n", "b\n"]))
+
+    assert result.stdout == "a\nb\n"
+
+
+def test_command_that_stops_reading_fails_with_its_status(tmp_path: Path):
+    stop = [sys.executable, "-c", "import sys; sys.exit(3)"]
+    chunks = ("x" * 65536 for _ in range(64))
+
+    with pytest.raises(subprocess.CalledProcessError) as exc:
+        runner._run_with_stdin(stop, str(tmp_path), chunks)
+    assert exc.value.returncode == 3
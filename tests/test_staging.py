@@ -0,0 +1,115 @@
+import os
+from pathlib import Path
+
+import pytest
+
+import src.staging as staging
+from src.staging import STAGING_MANIFEST_DIR_NAME, collect_tree, sync_tree
+
+
+@pytest.fixture
+def reads(monkeypatch: pytest.MonkeyPatch) -> dict[str, list[str]]:
+    """
+    Record the sources copied and the sources only hashed by a sync.
+    """
+    calls: dict[str, list[str]] = {"copied": [], "hashed": []}
+    copy_with_digest = staging._copy_with_digest
+    file_digest = staging.file_digest
+
+    def copying(src, tmpPath):
+        calls["copied"].append(Path(src).name)
+        return copy_with_digest(src, tmpPath)
+
+    def hashing(src):
+        calls["hashed"].append(Path(src).name)
+        return file_digest(src)
+
+    monkeypatch.setattr(staging, "_copy_with_digest", copying)
+    monkeypatch.setattr(staging, "file_digest", hashing)
+    return calls
+
+
+@pytest.fixture
+def sources(vault: Path) -> dict[str, str]:
+    return collect_tree(vault / "assets" / "m0", prefix="assets/")
+
+
+def _touch(path: str | Path) -> None:
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def _staged(stagingDir: Path) -> list[str]:
+    return sorted(
+        p.relative_to(stagingDir).as_posix()
+        for p in stagingDir.rglob("*")
+        if p.is_file()
+    )
+
+
+def test_new_files_are_copied(
+    sources: dict[str, str], tmp_path: Path, reads: dict[str, list[str]]
+):
+    staging_dir = tmp_path / "staging" / "app"
+    stats = sync_tree(sources, staging_dir)
+
+    assert stats.copied == len(sources) and stats.unchanged == 0
+    assert _staged(staging_dir) == sorted(sources)
+    assert len(reads["copied"]) == len(sources) and reads["hashed"] == []
+    # the manifest is kept next to the staged folder, not inside it
+    assert (staging_dir.parent / STAGING_MANIFEST_DIR_NAME / "app.json").is_file()
+
+
+def test_unchanged_files_are_not_read(
+    sources: dict[str, str], tmp_path: Path, reads: dict[str, list[str]]
+):
+    staging_dir = tmp_path / "staging"
+    sync_tree(sources, staging_dir)
+    stats = sync_tree(sources, staging_dir)
+
+    assert stats.copied == 0 and stats.unchanged == len(sources)
+    assert len(reads["copied"]) == len(sources) and reads["hashed"] == []
+
+
+def test_touched_file_is_hashed_not_copied(
+    sources: dict[str, str], tmp_path: Path, reads: dict[str, list[str]]
+):
+    staging_dir = tmp_path / "staging"
+    sync_tree(sources, staging_dir)
+    _touch(sources["assets/imgs/n0-0.png"])
+    stats = sync_tree(sources, staging_dir)
+
+    assert stats.copied == 0 and stats.unchanged == len(sources)
+    assert reads["hashed"] == ["n0-0.png"]
+    assert len(reads["copied"]) == len(sources)
+    # the new stat is remembered: the next sync reads nothing
+    sync_tree(sources, staging_dir)
+    assert reads["hashed"] == ["n0-0.png"]
+
+
+@pytest.mark.parametrize("content", [b"same size image!", b"bigger"])
+def test_changed_file_is_copied(
+    sources: dict[str, str], tmp_path: Path, content: bytes
+):
+    staging_dir = tmp_path / "staging"
+    src = Path(sources["assets/imgs/n0-0.png"])
+    src.write_bytes(b"x" * len(b"same size image!"))
+    sync_tree(sources, staging_dir)
+
+    src.write_bytes(content)
+    _touch(src)
+    stats = sync_tree(sources, staging_dir)
+
+    assert stats.copied == 1
+    assert (staging_dir / "assets" / "imgs" / "n0-0.png").read_bytes() == content
+
+
+def test_removed_file_is_pruned(sources: dict[str, str], tmp_path: Path):
+    staging_dir = tmp_path / "staging"
+    sync_tree(sources, staging_dir)
+
+    del sources["assets/imgs/n0-0.png"]
+    stats = sync_tree(sources, staging_dir)
+
+    assert stats.removed == 1
+    assert _staged(staging_dir) == sorted(sources)
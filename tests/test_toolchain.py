@@ -0,0 +1,104 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+import src.pandoc.toolchain as toolchain
+from src.errors import ToolchainError
+from src.pandoc.runner import check_precondition
+from src.pandoc.toolchain import PROBE_FILE_NAME, TOOLS, probe_toolchain
+
+# Stand-in for a tool of the toolchain: logs every run, prints a version
+FAKE_TOOL = """\
+import os
+import sys
+
+with open(os.environ["FAKE_TOOL_LOG"], "a", encoding="utf-8") as f:
+    f.write(os.path.basename(sys.argv[0]) + "\\n")
+print(os.path.basename(sys.argv[0]) + " 1.0")
+"""
+
+
+@pytest.fixture
+def machine(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """
+    A machine with the fake tools alone in PATH, no fontconfig, an empty
+    font folder and its own user cache folder. Return the font folder.
+    """
+    if os.name == "nt":
+        pytest.skip("the fake tools are scripts with a shebang")
+
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for tool in TOOLS:
+        script = bin_dir / tool
+        script.write_text(f"#!{sys.executable}\n{FAKE_TOOL}", encoding="utf-8")
+        script.chmod(0o755)
+    font_dir = tmp_path / "fonts"
+    font_dir.mkdir()
+
+    monkeypatch.setenv("PATH", str(bin_dir))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("FAKE_TOOL_LOG", str(tmp_path / "runs.log"))
+    monkeypatch.setattr(toolchain, "_font_dirs", lambda: [font_dir])
+    monkeypatch.setattr(toolchain, "_TOOLCHAIN", None)
+    return font_dir
+
+
+def _install_fonts(fontDir: Path, *families: str) -> None:
+    for family in families:
+        (fontDir / f"{family}.ttf").write_bytes(b"font")
+
+
+def _runs(machine: Path) -> int:
+    log = machine.parent / "runs.log"
+    return len(log.read_text(encoding="utf-8").splitlines()) if log.exists() else 0
+
+
+def test_documented_install_passes(machine: Path):
+    # requirements/user/fonts.tar ships FreeSans and FreeMono only
+    _install_fonts(machine, "FreeSans", "FreeMono")
+    probe = check_precondition()
+
+    assert probe.missing_fonts() == []
+    assert probe.version("pandoc") == "pandoc 1.0"
+    assert _runs(machine) == len(TOOLS)
+
+
+def test_missing_font_fails(machine: Path):
+    _install_fonts(machine, "FreeSans")
+
+    with pytest.raises(ToolchainError, match="FreeMono"):
+        check_precondition()
+
+
+def test_probe_is_reused_until_a_tool_changes(
+    machine: Path, monkeypatch: pytest.MonkeyPatch
+):
+    _install_fonts(machine, "FreeSans", "FreeMono")
+    probe_toolchain()
+    assert (toolchain.user_cache_dir() / PROBE_FILE_NAME).is_file()
+
+    # a new process: the saved probe, no tool spawned
+    monkeypatch.setattr(toolchain, "_TOOLCHAIN", None)
+    probe_toolchain()
+    assert _runs(machine) == len(TOOLS)
+
+    # the same process after an upgrade of pandoc
+    pandoc = machine.parent / "bin" / "pandoc"
+    st = pandoc.stat()
+    os.utime(pandoc, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    probe_toolchain()
+    assert _runs(machine) == 2 * len(TOOLS)
+
+
+def test_fonts_installed_later_are_found(
+    machine: Path, monkeypatch: pytest.MonkeyPatch
+):
+    _install_fonts(machine, "FreeSans")
+    assert probe_toolchain().missing_fonts() == ["FreeMono"]
+
+    _install_fonts(machine, "FreeMono")
+    monkeypatch.setattr(toolchain, "_TOOLCHAIN", None)
+    assert probe_toolchain().missing_fonts() == []
@@ -0,0 +1,66 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from src.vault_snapshot import VaultSnapshot
+
+
+def test_answers_like_the_disk(vault: Path):
+    snapshot = VaultSnapshot(vault)
+    note = vault / "m0" / "main.m0.n0.md"
+
+    assert snapshot.covers(note)
+    assert snapshot.is_file(note) and not snapshot.is_dir(note)
+    assert snapshot.is_dir(vault / "m0") and not snapshot.is_file(vault / "m0")
+    assert snapshot.exists(vault / "assets" / "docfiles")
+    assert not snapshot.exists(vault / "missing.md")
+    assert snapshot.stat(note).st_size == note.stat().st_size
+    with pytest.raises(FileNotFoundError):
+        snapshot.stat(vault / "m0")
+
+
+def test_taken_once(vault: Path):
+    snapshot = VaultSnapshot(vault)
+    new_note = vault / "m0" / "new.md"
+    new_note.write_text("# New\n", encoding="utf-8")
+
+    # the snapshot is immutable: a later run takes a new one
+    assert not snapshot.is_file(new_note)
+    assert VaultSnapshot(vault).is_file(new_note)
+
+
+def test_outside_and_skipped_paths_ask_the_disk(vault: Path, tmp_path: Path):
+    outside = tmp_path / "outside.md"
+    outside.write_text("x", encoding="utf-8")
+    snapshot = VaultSnapshot(vault, skipDirs=("assets",))
+
+    assert not snapshot.covers(outside)
+    assert snapshot.is_file(outside)
+    assert not snapshot.covers(vault / "assets" / "docfiles" / "logo.png")
+    assert snapshot.is_file(vault / "assets" / "docfiles" / "logo.png")
+    assert snapshot.is_dir(vault / "assets")
+
+
+def test_resolve_is_lexical_inside(vault: Path):
+    snapshot = VaultSnapshot(vault)
+    path = vault / "m0" / ".." / "m1" / "main.m1.n4.md"
+
+    assert snapshot.resolve(path) == Path(os.path.normpath(path))
+
+
+def test_iter_files_order_and_skip(vault: Path):
+    snapshot = VaultSnapshot(vault)
+    files = list(snapshot.iter_files(vault / "m0"))
+
+    assert [rel for rel, _ in files] == [
+        "main.m0.l1.main.md",
+        "main.m0.n0.md",
+        "main.m0.n1.md",
+        "l1/main.m0.l1.n2.md",
+        "l1/main.m0.l1.n3.md",
+    ]
+    assert all(os.path.isfile(path) for _, path in files)
+
+    skipped = snapshot.iter_files(vault, skipDir=lambda name: name == "assets")
+    assert not any(rel.startswith("assets/") for rel, _ in skipped)
@@ -0,0 +1,84 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+import src.workflow as workflow
+from src.config import BuildContext
+from src.errors import BuildError
+from src.modes import CMode
+
+# Stand-in for pandoc: writes what it reads on stdin into the -o file
+FAKE_PANDOC = """\
+import sys
+
+args = sys.argv[1:]
+if "--version" in args:
+    print("pandoc 3.1.0")
+    sys.exit(0)
+out = args[args.index("-o") + 1]
+with open(out, "w", encoding="utf-8") as f:
+    f.write(sys.stdin.read())
+"""
+
+
+@pytest.fixture
+def fake_pandoc(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Put a fake pandoc first in PATH (the worker processes inherit it) and
+    skip the toolchain check of the plan.
+    """
+    if os.name == "nt":
+        pytest.skip("the fake pandoc is a script with a shebang")
+
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    pandoc = bin_dir / "pandoc"
+    pandoc.write_text(f"#!{sys.executable}\n{FAKE_PANDOC}", encoding="utf-8")
+    pandoc.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(workflow, "check_precondition", lambda: None)
+
+
+def _plan(targets: list[tuple[CMode, str | None, str]]) -> None:
+    workflow.build_plan_procedure(
+        targets, workflow.CustomPaths(), workflow.BuildOptions()
+    )
+
+
+@pytest.mark.usefixtures("fake_pandoc")
+def test_plan_builds_every_target_in_workers(
+    ctx: BuildContext, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(os, "cpu_count", lambda: 3)
+    _plan(
+        [
+            (CMode.ALL, None, "all.docx"),
+            (CMode.GROUP, "m0", "m0.docx"),
+            (CMode.GROUP, "m1", "m1.odt"),
+        ]
+    )
+
+    all_notes = (ctx.build_dir / "all.docx").read_text(encoding="utf-8")
+    m0_notes = (ctx.build_dir / "m0.docx").read_text(encoding="utf-8")
+    assert "# Note 0" in all_notes and "# Note 4" in all_notes
+    assert "# Note 0" in m0_notes and "# Note 4" not in m0_notes
+    assert (ctx.build_dir / "m1.odt").is_file()
+    # every worker converted in its own scratch folder, removed afterwards
+    assert not (ctx.build_dir / ".jobs").exists()
+
+
+@pytest.mark.usefixtures("fake_pandoc")
+def test_plan_of_one_document_runs_in_process(ctx: BuildContext):
+    _plan([(CMode.ALL, None, "all.docx"), (CMode.ALL, None, "all.odt")])
+
+    assert (ctx.build_dir / "all.docx").read_text(encoding="utf-8") == (
+        (ctx.build_dir / "all.odt").read_text(encoding="utf-8")
+    )
+
+
+@pytest.mark.usefixtures("ctx")
+def test_plan_rejects_duplicate_outputs():
+    with pytest.raises(BuildError, match="all.docx"):
+        _plan([(CMode.ALL, None, "all.docx"), (CMode.GROUP, "m0", "all.docx")])